@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from rest_framework import exceptions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from softdesk.metrics import JWT_VALIDATION_DURATION, observe_duration
+
+
+# Attributs de l'utilisateur signés dans les jetons: ils suffisent aux permissions de l'application.
+USER_CLAIMS = ["is_superuser", "can_contribute_to_a_project", "can_profile_viewable"]
+
+
+def set_user_claims(token, user):
+    for claim in USER_CLAIMS:
+        token[claim] = bool(getattr(user, claim))
+    return token
+
+
+def get_user_instance(user):
+    """
+    Description: retourne l'instance du modèle User, en la chargeant si l'utilisateur est un SoftdeskTokenUser.
+    """
+    if isinstance(user, TokenUser):
+        return user.instance
+    return user
+
+
+class SoftdeskTokenUser(TokenUser):
+    """
+    Description: utilisateur construit depuis les attributs signés du jeton d'accès, sans lecture en base.
+    Une vue qui a besoin du modèle complet utilise l'attribut 'instance' (une requête, mémorisée).
+    """
+
+    @cached_property
+    def is_superuser(self):
+        return bool(self.token.get("is_superuser", False))
+
+    @cached_property
+    def can_contribute_to_a_project(self):
+        return bool(self.token.get("can_contribute_to_a_project", False))
+
+    @cached_property
+    def can_profile_viewable(self):
+        return bool(self.token.get("can_profile_viewable", False))
+
+    @cached_property
+    def instance(self):
+        return get_user_model().objects.get(id=self.id)
+
+    def check_password(self, raw_password):
+        return self.instance.check_password(raw_password)
+
+
+class SoftdeskJWTAuthentication(JWTAuthentication):
+    """
+    Description: authentification JWT. Si SOFTDESK_STATELESS_JWT est actif, l'utilisateur est construit depuis
+    le jeton (SoftdeskTokenUser) au lieu d'être relu en base à chaque requête.
+    La durée de vie courte des jetons d'accès borne le délai de prise en compte d'une modification du profil.
+    """
+
+    def get_validated_token(self, raw_token):
+        with observe_duration(JWT_VALIDATION_DURATION):
+            return super().get_validated_token(raw_token)
+
+    def get_user(self, validated_token):
+        if not settings.SOFTDESK_STATELESS_JWT:
+            return super().get_user(validated_token)
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken("Token contained no recognizable user identification")
+        for claim in USER_CLAIMS:
+            if claim not in validated_token:
+                # jeton émis avant l'ajout des attributs: on revient à la lecture en base
+                return super().get_user(validated_token)
+        return SoftdeskTokenUser(validated_token)
+
+
+class SoftdeskTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        return set_user_claims(token, user)
+
+
+class SoftdeskTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        """
+        Description: le jeton d'accès renouvelé porte les attributs actuels de l'utilisateur,
+        et non ceux copiés depuis le jeton de rafraîchissement.
+        """
+        data = super().validate(attrs)
+        access = AccessToken(data["access"])
+        user = (
+            get_user_model()
+            .objects.filter(**{api_settings.USER_ID_FIELD: access[api_settings.USER_ID_CLAIM]})
+            .first()
+        )
+        if user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed("User not found", code="user_not_found")
+        data["access"] = str(set_user_claims(access, user))
+        return data
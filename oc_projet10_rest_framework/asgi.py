@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'oc_projet10_rest_framework.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# les connexions à la base sont empruntées à une réserve (SOFTDESK_DB_POOL_SIZE): une requête, ou une tâche
+# asynchrone (await pool.run(...)), n'ouvre pas sa propre connexion
+from softdesk.db_pool import ConnectionPoolMiddleware, pool  # noqa: E402
+
+application = ConnectionPoolMiddleware(django_application, pool)
@@ -30,6 +30,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'softdesk.instrumentation.InstrumentationMiddleware',
+    'softdesk.query_inspector.QueryInspectorMiddleware',
+    'softdesk.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,10 +68,34 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Connexions persistantes (WSGI), sur demande: réutilisées d'une requête à l'autre pendant CONN_MAX_AGE
+        # secondes (600 par exemple), vérifiées avant réutilisation (CONN_HEALTH_CHECKS). 0: une connexion par requête
+        'CONN_MAX_AGE': int(os.environ.get('SOFTDESK_CONN_MAX_AGE', '0')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
 
+# Cache
+# Un cache mémoire local par défaut: aucun service externe n'est nécessaire.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'softdesk',
+    }
+}
+
+
+# Password hashers
+# Le hacheur par défaut (PBKDF2 SHA256) est remplacé par une sous-classe qui mesure sa durée (softdesk.metrics)
+PASSWORD_HASHERS = [
+    'softdesk.metrics.TimedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -104,16 +131,22 @@ if "DJANGO_ENVIRONMENT" in os.environ and os.environ.get("DJANGO_ENVIRONMENT") =
     SIMPLE_JWT = {
         "ACCESS_TOKEN_LIFETIME": timedelta(seconds=2),
         "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
+        "TOKEN_OBTAIN_SERIALIZER": "authentication.tokens.SoftdeskTokenObtainPairSerializer",
+        "TOKEN_REFRESH_SERIALIZER": "authentication.tokens.SoftdeskTokenRefreshSerializer",
+        "TOKEN_USER_CLASS": "authentication.tokens.SoftdeskTokenUser",
     }
 else:
     SIMPLE_JWT = {
         "ACCESS_TOKEN_LIFETIME": timedelta(minutes=15),
         "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
+        "TOKEN_OBTAIN_SERIALIZER": "authentication.tokens.SoftdeskTokenObtainPairSerializer",
+        "TOKEN_REFRESH_SERIALIZER": "authentication.tokens.SoftdeskTokenRefreshSerializer",
+        "TOKEN_USER_CLASS": "authentication.tokens.SoftdeskTokenUser",
     }
 
 REST_FRAMEWORK = {
     'TEST_REQUEST_DEFAULT_FORMAT': 'json',
-    'DEFAULT_AUTHENTICATION_CLASSES': ['rest_framework_simplejwt.authentication.JWTAuthentication',],
+    'DEFAULT_AUTHENTICATION_CLASSES': ['authentication.tokens.SoftdeskJWTAuthentication',],
     "USER_AUTHENTICATION_RULE": "rest_framework_simplejwt.authentication.default_user_authentication_rule",
     'DATETIME_FORMAT': "%d-%m-%Y %H:%M:%S",
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
@@ -124,3 +157,52 @@ REST_FRAMEWORK = {
 DATE_FORMAT = ['%d-%m-%Y']
 DATE_INPUT_FORMATS = ['%d-%m-%Y']
 RGPD_MIN_AGE = 16
+# Cache des contributions (projets et rôles) des utilisateurs. Le cache 'default' (LocMemCache) est propre au
+# processus: les invalidations n'atteignent pas les autres processus (workers), d'où une durée de quelques secondes.
+# Avec plusieurs processus, une durée plus longue suppose un cache partagé (Redis, Memcached, base de données).
+SOFTDESK_MEMBERSHIP_CACHE = 'default'
+SOFTDESK_MEMBERSHIP_CACHE_TIMEOUT = int(os.environ.get('SOFTDESK_MEMBERSHIP_CACHE_TIMEOUT', '5'))
+# Authentification sans lecture de l'utilisateur en base: il est construit depuis les attributs signés du jeton
+SOFTDESK_STATELESS_JWT = os.environ.get('SOFTDESK_STATELESS_JWT', 'False') == 'True'
+# Nombre maximal de problèmes créés par un appel à la création en masse
+SOFTDESK_BULK_ISSUES_MAX_SIZE = 500
+# Nombre de lignes lues par lot lors de l'export d'un projet
+SOFTDESK_EXPORT_CHUNK_SIZE = 2000
+# Nombre de lignes supprimées par lot (et par transaction) lors de la suppression de toutes les données
+SOFTDESK_PURGE_BATCH_SIZE = 5000
+# Traitements en arrière-plan exécutés immédiatement, dans la requête (environnement de test)
+SOFTDESK_JOBS_EAGER = os.environ.get('DJANGO_ENVIRONMENT') == 'TEST'
+# Nombre de problèmes fermés par lot quand un projet quitte le statut Open
+SOFTDESK_CASCADE_BATCH_SIZE = 1000
+# Attente maximale du worker entre deux recherches de traitements en attente (secondes)
+SOFTDESK_JOBS_POLL_INTERVAL = 30
+# Un traitement en cours sans avancement depuis ce délai (secondes) est considéré interrompu et relancé
+SOFTDESK_JOBS_STALE_AFTER = 300
+# Nombre maximal d'entrées du journal des changements lues par un appel à la synchronisation d'un projet
+SOFTDESK_CHANGES_PAGE_SIZE = 500
+# Mesures par requête (SQL, permissions, sérialiseurs, rendu) dans l'en-tête Server-Timing et le journal
+SOFTDESK_INSTRUMENTATION = os.environ.get('SOFTDESK_INSTRUMENTATION', 'False') == 'True'
+# Part des requêtes dont les requêtes SQL sont inspectées (doublons, N+1, lenteurs): 0 désactive, 1 en développement
+SOFTDESK_QUERY_INSPECTOR_SAMPLE_RATE = float(os.environ.get('SOFTDESK_QUERY_INSPECTOR_SAMPLE_RATE', '0'))
+# Durée (millisecondes) au-delà de laquelle une requête SQL est journalisée avec son plan d'exécution
+SOFTDESK_SLOW_QUERY_MS = 100
+# Nombre d'exécutions d'une même requête (paramètres différents) signalé comme un N+1
+SOFTDESK_N_PLUS_ONE_THRESHOLD = 3
+# Métriques (format Prometheus) exposées par l'endpoint /metrics
+SOFTDESK_METRICS = os.environ.get('SOFTDESK_METRICS', 'False') == 'True'
+# Répertoire partagé par les workers (un fichier par processus), additionnés par /metrics. Vide: un seul processus
+SOFTDESK_METRICS_DIR = os.environ.get('SOFTDESK_METRICS_DIR') or None
+# Délai minimal (secondes) entre deux écritures de l'état d'un processus dans SOFTDESK_METRICS_DIR
+SOFTDESK_METRICS_FLUSH_INTERVAL = 1.0
+# Jeton du collecteur (en-tête 'Authorization: Bearer <jeton>'); sans jeton, /metrics est réservé aux superutilisateurs
+SOFTDESK_METRICS_TOKEN = os.environ.get('SOFTDESK_METRICS_TOKEN') or None
+# Profil de pragmas appliqué à chaque nouvelle connexion SQLite (softdesk/sqlite_profiles.py): 'default' (pragmas
+# de SQLite) ou, sur demande, 'wal' (écritures concurrentes, mais synchronous=NORMAL: les dernières transactions
+# validées peuvent être perdues sur coupure de courant)
+SOFTDESK_SQLITE_PROFILE = os.environ.get('SOFTDESK_SQLITE_PROFILE', 'default')
+# Pragmas ajoutés au profil ou remplaçant ses valeurs, par exemple {'busy_timeout': 10000}
+SOFTDESK_SQLITE_PRAGMAS = {}
+# Nombre maximal de connexions à la base partagées par les requêtes et les tâches asynchrones (asgi.py)
+SOFTDESK_DB_POOL_SIZE = int(os.environ.get('SOFTDESK_DB_POOL_SIZE', '8'))
+# Durée de vie (secondes) d'une connexion de la réserve (asgi.py), indépendante de CONN_MAX_AGE
+SOFTDESK_DB_POOL_MAX_AGE = int(os.environ.get('SOFTDESK_DB_POOL_MAX_AGE', '600'))
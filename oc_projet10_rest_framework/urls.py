@@ -2,9 +2,12 @@ from django.contrib import admin
 from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from softdesk.metrics import metrics_view
+
 from softdesk.views import ProjectsAPIView, \
     UserRegisterGenericsAPIView, UsersAPIView, UserAPIView, UserUpdatePasswordGenericsAPIView, \
-    ProjectsUsersAPIView, IssuesAPIView, IssuesRetrieveUpdateAPIView, CommentsAPIView
+    ProjectsUsersAPIView, ProjectExportAPIView, IssuesAPIView, IssuesBulkAPIView, IssuesRetrieveUpdateAPIView, \
+    CommentsAPIView, JobAPIView, SearchAPIView, ProjectChangesAPIView
 
 
 urlpatterns = [
@@ -17,7 +20,10 @@ urlpatterns = [
     path('projects/<int:pk>/', ProjectsAPIView.as_view(), name='projects_detail'),
     path('projects/<int:pk>/users/', ProjectsUsersAPIView.as_view(), name='projects_users'),
     path('projects/<int:pk>/users/<int:user_id>/', ProjectsUsersAPIView.as_view(), name='projects_users_detail'),
+    path('projects/<int:pk>/export/', ProjectExportAPIView.as_view(), name='projects_export'),
+    path('projects/<int:pk>/changes/', ProjectChangesAPIView.as_view(), name='projects_changes'),
     path('projects/<int:pk>/issues/', IssuesAPIView.as_view(), name='issues'),
+    path('projects/<int:pk>/issues/bulk/', IssuesBulkAPIView.as_view(), name='issues_bulk'),
     path('projects/<int:pk>/issues/<int:issue_id>/', IssuesAPIView.as_view(), name='issues_detail'),
     path(
         'projects/<int:pk>/issues/<int:issue_id>/change_status/',
@@ -33,6 +39,9 @@ urlpatterns = [
         CommentsAPIView.as_view(),
         name='comments_detail'
     ),
+    path('jobs/<int:pk>/', JobAPIView.as_view(), name='jobs_detail'),
+    path('search/', SearchAPIView.as_view(), name='search'),
+    path('metrics', metrics_view, name='metrics'),
     path('login/', TokenObtainPairView.as_view(), name='login'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
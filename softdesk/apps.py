@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SoftdeskConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "softdesk"
+
+    def ready(self):
+        from softdesk import signals, purge, cascades  # noqa: F401
@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now
+
+from softdesk import counters
+from softdesk.jobs import enqueue_job, register_job
+from softdesk.models import Issues
+from softdesk.versions import bump_project_version
+
+
+FINISH_ISSUES_JOB = "finish_project_issues"
+
+
+def finish_project_issues(project_id, batch_size=None, progress=None):
+    """
+    Description: passe au statut "Finished" tous les problèmes d'un projet, par lots de batch_size problèmes.
+    Chaque lot est validé dans sa propre transaction: le verrou d'écriture de SQLite est relâché entre deux lots.
+    """
+    batch_size = batch_size or settings.SOFTDESK_CASCADE_BATCH_SIZE
+    queryset = Issues.objects.filter(project_id=project_id).exclude(status="Finished")
+    total = queryset.count()
+    updated = 0
+    if progress is not None:
+        progress("issues", updated=updated, total=total)
+    while True:
+        with transaction.atomic():
+            rows = list(queryset.order_by("id").values_list("id", "status")[:batch_size])
+            if not rows:
+                break
+            updated += Issues.objects.filter(id__in=[row[0] for row in rows]).update(
+                status="Finished", updated_time=now()
+            )
+            counters.issues_closed(
+                project_id, sum(counters.is_open(row[1]) for row in rows)
+            )
+            bump_project_version(project_id)
+        if progress is not None:
+            progress("issues", updated=updated, total=total)
+    return updated
+
+
+@register_job(FINISH_ISSUES_JOB)
+def finish_project_issues_job(job, report):
+    finish_project_issues(
+        job.payload["project_id"], job.payload.get("batch_size"), progress=report
+    )
+
+
+def has_unfinished_issues(project_id):
+    """
+    Description: le projet a-t-il des problèmes à terminer? Lu dans la table des problèmes,
+    pas dans le compteur open_issues_count, qui peut être faux jusqu'à sa réparation.
+    """
+    return Issues.objects.filter(project_id=project_id).exclude(status="Finished").exists()
+
+
+def enqueue_finish_project_issues(project_id, created_by=None):
+    """
+    Description: la fermeture des problèmes d'un projet qui quitte le statut "Open" est confiée au worker.
+    """
+    return enqueue_job(
+        FINISH_ISSUES_JOB, payload={"project_id": project_id}, created_by=created_by
+    )
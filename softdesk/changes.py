@@ -0,0 +1,160 @@
+from django.db import connections, transaction
+
+from softdesk.models import Changes, Comments, Contributors, Issues, Projects
+
+
+CHANGES_TABLE = Changes._meta.db_table
+
+
+def log_statements(kind, project_id, object_id, deleted, project_source=None):
+    """
+    Description: corps d'un trigger: l'entrée précédente de la ligne est remplacée par une nouvelle entrée,
+    d'identifiant plus grand. Sans project_source, le projet est lu sur la ligne écrite.
+    """
+    compact = f"DELETE FROM {CHANGES_TABLE} WHERE kind = '{kind}' AND object_id = {object_id};"
+    if project_source is None:
+        insert = (
+            f"INSERT INTO {CHANGES_TABLE} (project_id, kind, object_id, deleted) "
+            f"VALUES ({project_id}, '{kind}', {object_id}, {deleted});"
+        )
+    else:
+        # le projet d'un commentaire est celui de son problème: aucune entrée si le problème n'existe plus
+        insert = (
+            f"INSERT INTO {CHANGES_TABLE} (project_id, kind, object_id, deleted) "
+            f"SELECT project_id_id, '{kind}', {object_id}, {deleted} FROM {project_source};"
+        )
+    return f"{compact}\n{insert}"
+
+
+def build_schema():
+    schema = {}
+    tracked = [
+        ("softdesk_issues", Changes.ISSUE, "{row}.project_id_id", None),
+        (
+            "softdesk_comments",
+            Changes.COMMENT,
+            None,
+            "softdesk_issues WHERE id = {row}.issue_id_id",
+        ),
+        ("softdesk_contributors", Changes.CONTRIBUTOR, "{row}.project_id_id", None),
+    ]
+    for table, kind, project_id, project_source in tracked:
+        for event, row, deleted in [("INSERT", "new", 0), ("UPDATE", "new", 0), ("DELETE", "old", 1)]:
+            name = f"softdesk_changes_{table.removeprefix('softdesk_')}_{event.lower()}"
+            body = log_statements(
+                kind,
+                project_id and project_id.format(row=row),
+                f"{row}.id",
+                deleted,
+                project_source and project_source.format(row=row),
+            )
+            schema[name] = f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {table} BEGIN\n{body}\nEND"
+    return schema
+
+
+# triggers de journalisation: ils suivent aussi les écritures faites hors de l'ORM (bulk_create, update, purge)
+CHANGES_SCHEMA = build_schema()
+
+
+def change_log_available(using="default"):
+    return connections[using].vendor == "sqlite"
+
+
+def change_log_installed(cursor):
+    cursor.execute(
+        "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name IN (%s)"
+        % ", ".join(["%s"] * len(CHANGES_SCHEMA)),
+        list(CHANGES_SCHEMA),
+    )
+    return cursor.fetchone()[0] == len(CHANGES_SCHEMA)
+
+
+def install_change_log(using="default"):
+    """
+    Description: crée (si besoin) les triggers qui alimentent le journal des changements.
+    S'ils n'existaient pas, le journal est initialisé avec une entrée par ligne déjà présente:
+    une synchronisation depuis le curseur 0 retourne alors tout le projet. Retourne True dans ce cas.
+    """
+    if not change_log_available(using):
+        return False
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        if change_log_installed(cursor):
+            return False
+        cursor.execute(f"DELETE FROM {CHANGES_TABLE}")
+        cursor.execute(
+            f"""
+            INSERT INTO {CHANGES_TABLE} (project_id, kind, object_id, deleted)
+            SELECT project_id_id, '{Changes.ISSUE}', id, 0 FROM softdesk_issues
+            """
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {CHANGES_TABLE} (project_id, kind, object_id, deleted)
+            SELECT issue.project_id_id, '{Changes.COMMENT}', comment.id, 0
+            FROM softdesk_comments AS comment
+            INNER JOIN softdesk_issues AS issue ON issue.id = comment.issue_id_id
+            """
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {CHANGES_TABLE} (project_id, kind, object_id, deleted)
+            SELECT project_id_id, '{Changes.CONTRIBUTOR}', id, 0 FROM softdesk_contributors
+            """
+        )
+        for statement in CHANGES_SCHEMA.values():
+            cursor.execute(statement)
+    return True
+
+
+def read_changes(project_id, since, limit):
+    """
+    Description: changements du projet postérieurs au curseur since, au plus limit entrées du journal.
+    Le journal est lu par l'index (project_id, id), puis les lignes encore présentes sont chargées
+    en une requête par type: le coût dépend du nombre de changements, pas de la taille du projet.
+    Les lignes supprimées (ou absentes, supprimées depuis la lecture du journal) sont retournées
+    comme des tombstones: leur seul identifiant.
+    """
+    with transaction.atomic():
+        entries = list(
+            Changes.objects.filter(project_id=project_id, id__gt=since)
+            .order_by("id")
+            .values_list("id", "kind", "object_id", "deleted")[: limit + 1]
+        )
+        more = len(entries) > limit
+        entries = entries[:limit]
+        changed = {Changes.ISSUE: set(), Changes.COMMENT: set(), Changes.CONTRIBUTOR: set()}
+        deleted = {Changes.ISSUE: set(), Changes.COMMENT: set(), Changes.CONTRIBUTOR: set()}
+        for entry_id, kind, object_id, is_deleted in entries:
+            if is_deleted:
+                changed[kind].discard(object_id)
+                deleted[kind].add(object_id)
+            else:
+                deleted[kind].discard(object_id)
+                changed[kind].add(object_id)
+
+        rows = {
+            Changes.ISSUE: list(
+                Issues.objects.filter(project_id=project_id, id__in=changed[Changes.ISSUE]).order_by("id")
+            ),
+            Changes.COMMENT: list(
+                Comments.objects.filter(
+                    issue_id__project_id=project_id, id__in=changed[Changes.COMMENT]
+                ).order_by("id")
+            ),
+            Changes.CONTRIBUTOR: list(
+                Contributors.objects.filter(
+                    project_id=project_id, id__in=changed[Changes.CONTRIBUTOR]
+                ).order_by("id")
+            ),
+        }
+        for kind, instances in rows.items():
+            deleted[kind] |= changed[kind] - {instance.id for instance in instances}
+        version = Projects.objects.filter(id=project_id).values_list("version", flat=True).first()
+
+    return {
+        "cursor": entries[-1][0] if entries else since,
+        "version": version,
+        "more": more,
+        "rows": rows,
+        "deleted": {kind: sorted(ids) for kind, ids in deleted.items()},
+    }
@@ -0,0 +1,70 @@
+from hashlib import sha256
+
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from softdesk.models import Projects
+
+
+def timestamp(value):
+    """
+    Description: date (naïve, dans le fuseau du projet) vers un timestamp entier, pour l'en-tête Last-Modified.
+    """
+    if value is None:
+        return None
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return int(value.timestamp())
+
+
+def project_validators(project_id):
+    """
+    Description: version et date de dernière modification du projet, lues sur la seule ligne du projet.
+    Toute écriture du projet ou de ses données (problèmes, commentaires, contributeurs) incrémente sa version:
+    elle valide le détail du projet comme les listes de ses problèmes et de leurs commentaires.
+    """
+    row = Projects.objects.filter(id=project_id).values_list("version", "updated_time").first()
+    if row is None:
+        return None, []
+    version, updated_time = row
+    return updated_time, [version]
+
+
+class ConditionalGet:
+    """
+    Description: validateurs d'une réponse GET (ETag fort et Last-Modified), calculés depuis des marqueurs
+    de modification et non depuis le contenu sérialisé.
+    L'ETag dépend aussi de l'url (pagination) et du type de média négocié: deux représentations différentes
+    n'ont jamais le même ETag.
+    """
+
+    def __init__(self, request, last_modified, markers):
+        self.request = request
+        self.last_modified = timestamp(last_modified)
+        parts = [
+            request.path,
+            request.META.get("QUERY_STRING", ""),
+            getattr(request, "accepted_media_type", ""),
+        ] + [str(marker) for marker in markers]
+        self.etag = f'"{sha256(chr(31).join(parts).encode()).hexdigest()[:40]}"'
+
+    def apply(self, response):
+        response["ETag"] = self.etag
+        if self.last_modified is not None:
+            response["Last-Modified"] = http_date(self.last_modified)
+        # réponses propres à l'utilisateur: pas de cache partagé, revalidation à chaque utilisation
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def not_modified(self):
+        """
+        Description: la réponse 304 (ou 412) si les en-têtes If-None-Match / If-Modified-Since du client
+        correspondent, sinon None: la vue poursuit et sérialise la ressource.
+        """
+        response = get_conditional_response(
+            self.request, etag=self.etag, last_modified=self.last_modified
+        )
+        if response is None:
+            return None
+        return self.apply(response)
@@ -0,0 +1,156 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils.timezone import now
+
+from softdesk.models import Projects, Issues, Comments
+
+
+def is_open(status):
+    return status in Issues.OPEN_STATUSES
+
+
+def issues_created(project_id, statuses):
+    """
+    Description: incrémente les compteurs du projet pour les problèmes créés, dont on donne les statuts.
+    """
+    statuses = list(statuses)
+    if not statuses:
+        return 0
+    return Projects.objects.filter(id=project_id).update(
+        issues_count=F("issues_count") + len(statuses),
+        open_issues_count=F("open_issues_count") + sum(is_open(status) for status in statuses),
+        updated_time=now(),
+    )
+
+
+def decrement(field, count=1):
+    """
+    Description: décrémentation bornée à 0: un compteur faux (à corriger par la commande de réparation)
+    ne doit pas faire échouer l'écriture.
+    """
+    return Greatest(F(field) - count, Value(0))
+
+
+def change_issue_status(issue, new_status):
+    """
+    Description: passe le problème de son statut lu (issue.status) à new_status, par une mise à jour conditionnelle,
+    dans la transaction de l'appelant. Le compteur du projet n'est ajusté que si la ligne a changé: deux changements
+    concurrents depuis le même statut ne le modifient qu'une fois.
+    Retourne False si le statut en base n'est plus celui lu (modifié entre-temps): rien n'est écrit.
+    """
+    old_status = issue.status
+    if new_status == old_status:
+        return True
+    changed = Issues.objects.filter(id=issue.id, status=old_status).update(
+        status=new_status, updated_time=now()
+    )
+    if not changed:
+        return False
+    issue_status_changed(issue.project_id_id, old_status, new_status)
+    return True
+
+
+def issue_status_changed(project_id, old_status, new_status):
+    delta = is_open(new_status) - is_open(old_status)
+    if delta == 0:
+        return 0
+    if delta > 0:
+        open_issues_count = F("open_issues_count") + delta
+    else:
+        open_issues_count = decrement("open_issues_count")
+    return Projects.objects.filter(id=project_id).update(
+        open_issues_count=open_issues_count, updated_time=now()
+    )
+
+
+def issues_closed(project_id, count):
+    """
+    Description: décrémente le nombre de problèmes ouverts du projet, de 'count' problèmes passés à un statut fermé.
+    """
+    if count == 0:
+        return 0
+    return Projects.objects.filter(id=project_id).update(
+        open_issues_count=decrement("open_issues_count", count), updated_time=now()
+    )
+
+
+def comment_created(issue_id):
+    return Issues.objects.filter(id=issue_id).update(
+        comments_count=F("comments_count") + 1, updated_time=now()
+    )
+
+
+def comment_deleted(issue_id):
+    return Issues.objects.filter(id=issue_id).update(
+        comments_count=decrement("comments_count"), updated_time=now()
+    )
+
+
+def count_subquery(queryset, field):
+    """
+    Description: sous-requête corrélée du nombre de lignes du queryset pour la ligne courante (OuterRef("id")).
+    """
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("id")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("id"))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def repair_projects_counters(project_ids=None):
+    """
+    Description: recalcule en une requête les compteurs des projets (tous, ou ceux de project_ids) qui sont faux,
+    et incrémente leur version. Retourne le nombre de projets corrigés.
+    """
+    issues_count = count_subquery(Issues.objects.all(), "project_id")
+    open_issues_count = count_subquery(
+        Issues.objects.filter(status__in=Issues.OPEN_STATUSES), "project_id"
+    )
+    projects = Projects.objects.all()
+    if project_ids is not None:
+        projects = projects.filter(id__in=project_ids)
+    wrong_projects = (
+        projects.annotate(actual_issues=issues_count, actual_open_issues=open_issues_count)
+        .filter(
+            ~Q(issues_count=F("actual_issues"))
+            | ~Q(open_issues_count=F("actual_open_issues"))
+        )
+        .values("id")
+    )
+    return Projects.objects.filter(id__in=wrong_projects).update(
+        issues_count=issues_count,
+        open_issues_count=open_issues_count,
+        version=F("version") + 1,
+        updated_time=now(),
+    )
+
+
+def repair_issues_counters(issue_ids=None):
+    """
+    Description: recalcule les compteurs des problèmes (tous, ou ceux de issue_ids) qui sont faux,
+    et incrémente la version de leurs projets. Retourne le nombre de problèmes corrigés.
+    """
+    comments_count = count_subquery(Comments.objects.all(), "issue_id")
+    issues = Issues.objects.all()
+    if issue_ids is not None:
+        issues = issues.filter(id__in=issue_ids)
+    wrong_issues = list(
+        issues.annotate(actual_comments=comments_count)
+        .filter(~Q(comments_count=F("actual_comments")))
+        .values_list("id", "project_id")
+    )
+    if not wrong_issues:
+        return 0
+    repaired = Issues.objects.filter(id__in=[row[0] for row in wrong_issues]).update(
+        comments_count=comments_count, updated_time=now()
+    )
+    Projects.objects.filter(id__in={row[1] for row in wrong_issues}).update(
+        version=F("version") + 1, updated_time=now()
+    )
+    return repaired
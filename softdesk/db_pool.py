@@ -0,0 +1,145 @@
+from contextlib import contextmanager
+from time import monotonic
+import math
+import queue
+import threading
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class ConnectionPool:
+    """
+    Description: réserve bornée de connexions à une base de DATABASES, partagées entre threads.
+    Sous ASGI, chaque requête (et chaque tâche asynchrone) s'exécute dans un nouveau thread: sans réserve, chacune
+    ouvre sa connexion (requêtes de connexion et pragmas de softdesk.sqlite_profiles compris).
+    Une connexion empruntée est installée comme connexion du thread (connections[alias]): l'ORM l'utilise sans
+    modification du code. La réserve décide seule de la durée de vie de ses connexions (max_age secondes,
+    SOFTDESK_DB_POOL_MAX_AGE): CONN_MAX_AGE ne s'y applique pas, close_old_connections (début et fin de requête)
+    ne ferme une connexion empruntée que si une erreur l'a rendue inutilisable. Elles sont vérifiées
+    (CONN_HEALTH_CHECKS) avant leur 1ère requête de chaque emprunt.
+    Au-delà de size emprunts simultanés, l'emprunteur attend qu'une connexion soit rendue.
+    """
+
+    def __init__(self, alias=DEFAULT_DB_ALIAS, size=None, max_age=None):
+        self.alias = alias
+        self.size = size or settings.SOFTDESK_DB_POOL_SIZE
+        self.max_age = settings.SOFTDESK_DB_POOL_MAX_AGE if max_age is None else max_age
+        # échéance de la connexion ouverte de chaque wrapper
+        self.expires = {}
+        self.slots = threading.BoundedSemaphore(self.size)
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.wrappers = []
+
+    def create(self):
+        wrapper = connections.create_connection(self.alias)
+        wrapper.settings_dict = {**wrapper.settings_dict, "CONN_MAX_AGE": None, "CONN_HEALTH_CHECKS": True}
+        wrapper.inc_thread_sharing()
+        with self.lock:
+            self.wrappers.append(wrapper)
+        return wrapper
+
+    def acquire(self):
+        """
+        Description: emprunte une connexion (la dernière rendue, la plus susceptible d'être encore ouverte).
+        Elle est fermée (et rouverte à sa 1ère requête) si elle a dépassé max_age ou si une erreur l'a rendue
+        inutilisable.
+        """
+        self.slots.acquire()
+        try:
+            wrapper = self.idle.get_nowait()
+        except queue.Empty:
+            wrapper = self.create()
+        if self.expires.get(wrapper, math.inf) <= monotonic():
+            del self.expires[wrapper]
+            wrapper.close()
+        wrapper.close_if_unusable_or_obsolete()
+        return wrapper
+
+    def release(self, wrapper):
+        """
+        Description: rend une connexion. Une connexion rendue dans une transaction (atomic non refermé)
+        est fermée et écartée de la réserve.
+        """
+        if wrapper.in_atomic_block:
+            wrapper.close()
+            with self.lock:
+                self.wrappers.remove(wrapper)
+        else:
+            if wrapper.connection is None:
+                self.expires.pop(wrapper, None)
+            else:
+                self.expires.setdefault(wrapper, monotonic() + self.max_age)
+            self.idle.put(wrapper)
+        self.slots.release()
+
+    def install(self):
+        """
+        Description: emprunte une connexion et l'installe comme connexion du thread courant.
+        Retourne ce qu'il faut passer à uninstall: la connexion empruntée et celle qu'elle remplace.
+        """
+        previous = getattr(connections._connections, self.alias, None)
+        wrapper = self.acquire()
+        connections[self.alias] = wrapper
+        return wrapper, previous
+
+    def uninstall(self, installed):
+        wrapper, previous = installed
+        if previous is None:
+            del connections[self.alias]
+        else:
+            connections[self.alias] = previous
+        self.release(wrapper)
+
+    @contextmanager
+    def connection(self):
+        installed = self.install()
+        try:
+            yield installed[0]
+        finally:
+            self.uninstall(installed)
+
+    async def run(self, function, *args, **kwargs):
+        """
+        Description: exécute function (synchrone, ORM) dans un thread, avec une connexion de la réserve:
+        await pool.run(Projects.objects.count)
+        """
+
+        def call():
+            with self.connection():
+                return function(*args, **kwargs)
+
+        return await sync_to_async(call, thread_sensitive=False)()
+
+    def close_all(self):
+        with self.lock:
+            wrappers = list(self.wrappers)
+        for wrapper in wrappers:
+            wrapper.close()
+
+
+class ConnectionPoolMiddleware:
+    """
+    Description: middleware ASGI (asgi.py): chaque requête HTTP emprunte une connexion de la réserve pour toute
+    la durée de son traitement, dans le thread où Django exécute la requête (contexte ThreadSensitiveContext,
+    repris par le handler ASGI de Django), et la rend à la fin, réponse envoyée ou client déconnecté.
+    """
+
+    def __init__(self, application, pool):
+        self.application = application
+        self.pool = pool
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.application(scope, receive, send)
+        async with ThreadSensitiveContext():
+            installed = await sync_to_async(self.pool.install)()
+            try:
+                await self.application(scope, receive, send)
+            finally:
+                await sync_to_async(self.pool.uninstall)(installed)
+
+
+pool = ConnectionPool()
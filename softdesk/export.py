@@ -0,0 +1,135 @@
+from datetime import datetime
+from uuid import UUID
+import csv
+import json
+
+from django.conf import settings
+
+from softdesk.models import Issues, Comments
+
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+ISSUE_FIELDS = [
+    "id",
+    "title",
+    "description",
+    "balise",
+    "priority",
+    "status",
+    "project_id",
+    "author_user_id",
+    "assignee_user_id",
+    "created_time",
+]
+COMMENT_FIELDS = [
+    "id",
+    "uuid",
+    "title",
+    "description",
+    "author_user_id",
+    "issue_id",
+    "created_time",
+]
+CSV_FIELDS = ["record"] + ISSUE_FIELDS + ["issue_id", "uuid"]
+
+
+def format_value(value):
+    if isinstance(value, datetime):
+        return value.strftime(settings.REST_FRAMEWORK["DATETIME_FORMAT"])
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def format_row(row):
+    return {field: format_value(value) for field, value in row.items()}
+
+
+def iter_comments(issues_ids, chunk_size):
+    """
+    Description: commentaires d'un lot de problèmes, ordonnés par problème puis par date de création.
+    SQLite parcourt l'index (issue_id, created_time) pour chaque identifiant du lot, sans tri temporaire.
+    """
+    return (
+        Comments.objects.filter(issue_id__in=issues_ids)
+        .order_by("issue_id", "created_time", "id")
+        .values(*COMMENT_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def merge_issues_comments(issues, comments):
+    comment = next(comments, None)
+    for issue in issues:
+        issue_comments = []
+        while comment is not None and comment["issue_id"] == issue["id"]:
+            issue_comments.append(format_row(comment))
+            comment = next(comments, None)
+        yield format_row(issue), issue_comments
+
+
+def iter_issues_with_comments(project_id, chunk_size=None):
+    """
+    Description: parcourt les problèmes d'un projet et leurs commentaires, sous forme de dictionnaires plats.
+    Les problèmes sont lus par lots de chunk_size, ordonnés par identifiant; les commentaires de chaque lot
+    sont lus par un second curseur, dans le même ordre, et fusionnés au fil de l'eau.
+    La mémoire utilisée ne dépend que de la taille d'un lot, pas de la taille du projet.
+    """
+    chunk_size = chunk_size or settings.SOFTDESK_EXPORT_CHUNK_SIZE
+    issues = (
+        Issues.objects.filter(project_id=project_id)
+        .order_by("id")
+        .values(*ISSUE_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    batch = []
+    for issue in issues:
+        batch.append(issue)
+        if len(batch) >= chunk_size:
+            yield from merge_issues_comments(
+                batch, iter_comments([row["id"] for row in batch], chunk_size)
+            )
+            batch = []
+    if batch:
+        yield from merge_issues_comments(
+            batch, iter_comments([row["id"] for row in batch], chunk_size)
+        )
+
+
+def export_ndjson(project_id, chunk_size=None):
+    """
+    Description: une ligne JSON par problème, avec ses commentaires imbriqués.
+    """
+    for issue, comments in iter_issues_with_comments(project_id, chunk_size):
+        issue["comments"] = comments
+        yield json.dumps(issue, ensure_ascii=False) + "\n"
+
+
+class Echo:
+    """
+    Description: pseudo fichier dont l'écriture retourne la ligne, pour produire le CSV ligne par ligne.
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_csv(project_id, chunk_size=None):
+    """
+    Description: une ligne par problème (record=issue) suivie d'une ligne par commentaire (record=comment).
+    """
+    writer = csv.DictWriter(Echo(), fieldnames=CSV_FIELDS, extrasaction="ignore")
+    yield writer.writerow(dict(zip(CSV_FIELDS, CSV_FIELDS)))
+    for issue, comments in iter_issues_with_comments(project_id, chunk_size):
+        yield writer.writerow(dict(issue, record="issue"))
+        for comment in comments:
+            yield writer.writerow(dict(comment, record="comment"))
+
+
+EXPORTERS = {
+    "ndjson": export_ndjson,
+    "csv": export_csv,
+}
@@ -0,0 +1,97 @@
+from functools import lru_cache
+
+from rest_framework import fields as drf_fields
+from rest_framework import relations
+from rest_framework.pagination import CursorPagination
+from rest_framework.settings import api_settings
+
+from softdesk.instrumentation import SERIALIZER_SPAN, span
+
+
+# champs dont la représentation est la valeur lue en base
+IDENTITY_FIELDS = (
+    drf_fields.BooleanField,
+    drf_fields.CharField,
+    drf_fields.ChoiceField,
+    drf_fields.IntegerField,
+    relations.PrimaryKeyRelatedField,
+)
+
+
+def compile_datetime(field):
+    """
+    Description: formatage d'une date, identique à DateTimeField.to_representation
+    (DATETIME_FORMAT de settings.REST_FRAMEWORK), sans ses contrôles répétés à chaque valeur.
+    """
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() == drf_fields.ISO_8601:
+        return field.to_representation
+    enforce_timezone = field.enforce_timezone
+
+    def to_representation(value):
+        return enforce_timezone(value).strftime(output_format)
+
+    return to_representation
+
+
+def compile_field(field):
+    if isinstance(field, drf_fields.DateTimeField):
+        return compile_datetime(field)
+    if isinstance(field, IDENTITY_FIELDS):
+        return None
+    return field.to_representation
+
+
+class ValuesSerializer:
+    """
+    Description: sérialisation en lecture seule d'une liste, depuis les lignes values_list() de la requête.
+    La correspondance colonne -> champ est compilée une seule fois depuis le sérialiseur DRF (mêmes champs,
+    même ordre, mêmes formats): le JSON produit est identique, sans instancier ni modèle ni sérialiseur par ligne.
+    Les sérialiseurs DRF restent ceux des écritures (validation) et des réponses imbriquées (?expand=...).
+    """
+
+    def __init__(self, serializer_class, fields=None):
+        kwargs = {} if fields is None else {"fields": list(fields)}
+        serializer = serializer_class(**kwargs)
+        self.names = []
+        self.columns = []
+        self.converters = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == "*" or "." in field.source:
+                # champ calculé, imbriqué ou traversant une relation: pas de colonne à lire
+                raise ValueError(f"Field '{name}' can not be read from values()")
+            self.names.append(name)
+            self.columns.append(field.source)
+            self.converters.append(compile_field(field))
+
+    def to_representation(self, row):
+        return {
+            name: value if convert is None or value is None else convert(value)
+            for name, convert, value in zip(self.names, self.converters, row)
+        }
+
+    def paginate(self, paginator, queryset, request):
+        """
+        Description: page de lignes (tuples) de la requête. La pagination par curseur lit sa position
+        (created_time, id) sur la dernière ligne: elle reçoit des dictionnaires values(), ramenés en tuples.
+        """
+        if isinstance(paginator, CursorPagination):
+            columns = list(dict.fromkeys(self.columns + list(paginator.ordering)))
+            page = paginator.paginate_queryset(queryset.values(*columns), request)
+            return [tuple(row[column] for column in self.columns) for row in page]
+        return paginator.paginate_queryset(queryset.values_list(*self.columns), request)
+
+    def data(self, rows):
+        to_representation = self.to_representation
+        with span(SERIALIZER_SPAN):
+            return [to_representation(row) for row in rows]
+
+
+@lru_cache(maxsize=64)
+def get_values_serializer(serializer_class, fields=None):
+    """
+    Description: ValuesSerializer compilé d'un sérialiseur (et d'une sélection de champs ?fields=...).
+    """
+    return ValuesSerializer(serializer_class, fields)
@@ -0,0 +1,68 @@
+from softdesk.serializers import UserSummarySerializer
+
+
+FIELDS_QUERY_PARAM = "fields"
+EXPAND_QUERY_PARAM = "expand"
+# colonnes toujours lues: la clé primaire et l'ordre de la pagination par curseur (created_time, id)
+ALWAYS_LOADED_FIELDS = ["id", "created_time"]
+
+
+def split_query_param(request, name):
+    value = request.query_params.get(name, "")
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
+class Fieldset:
+    """
+    Description: champs demandés (?fields=id,title) et utilisateurs à imbriquer (?expand=author,assignee)
+    pour une liste sérialisée par serializer_class (un SparseFieldsetMixin).
+    La même sélection réduit le sérialiseur et la requête: .only() sur les colonnes des champs retournés,
+    select_related() sur les utilisateurs imbriqués. Une page reste lue en une seule requête.
+    Si un nom est inconnu, error contient le message de la réponse 400.
+    """
+
+    def __init__(self, request, serializer_class):
+        self.serializer_class = serializer_class
+        self.fields = split_query_param(request, FIELDS_QUERY_PARAM) or None
+        self.expand = list(dict.fromkeys(split_query_param(request, EXPAND_QUERY_PARAM)))
+        self.error = None
+
+        known_fields = list(serializer_class().fields)
+        for name in self.fields or []:
+            if name not in known_fields:
+                self.error = f"Field '{name}' unknow. Authorized values: {', '.join(known_fields)}"
+                return
+        for name in self.expand:
+            if name not in serializer_class.expandable_fields:
+                self.error = (
+                    f"Expansion '{name}' unknow. Authorized values: {', '.join(serializer_class.expandable_fields)}"
+                )
+                return
+
+    def is_default(self):
+        return self.fields is None and not self.expand
+
+    def fields_key(self):
+        """
+        Description: sélection des champs sous une forme hachable (clé du sérialiseur compilé), None pour tous.
+        """
+        return None if self.fields is None else tuple(self.fields)
+
+    def serializer_kwargs(self):
+        return {"fields": self.fields, "expand": self.expand}
+
+    def apply(self, queryset):
+        if self.is_default():
+            return queryset
+        model_fields = {field.name for field in queryset.model._meta.concrete_fields}
+        fields = self.fields if self.fields is not None else list(self.serializer_class().fields)
+        only = [name for name in ALWAYS_LOADED_FIELDS + fields if name in model_fields]
+        related = [self.serializer_class.expandable_fields[name] for name in self.expand]
+        for source in related:
+            # la clé étrangère doit être lue pour être traversée par la jointure
+            only.append(source)
+            only += [f"{source}__{name}" for name in UserSummarySerializer.only_fields]
+        queryset = queryset.only(*dict.fromkeys(only))
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset
@@ -0,0 +1,206 @@
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+import json
+import logging
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import serializers
+from rest_framework.permissions import BasePermission
+
+
+logger = logging.getLogger(__name__)
+
+DB_SPAN = "db"
+PERMISSIONS_SPAN = "permissions"
+SERIALIZER_SPAN = "serializer"
+RENDER_SPAN = "render"
+
+# mesures de la requête en cours (None hors requête ou si l'instrumentation est désactivée)
+current_recorder = ContextVar("softdesk_recorder", default=None)
+
+
+class Recorder:
+    """
+    Description: durées cumulées (en secondes) et nombre d'occurrences des étapes d'une requête.
+    Une étape imbriquée dans une étape de même nom (une permission qui en appelle une autre, un sérialiseur
+    imbriqué) n'est comptée qu'une fois: seule la plus externe est mesurée.
+    """
+
+    def __init__(self):
+        self.durations = {}
+        self.counts = {}
+        self.depths = {}
+
+    def enter(self, name):
+        depth = self.depths.get(name, 0)
+        self.depths[name] = depth + 1
+        return depth == 0
+
+    def leave(self, name, duration):
+        self.depths[name] -= 1
+        if duration is not None:
+            self.add(name, duration)
+
+    def add(self, name, duration):
+        self.durations[name] = self.durations.get(name, 0.0) + duration
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def execute(self, execute, sql, params, many, context):
+        """
+        Description: enveloppe des curseurs (connection.execute_wrapper): nombre et durée des requêtes SQL.
+        """
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add(DB_SPAN, perf_counter() - start)
+
+
+class span:
+    """
+    Description: mesure une étape de la requête en cours: with span("permissions"): ...
+    Sans requête instrumentée, le coût se limite à la lecture d'une ContextVar.
+    """
+
+    __slots__ = ("name", "recorder", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.recorder = current_recorder.get()
+        if self.recorder is not None:
+            self.start = perf_counter() if self.recorder.enter(self.name) else None
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.recorder is not None:
+            duration = None if self.start is None else perf_counter() - self.start
+            self.recorder.leave(self.name, duration)
+        return False
+
+
+def timed(name):
+    """
+    Description: décorateur d'une méthode mesurée comme l'étape name.
+    """
+
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if current_recorder.get() is None:
+                return function(*args, **kwargs)
+            with span(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class SpanPermission(BasePermission):
+    """
+    Description: classe de base des permissions de softdesk: leurs contrôles sont mesurés dans l'étape
+    'permissions', qu'ils soient appelés par Django REST framework ou directement par les vues.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for method in ["has_permission", "has_object_permission"]:
+            if method in cls.__dict__:
+                setattr(cls, method, timed(PERMISSIONS_SPAN)(cls.__dict__[method]))
+
+
+class SpanModelSerializer(serializers.ModelSerializer):
+    """
+    Description: classe de base des sérialiseurs de softdesk: représentation et validation sont mesurées
+    dans l'étape 'serializer'.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for method in ["to_representation", "run_validation"]:
+            if method in cls.__dict__:
+                setattr(cls, method, timed(SERIALIZER_SPAN)(cls.__dict__[method]))
+
+    @timed(SERIALIZER_SPAN)
+    def to_representation(self, instance):
+        return super().to_representation(instance)
+
+    @timed(SERIALIZER_SPAN)
+    def run_validation(self, *args, **kwargs):
+        return super().run_validation(*args, **kwargs)
+
+
+def server_timing(recorder, total):
+    db_duration = recorder.durations.get(DB_SPAN, 0.0) * 1000
+    metrics = [f'{DB_SPAN};dur={db_duration:.1f};desc="{recorder.counts.get(DB_SPAN, 0)} queries"']
+    for name in [PERMISSIONS_SPAN, SERIALIZER_SPAN, RENDER_SPAN]:
+        if name in recorder.durations:
+            metrics.append(f"{name};dur={recorder.durations[name] * 1000:.1f}")
+    metrics.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(metrics)
+
+
+class InstrumentationMiddleware:
+    """
+    Description: mesure par requête du nombre et de la durée des requêtes SQL, et des durées des permissions,
+    des sérialiseurs et du rendu. Les mesures sont retournées dans l'en-tête Server-Timing et journalisées
+    (une ligne JSON par requête, logger softdesk.instrumentation).
+    Désactivé (SOFTDESK_INSTRUMENTATION), le middleware est retiré de la chaîne dès le démarrage.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SOFTDESK_INSTRUMENTATION:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = Recorder()
+        token = current_recorder.set(recorder)
+        start = perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(recorder.execute))
+                response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        total = perf_counter() - start
+
+        response["Server-Timing"] = server_timing(recorder, total)
+        match = getattr(request, "resolver_match", None)
+        logger.info(
+            json.dumps(
+                {
+                    "method": request.method,
+                    "path": request.path,
+                    "view": match.url_name if match is not None else None,
+                    "status": response.status_code,
+                    "queries": recorder.counts.get(DB_SPAN, 0),
+                    "total_ms": round(total * 1000, 1),
+                    **{
+                        f"{name}_ms": round(duration * 1000, 1)
+                        for name, duration in recorder.durations.items()
+                    },
+                }
+            )
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        """
+        Description: le rendu (réponses de Django REST framework) a lieu après ce point: sa durée est mesurée
+        jusqu'au rappel qui suit le rendu.
+        """
+        recorder = current_recorder.get()
+        if recorder is not None:
+            start = perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: recorder.add(RENDER_SPAN, perf_counter() - start)
+            )
+        return response
@@ -0,0 +1,154 @@
+from datetime import timedelta
+from threading import Event, Lock, Thread
+import traceback
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils.timezone import now
+
+from softdesk.models import Jobs
+
+
+JOB_HANDLERS = {}
+
+_worker = None
+_worker_lock = Lock()
+_wakeup = Event()
+
+
+def register_job(kind):
+    """
+    Description: décorateur associant un type de traitement à la fonction qui l'exécute.
+    La fonction reçoit le traitement (Jobs) et une fonction report(step, **progress) pour publier son avancement.
+    Un traitement interrompu (arrêt du processus) est relancé depuis le début: la fonction doit être rejouable.
+    """
+
+    def decorator(handler):
+        JOB_HANDLERS[kind] = handler
+        return handler
+
+    return decorator
+
+
+def report_progress(job, step, **progress):
+    job.progress[step] = progress
+    job.updated_time = now()
+    Jobs.objects.filter(id=job.id).update(
+        progress=job.progress, updated_time=job.updated_time
+    )
+
+
+def run_job(job_id):
+    """
+    Description: réserve un traitement en attente, l'exécute et enregistre son statut final (done ou failed).
+    Retourne None si le traitement n'est plus en attente (déjà réservé par un autre worker).
+    """
+    claimed = Jobs.objects.filter(id=job_id, status=Jobs.PENDING).update(
+        status=Jobs.RUNNING, updated_time=now()
+    )
+    if not claimed:
+        return None
+    job = Jobs.objects.get(id=job_id)
+    try:
+        JOB_HANDLERS[job.kind](
+            job, lambda step, **progress: report_progress(job, step, **progress)
+        )
+    except Exception:
+        job.status = Jobs.FAILED
+        job.error = traceback.format_exc()
+    else:
+        job.status = Jobs.DONE
+    job.updated_time = now()
+    Jobs.objects.filter(id=job.id).update(
+        status=job.status, error=job.error, updated_time=job.updated_time
+    )
+    return job
+
+
+def recover_interrupted_jobs():
+    """
+    Description: remet en attente les traitements en cours dont l'avancement n'a plus été mis à jour depuis
+    SOFTDESK_JOBS_STALE_AFTER secondes: le processus qui les exécutait a été arrêté.
+    """
+    stale_time = now() - timedelta(seconds=settings.SOFTDESK_JOBS_STALE_AFTER)
+    return Jobs.objects.filter(status=Jobs.RUNNING, updated_time__lt=stale_time).update(
+        status=Jobs.PENDING
+    )
+
+
+def next_pending_job_id():
+    return (
+        Jobs.objects.filter(status=Jobs.PENDING)
+        .order_by("id")
+        .values_list("id", flat=True)
+        .first()
+    )
+
+
+def run_pending_jobs():
+    """
+    Description: exécute, un par un et dans l'ordre de création, les traitements en attente.
+    """
+    jobs = []
+    recover_interrupted_jobs()
+    job_id = next_pending_job_id()
+    while job_id is not None:
+        job = run_job(job_id)
+        if job is not None:
+            jobs.append(job)
+        job_id = next_pending_job_id()
+    return jobs
+
+
+def work():
+    """
+    Description: boucle du worker: exécute les traitements en attente, puis attend un nouveau traitement
+    (ou SOFTDESK_JOBS_POLL_INTERVAL secondes). Un seul traitement à la fois: un seul écrivain SQLite.
+    """
+    while True:
+        close_old_connections()
+        try:
+            run_pending_jobs()
+        except Exception:
+            # base indisponible (ou table absente avant migration): nouvel essai au prochain réveil
+            connection.close()
+        _wakeup.wait(settings.SOFTDESK_JOBS_POLL_INTERVAL)
+        _wakeup.clear()
+
+
+def ensure_worker(**kwargs):
+    """
+    Description: démarre le worker du processus s'il ne tourne pas encore.
+    Appelé à la 1ère requête servie: les traitements en attente lors d'un redémarrage sont repris.
+    """
+    global _worker
+    if settings.SOFTDESK_JOBS_EAGER:
+        return None
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = Thread(target=work, name="softdesk-jobs", daemon=True)
+            _worker.start()
+    return _worker
+
+
+def wake_worker():
+    ensure_worker()
+    _wakeup.set()
+
+
+def enqueue_job(kind, payload=None, created_by=None):
+    """
+    Description: enregistre un traitement en attente; le worker le prend en charge une fois la transaction
+    courante validée. Avec SOFTDESK_JOBS_EAGER (environnement de test) le traitement est exécuté immédiatement.
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind '{kind}'")
+    job = Jobs.objects.create(
+        kind=kind, payload=payload or {}, created_by_id=created_by
+    )
+    if settings.SOFTDESK_JOBS_EAGER:
+        run_job(job.id)
+        job.refresh_from_db()
+    else:
+        transaction.on_commit(wake_worker)
+    return job
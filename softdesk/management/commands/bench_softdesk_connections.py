@@ -0,0 +1,156 @@
+from time import perf_counter
+from wsgiref.util import setup_testing_defaults
+import asyncio
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from colorama import Fore, Style
+
+from authentication.tokens import SoftdeskTokenObtainPairSerializer
+from softdesk.db_pool import ConnectionPool, ConnectionPoolMiddleware
+from softdesk.models import Contributors
+
+
+class Command(BaseCommand):
+    help = (
+        "Script dédié à mesurer le gain par requête des connexions persistantes (WSGI, CONN_MAX_AGE) et de la "
+        "réserve de connexions (ASGI, softdesk.db_pool), sur la base courante. Un corpus est généré par "
+        "init_app_softdesk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--path", default="/projects/")
+
+    def count_connections(self, function):
+        """
+        Description: durée d'exécution de function et nombre de connexions ouvertes pendant celle-ci.
+        """
+        opened = []
+
+        def receiver(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        connection_created.connect(receiver, dispatch_uid="bench_softdesk_connections")
+        try:
+            start = perf_counter()
+            function()
+            elapsed = perf_counter() - start
+        finally:
+            connection_created.disconnect(dispatch_uid="bench_softdesk_connections")
+        return elapsed, len(opened)
+
+    def report(self, label, requests, elapsed, opened):
+        print(
+            f"{Fore.GREEN}[{label}: {requests / elapsed:,.0f} REQ/S, {elapsed * 1000 / requests:.2f} MS/REQ, "
+            f"{opened} CONNECTIONS OPENED]{Style.RESET_ALL}"
+        )
+        return elapsed / requests
+
+    def wsgi_requests(self, path, token, requests):
+        handler = WSGIHandler()
+        for index in range(requests):
+            environ = {"PATH_INFO": path, "REQUEST_METHOD": "GET", "HTTP_AUTHORIZATION": f"Bearer {token}"}
+            setup_testing_defaults(environ)
+            response = handler(environ, lambda status, headers: None)
+            if response.status_code != 200:
+                raise CommandError(f"GET {path}: {response.status_code}")
+            b"".join(response)
+            # fin de la requête (request_finished): la connexion est fermée ou conservée selon CONN_MAX_AGE
+            response.close()
+
+    def asgi_requests(self, application, path, token, requests, concurrency):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(b"host", b"localhost"), (b"authorization", f"Bearer {token}".encode())],
+            "server": ("localhost", 80),
+            "client": ("127.0.0.1", 0),
+        }
+
+        async def request():
+            messages = [{"type": "http.request", "body": b"", "more_body": False}]
+            statuses = []
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                # pas de déconnexion du client: la tâche d'écoute est annulée une fois la réponse envoyée
+                await asyncio.Event().wait()
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    statuses.append(message["status"])
+
+            await application(dict(scope), receive, send)
+            if statuses != [200]:
+                raise CommandError(f"GET {path}: {statuses}")
+
+        async def worker(count):
+            for index in range(count):
+                await request()
+
+        async def main():
+            counts = [requests // concurrency + (index < requests % concurrency) for index in range(concurrency)]
+            await asyncio.gather(*(worker(count) for count in counts))
+
+        asyncio.run(main())
+
+    def handle(self, *args, **kwargs):
+        requests, concurrency, path = kwargs["requests"], kwargs["concurrency"], kwargs["path"]
+        contributor = Contributors.objects.select_related("user_id").order_by("id").first()
+        if contributor is None:
+            raise CommandError("La base ne contient aucun projet: lancer init_app_softdesk")
+        token = str(SoftdeskTokenObtainPairSerializer.get_token(contributor.user_id).access_token)
+
+        settings_dict = connections["default"].settings_dict
+        max_age = settings_dict["CONN_MAX_AGE"] or 600
+        initial = settings_dict["CONN_MAX_AGE"], settings_dict["CONN_HEALTH_CHECKS"]
+        try:
+            durations = {}
+            for label, conn_max_age, health_checks in [
+                ("WSGI CONN_MAX_AGE=0", 0, False),
+                (f"WSGI CONN_MAX_AGE={max_age}", max_age, False),
+                (f"WSGI CONN_MAX_AGE={max_age} + HEALTH CHECKS", max_age, True),
+            ]:
+                connections["default"].close()
+                settings_dict["CONN_MAX_AGE"], settings_dict["CONN_HEALTH_CHECKS"] = conn_max_age, health_checks
+                elapsed, opened = self.count_connections(lambda: self.wsgi_requests(path, token, requests))
+                durations[label] = self.report(label, requests, elapsed, opened)
+            saving = (durations["WSGI CONN_MAX_AGE=0"] - durations[f"WSGI CONN_MAX_AGE={max_age}"]) * 1000
+            print(f"{Fore.YELLOW}[WSGI: {saving:.2f} MS SAVED PER REQUEST]{Style.RESET_ALL}")
+
+            # sous ASGI, Django recommande de désactiver les connexions persistantes: sans réserve,
+            # chaque requête ouvre sa connexion dans son propre thread
+            connections["default"].close()
+            settings_dict["CONN_MAX_AGE"], settings_dict["CONN_HEALTH_CHECKS"] = 0, False
+            label = f"ASGI x{concurrency} CONN_MAX_AGE=0"
+            elapsed, opened = self.count_connections(
+                lambda: self.asgi_requests(ASGIHandler(), path, token, requests, concurrency)
+            )
+            without_pool = self.report(label, requests, elapsed, opened)
+
+            # la réserve garde ses connexions (SOFTDESK_DB_POOL_MAX_AGE) quel que soit CONN_MAX_AGE
+            pool = ConnectionPool()
+            application = ConnectionPoolMiddleware(ASGIHandler(), pool)
+            label = f"ASGI x{concurrency} POOL OF {pool.size}"
+            elapsed, opened = self.count_connections(
+                lambda: self.asgi_requests(application, path, token, requests, concurrency)
+            )
+            pool.close_all()
+            with_pool = self.report(label, requests, elapsed, opened)
+            saving = (without_pool - with_pool) * 1000
+            print(f"{Fore.YELLOW}[ASGI: {saving:.2f} MS SAVED PER REQUEST]{Style.RESET_ALL}")
+        finally:
+            connections["default"].close()
+            settings_dict["CONN_MAX_AGE"], settings_dict["CONN_HEALTH_CHECKS"] = initial
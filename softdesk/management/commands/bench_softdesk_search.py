@@ -0,0 +1,82 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+from colorama import Fore, Style
+
+from softdesk.models import Comments, Contributors, Issues
+from softdesk.search import install_search_index, search
+from softdesk.synthetic import WORDS
+
+
+def percentile(values, rank):
+    values = sorted(values)
+    return values[round(rank * (len(values) - 1))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Script dédié à mesurer la recherche plein texte sur la base courante. "
+        "Un corpus d'un million de commentaires est généré par: init_app_softdesk --users 20000 --projects 5000 "
+        "--issues-per-project 40 --comments-per-issue 5"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--terms", nargs="+", default=WORDS[-10:])
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--limit", type=int, default=10)
+        # comparaison avec une recherche par LIKE (parcours complet des tables): lente sur un gros corpus
+        parser.add_argument("--like", action="store_true")
+
+    def measure(self, label, function, repeat):
+        timings = []
+        for index in range(repeat):
+            start = perf_counter()
+            function()
+            timings.append((perf_counter() - start) * 1000)
+        print(
+            f"{Fore.GREEN}[{label}: p50 {percentile(timings, 0.5):.1f} ms, "
+            f"p95 {percentile(timings, 0.95):.1f} ms]{Style.RESET_ALL}"
+        )
+
+    def handle(self, *args, **kwargs):
+        install_search_index()
+        print(
+            f"{Fore.YELLOW}[CORPUS: {Issues.objects.count()} ISSUES, "
+            f"{Comments.objects.count()} COMMENTS]{Style.RESET_ALL}"
+        )
+        # l'utilisateur qui contribue au plus grand nombre de projets: le périmètre le plus coûteux
+        member = (
+            Contributors.objects.values("user_id")
+            .annotate(projects=Count("project_id", distinct=True))
+            .order_by("-projects")
+            .first()
+        )
+        project_ids = []
+        if member is not None:
+            project_ids = list(
+                Contributors.objects.filter(user_id=member["user_id"])
+                .values_list("project_id", flat=True)
+                .distinct()
+            )
+        print(f"{Fore.YELLOW}[MEMBER SCOPE: {len(project_ids)} PROJECTS]{Style.RESET_ALL}")
+
+        repeat, limit = kwargs["repeat"], kwargs["limit"]
+        for term in kwargs["terms"]:
+            self.measure(f"FTS5 '{term}' ALL PROJECTS", lambda: search(term, None, limit), repeat)
+            self.measure(f"FTS5 '{term}' MEMBER SCOPE", lambda: search(term, project_ids, limit), repeat)
+            self.measure(
+                f"FTS5 '{term}' PAGE 10",
+                lambda: search(term, project_ids, limit, offset=9 * limit),
+                repeat,
+            )
+            if kwargs["like"]:
+                text_filter = Q(title__icontains=term) | Q(description__icontains=term)
+                self.measure(
+                    f"LIKE '{term}' MEMBER SCOPE, UNRANKED",
+                    lambda: list(
+                        Comments.objects.filter(text_filter, issue_id__project_id__in=project_ids)
+                        .values_list("id", flat=True)[:limit]
+                    ),
+                    repeat,
+                )
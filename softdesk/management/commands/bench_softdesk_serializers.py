@@ -0,0 +1,56 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from colorama import Fore, Style
+
+from softdesk.fast_serializers import ValuesSerializer
+from softdesk.models import Comments, Issues, Projects
+from softdesk.serializers import CommentListSerializer, IssuesSerializer, ProjectListSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Script dédié à comparer le débit (lignes sérialisées par seconde) des listes sérialisées par DRF "
+        "et depuis des lignes values(), sur la base courante. Un corpus est généré par init_app_softdesk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def measure(self, label, function, repeat):
+        """
+        Description: meilleur temps sur repeat exécutions (requête comprise), en lignes par seconde.
+        """
+        best, rows = None, 0
+        for index in range(repeat):
+            start = perf_counter()
+            rows = len(function())
+            elapsed = perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        rate = rows / best if best else 0
+        print(f"{Fore.GREEN}[{label}: {rows} ROWS, {rate:,.0f} ROWS/S]{Style.RESET_ALL}")
+        return rate
+
+    def handle(self, *args, **kwargs):
+        rows, repeat = kwargs["rows"], kwargs["repeat"]
+        cases = [
+            ("PROJECTS", ProjectListSerializer, Projects.objects.all()),
+            ("ISSUES", IssuesSerializer, Issues.objects.all()),
+            ("COMMENTS", CommentListSerializer, Comments.objects.all()),
+        ]
+        for label, serializer_class, queryset in cases:
+            page = queryset.order_by("id")
+            fast_serializer = ValuesSerializer(serializer_class)
+            drf_rate = self.measure(
+                f"{label} DRF",
+                lambda: serializer_class(page[:rows], many=True).data,
+                repeat,
+            )
+            values_rate = self.measure(
+                f"{label} VALUES",
+                lambda: fast_serializer.data(page.values_list(*fast_serializer.columns)[:rows]),
+                repeat,
+            )
+            if drf_rate:
+                print(f"{Fore.YELLOW}[{label}: x{values_rate / drf_rate:.1f}]{Style.RESET_ALL}")
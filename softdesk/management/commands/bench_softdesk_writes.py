@@ -0,0 +1,166 @@
+from time import monotonic, perf_counter
+import os
+import sqlite3
+import tempfile
+import threading
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+from colorama import Fore, Style
+
+from softdesk.models import Comments, Issues, Projects
+from softdesk.sqlite_profiles import SQLITE_PROFILES
+
+
+class Command(BaseCommand):
+    help = (
+        "Script dédié à comparer les profils de pragmas SQLite sous écritures concurrentes: des threads créent des "
+        "problèmes et des commentaires (compteurs et version du projet compris) pendant que d'autres lisent. "
+        "Chaque profil travaille sur sa copie de la base courante. Un corpus est généré par init_app_softdesk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiles", default=",".join(SQLITE_PROFILES))
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--readers", type=int, default=2)
+        parser.add_argument("--transactions", type=int, default=200, help="transactions par thread d'écriture")
+
+    def copy_database(self, directory, profile):
+        """
+        Description: copie cohérente de la base courante (API de sauvegarde de SQLite).
+        Le mode de journal est inscrit dans le fichier copié: la copie repart du journal de rollback,
+        sauf si le profil en choisit un autre.
+        """
+        path = os.path.join(directory, f"{profile}.sqlite3")
+        source = sqlite3.connect(connections["default"].settings_dict["NAME"])
+        target = sqlite3.connect(path)
+        try:
+            source.backup(target)
+            target.execute(f"PRAGMA journal_mode = {SQLITE_PROFILES[profile].get('journal_mode', 'DELETE')}")
+        finally:
+            source.close()
+            target.close()
+        return path
+
+    def write(self, alias, index, project_id, issue_id, user_id):
+        """
+        Description: une transaction de création d'un problème ou d'un commentaire, comme l'API.
+        """
+        with transaction.atomic(using=alias):
+            if index % 2:
+                Issues.objects.using(alias).create(
+                    title=f"bench {index}",
+                    description="bench",
+                    balise="BUG",
+                    priority="LOW",
+                    project_id_id=project_id,
+                    author_user_id_id=user_id,
+                    assignee_user_id_id=user_id,
+                )
+                Projects.objects.using(alias).filter(id=project_id).update(
+                    issues_count=F("issues_count") + 1,
+                    open_issues_count=F("open_issues_count") + 1,
+                    version=F("version") + 1,
+                )
+            else:
+                Comments.objects.using(alias).create(
+                    uuid=uuid.uuid4(),
+                    title=f"bench {index}",
+                    description="bench",
+                    author_user_id_id=user_id,
+                    issue_id_id=issue_id,
+                )
+                Issues.objects.using(alias).filter(id=issue_id).update(comments_count=F("comments_count") + 1)
+                Projects.objects.using(alias).filter(id=project_id).update(version=F("version") + 1)
+
+    def run_profile(self, alias, transactions, writers, readers, project_id, issue_id, user_id):
+        latencies, errors = [], []
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def writer():
+            try:
+                for index in range(transactions):
+                    start = perf_counter()
+                    try:
+                        self.write(alias, index, project_id, issue_id, user_id)
+                    except OperationalError as error:
+                        with lock:
+                            errors.append(str(error))
+                        continue
+                    with lock:
+                        latencies.append(perf_counter() - start)
+            finally:
+                connections[alias].close()
+
+        def reader():
+            try:
+                while not done.is_set():
+                    with transaction.atomic(using=alias):
+                        list(Issues.objects.using(alias).filter(project_id=project_id).values_list("id", "title"))
+                        list(Comments.objects.using(alias).filter(issue_id=issue_id).values_list("id", "title"))
+            except OperationalError as error:
+                with lock:
+                    errors.append(str(error))
+            finally:
+                connections[alias].close()
+
+        reader_threads = [threading.Thread(target=reader) for index in range(readers)]
+        writer_threads = [threading.Thread(target=writer) for index in range(writers)]
+        start = monotonic()
+        for thread in reader_threads + writer_threads:
+            thread.start()
+        for thread in writer_threads:
+            thread.join()
+        elapsed = monotonic() - start
+        done.set()
+        for thread in reader_threads:
+            thread.join()
+        return latencies, errors, elapsed
+
+    def handle(self, *args, **kwargs):
+        default = connections["default"]
+        if default.vendor != "sqlite" or default.is_in_memory_db():
+            raise CommandError("Le banc d'essai compare des profils SQLite: la base courante doit être un fichier")
+        profiles = [profile for profile in kwargs["profiles"].split(",") if profile]
+        unknown = [profile for profile in profiles if profile not in SQLITE_PROFILES]
+        if unknown:
+            raise CommandError(f"Profils inconnus: {', '.join(unknown)}")
+
+        issue = Issues.objects.order_by("id").values("id", "project_id").first()
+        user_id = get_user_model().objects.order_by("id").values_list("id", flat=True).first()
+        if issue is None or user_id is None:
+            raise CommandError("La base ne contient aucun problème: lancer init_app_softdesk")
+
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in profiles:
+                alias = f"bench_{profile}"
+                connections.settings[alias] = {
+                    **default.settings_dict,
+                    "NAME": self.copy_database(directory, profile),
+                    "SOFTDESK_SQLITE_PROFILE": profile,
+                }
+                try:
+                    latencies, errors, elapsed = self.run_profile(
+                        alias,
+                        kwargs["transactions"],
+                        kwargs["writers"],
+                        kwargs["readers"],
+                        issue["project_id"],
+                        issue["id"],
+                        user_id,
+                    )
+                finally:
+                    del connections.settings[alias]
+                latencies.sort()
+                p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0
+                locked = sum("locked" in error for error in errors)
+                color = Fore.GREEN if not errors else Fore.RED
+                print(
+                    f"{color}[{profile.upper()}: {len(latencies)} TRANSACTIONS, {len(latencies) / elapsed:,.0f} TX/S, "
+                    f"P95 {p95:.1f} MS, {locked} DATABASE IS LOCKED, {len(errors) - locked} OTHER ERRORS]"
+                    f"{Style.RESET_ALL}"
+                )
@@ -1,4 +1,4 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
 from colorama import Fore, Style
 import subprocess
@@ -7,6 +7,8 @@ import re
 import uuid
 
 from softdesk.models import Projects, Contributors, Issues, Comments
+from softdesk.counters import repair_projects_counters, repair_issues_counters
+from softdesk.synthetic import SyntheticDataGenerator
 
 
 SUPERUSER_NAME = "admin"
@@ -21,7 +23,23 @@ APPS = ["authentication", "softdesk"]
 class Command(BaseCommand):
     help = "Script dédié à initialiser une base de données en environnement de développement."
 
+    def add_arguments(self, parser):
+        # mode générateur: on ajoute un volume de données synthétiques aux données de démonstration
+        parser.add_argument("--users", type=int, default=0)
+        parser.add_argument("--projects", type=int, default=0)
+        parser.add_argument("--issues-per-project", type=int, default=0)
+        parser.add_argument("--comments-per-issue", type=int, default=0)
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument("--batch-size", type=int, default=5000)
+
     def handle(self, *args, **kwargs):
+        # contrôlé avant la suppression de la base
+        for option in ["users", "projects", "issues_per_project", "comments_per_issue"]:
+            if kwargs[option] < 0:
+                raise CommandError(f"--{option.replace('_', '-')} doit être positif ou nul")
+        if kwargs["batch_size"] < 1:
+            raise CommandError("--batch-size doit être au moins 1")
+
         print(f"{Fore.YELLOW}[REMOVING DATABASE]{Style.RESET_ALL}")
         if os.path.isfile(f"{DATABASE_PATH}"):
             subprocess.run(["rm", DATABASE_PATH])
@@ -263,3 +281,21 @@ class Command(BaseCommand):
             issue_id=issue,
         )
         print(f"{Fore.GREEN}[DUMMY COMMENTS ADDED]{Style.RESET_ALL}")
+
+        # les données sont ajoutées sans passer par l'API: on calcule les compteurs des projets et problèmes
+        repair_projects_counters()
+        repair_issues_counters()
+
+        if kwargs["users"] or kwargs["projects"]:
+            print(f"{Fore.YELLOW}[GENERATING SYNTHETIC DATA]{Style.RESET_ALL}")
+            generator = SyntheticDataGenerator(
+                users=kwargs["users"],
+                projects=kwargs["projects"],
+                issues_per_project=kwargs["issues_per_project"],
+                comments_per_issue=kwargs["comments_per_issue"],
+                seed=kwargs["seed"],
+                batch_size=kwargs["batch_size"],
+            )
+            for line in generator.run():
+                print(line)
+            print(f"{Fore.GREEN}[SYNTHETIC DATA GENERATED]{Style.RESET_ALL}")
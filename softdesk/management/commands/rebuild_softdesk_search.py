@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from colorama import Fore, Style
+
+from softdesk.search import install_search_index, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Script dédié à reconstruire l'index de recherche plein texte des problèmes et des commentaires."
+
+    def handle(self, *args, **kwargs):
+        print(f"{Fore.YELLOW}[REBUILDING SEARCH INDEX]{Style.RESET_ALL}")
+        install_search_index()
+        indexed = rebuild_search_index()
+        print(f"{Fore.GREEN}[ISSUES INDEXED: {indexed['issues']}]{Style.RESET_ALL}")
+        print(f"{Fore.GREEN}[COMMENTS INDEXED: {indexed['comments']}]{Style.RESET_ALL}")
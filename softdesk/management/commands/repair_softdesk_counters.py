@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from colorama import Fore, Style
+
+from softdesk.counters import repair_projects_counters, repair_issues_counters
+
+
+class Command(BaseCommand):
+    help = "Script dédié à recalculer les compteurs des projets et des problèmes, et à corriger ceux qui sont faux."
+
+    def handle(self, *args, **kwargs):
+        print(f"{Fore.YELLOW}[REPAIRING COUNTERS]{Style.RESET_ALL}")
+        with transaction.atomic():
+            projects = repair_projects_counters()
+            issues = repair_issues_counters()
+        print(f"{Fore.GREEN}[PROJECTS COUNTERS REPAIRED: {projects}]{Style.RESET_ALL}")
+        print(f"{Fore.GREEN}[ISSUES COUNTERS REPAIRED: {issues}]{Style.RESET_ALL}")
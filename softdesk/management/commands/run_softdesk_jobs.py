@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from colorama import Fore, Style
+
+from softdesk.jobs import run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Script dédié à exécuter les traitements en attente (ou interrompus), hors du serveur d'application."
+
+    def handle(self, *args, **kwargs):
+        print(f"{Fore.YELLOW}[RUNNING PENDING JOBS]{Style.RESET_ALL}")
+        for job in run_pending_jobs():
+            color = Fore.GREEN if job.status == job.DONE else Fore.RED
+            print(f"{color}[JOB {job.id} {job.kind}: {job.status}]{Style.RESET_ALL}")
+        print(f"{Fore.GREEN}[NO MORE PENDING JOBS]{Style.RESET_ALL}")
@@ -0,0 +1,201 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import CharField, Value
+
+from softdesk.models import Comments, Contributors, Issues, Projects
+
+
+def get_membership_cache():
+    return caches[settings.SOFTDESK_MEMBERSHIP_CACHE]
+
+
+def memberships_cache_key(user_id):
+    return f"softdesk:memberships:{user_id}"
+
+
+def _delete_cache_key(key):
+    get_membership_cache().delete(key)
+    # on invalide aussi au commit: une requête concurrente a pu relire l'état précédant la transaction
+    transaction.on_commit(lambda: get_membership_cache().delete(key))
+
+
+def invalidate_user_memberships(user_id):
+    """
+    Description: invalide les contributions mises en cache d'un utilisateur.
+    """
+    if user_id is not None:
+        _delete_cache_key(memberships_cache_key(user_id))
+
+
+def invalidate_all_memberships():
+    """
+    Description: vide le cache des contributions, après une écriture en masse qui ne déclenche pas les signaux.
+    """
+    get_membership_cache().clear()
+    transaction.on_commit(lambda: get_membership_cache().clear())
+
+
+class ProjectMembership:
+    """
+    Description: résolveur des contributions de l'utilisateur, propre à une requête.
+    Les rôles (projet, rôle) de l'utilisateur et le statut du projet ciblé par l'url sont chargés
+    en une seule requête SQL, au premier besoin d'une permission ou d'une vue.
+    Les lectures suivantes se font depuis cet objet en mémoire.
+    Les problèmes et commentaires ne sont lus que dans le projet (et le problème) de l'url.
+    Entre les requêtes, les contributions (par utilisateur) sont conservées SOFTDESK_MEMBERSHIP_CACHE_TIMEOUT
+    secondes dans le cache SOFTDESK_MEMBERSHIP_CACHE. Les invalidations n'atteignent que ce cache: avec plusieurs
+    processus, il doit être partagé (sinon la durée par défaut, quelques secondes, borne l'écart entre processus).
+    Le statut des projets, qui décide des écritures, est toujours lu en base.
+    """
+
+    def __init__(self, user, project_id=None, issue_id=None):
+        self.user_id = getattr(user, "id", None)
+        self.project_id = project_id
+        self.issue_id = issue_id
+        self._roles = None
+        self._statuses = {}
+        self._other_users_roles = {}
+        self._issues = {}
+        self._comments = {}
+
+    def _load(self):
+        cache = get_membership_cache()
+        if self.user_id is None:
+            cached_roles = {}
+        else:
+            cached_roles = cache.get(memberships_cache_key(self.user_id))
+        if cached_roles is not None:
+            self._roles = {
+                project_id: set(roles) for project_id, roles in cached_roles.items()
+            }
+            return
+
+        self._roles = {}
+        # une seule requête: les contributions de l'utilisateur (via l'index unique qui commence par user_id)
+        # réunies au projet ciblé par l'url (via sa clé primaire), sans parcourir la table des projets
+        contributions = Contributors.objects.filter(user_id=self.user_id).values_list(
+            "project_id", "project_id__status", "role"
+        )
+        project = (
+            Projects.objects.filter(id=self.project_id)
+            .annotate(role=Value(None, output_field=CharField()))
+            .values_list("id", "status", "role")
+        )
+        rows = contributions.union(project, all=True)
+        for project_id, project_status, role in rows:
+            self._statuses[project_id] = project_status
+            if role is not None:
+                self._roles.setdefault(project_id, set()).add(role)
+        if self.project_id is not None:
+            self._statuses.setdefault(self.project_id, None)
+
+        timeout = settings.SOFTDESK_MEMBERSHIP_CACHE_TIMEOUT
+        if self.user_id is not None:
+            cache.set(
+                memberships_cache_key(self.user_id),
+                {project_id: sorted(roles) for project_id, roles in self._roles.items()},
+                timeout,
+            )
+
+    @property
+    def roles(self):
+        """
+        Description: dictionnaire {project_id: {rôles}} de l'utilisateur de la requête.
+        """
+        if self._roles is None:
+            self._load()
+        return self._roles
+
+    def project_ids(self):
+        return set(self.roles)
+
+    def project_status(self, project_id):
+        """
+        Description: statut du projet, ou None si le projet n'existe pas. Lu en base (pas de cache entre requêtes),
+        avec les contributions si elles ne sont pas en cache.
+        """
+        project_id = int(project_id)
+        if self._roles is None:
+            self._load()
+        if project_id not in self._statuses:
+            self._statuses[project_id] = (
+                Projects.objects.filter(id=project_id)
+                .values_list("status", flat=True)
+                .first()
+            )
+        return self._statuses[project_id]
+
+    def project_exists(self, project_id):
+        return self.project_status(project_id) is not None
+
+    def is_contributor(self, project_id):
+        return len(self.roles.get(int(project_id), set())) > 0
+
+    def is_author(self, project_id):
+        return Contributors.AUTHOR in self.roles.get(int(project_id), set())
+
+    def user_roles(self, project_id, user_id):
+        """
+        Description: rôles d'un utilisateur quelconque dans un projet.
+        Pour l'utilisateur de la requête on lit les rôles déjà chargés, sinon on mémorise la requête.
+        """
+        try:
+            project_id, user_id = int(project_id), int(user_id)
+        except (TypeError, ValueError):
+            return set()
+        if user_id == self.user_id:
+            return self.roles.get(project_id, set())
+        key = (project_id, user_id)
+        if key not in self._other_users_roles:
+            self._other_users_roles[key] = set(
+                Contributors.objects.filter(project_id=project_id)
+                .filter(user_id=user_id)
+                .values_list("role", flat=True)
+            )
+        return self._other_users_roles[key]
+
+    def issue(self, issue_id):
+        """
+        Description: problème mémorisé pour la requête, ou None s'il n'existe pas dans le projet de l'url.
+        """
+        issue_id = int(issue_id)
+        if issue_id not in self._issues:
+            issues = Issues.objects.filter(id=issue_id)
+            if self.project_id is not None:
+                issues = issues.filter(project_id=self.project_id)
+            self._issues[issue_id] = issues.first()
+        return self._issues[issue_id]
+
+    def comment(self, comment_id):
+        """
+        Description: commentaire mémorisé pour la requête, ou None s'il n'existe pas dans le problème de l'url.
+        """
+        comment_id = int(comment_id)
+        if comment_id not in self._comments:
+            comments = Comments.objects.filter(id=comment_id)
+            if self.issue_id is not None:
+                comments = comments.filter(issue_id=self.issue_id)
+            self._comments[comment_id] = comments.first()
+        return self._comments[comment_id]
+
+
+def get_membership(request):
+    """
+    Description: retourne le résolveur de contributions attaché à la requête, en le créant au besoin.
+    Il est stocké sur la HttpRequest Django pour être partagé entre la vue et les permissions.
+    """
+    http_request = getattr(request, "_request", request)
+    user_id = getattr(request.user, "id", None)
+    membership = getattr(http_request, "_softdesk_membership", None)
+    if membership is None or membership.user_id != user_id:
+        resolver_match = getattr(request, "resolver_match", None)
+        url_kwargs = resolver_match.kwargs if resolver_match else {}
+        project_id, issue_id = url_kwargs.get("pk"), url_kwargs.get("issue_id")
+        membership = ProjectMembership(
+            request.user,
+            int(project_id) if project_id is not None else None,
+            int(issue_id) if issue_id is not None else None,
+        )
+        http_request._softdesk_membership = membership
+    return membership
@@ -0,0 +1,315 @@
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from time import monotonic, perf_counter
+import glob
+import hmac
+import json
+import math
+import os
+import threading
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework import exceptions
+
+
+# latences (secondes): de la milliseconde à 10 secondes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+QUERIES_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+REQUESTS_TOTAL = "softdesk_http_requests_total"
+REQUEST_DURATION = "softdesk_http_request_duration_seconds"
+DB_QUERY_DURATION = "softdesk_db_query_duration_seconds"
+DB_QUERIES_PER_REQUEST = "softdesk_db_queries_per_request"
+JWT_VALIDATION_DURATION = "softdesk_jwt_validation_duration_seconds"
+PASSWORD_HASH_DURATION = "softdesk_password_hash_duration_seconds"
+
+METRICS = {
+    REQUESTS_TOTAL: ("counter", "Requêtes HTTP par nom d'url, méthode et statut", None),
+    REQUEST_DURATION: ("histogram", "Durée des requêtes HTTP par nom d'url", LATENCY_BUCKETS),
+    DB_QUERY_DURATION: ("histogram", "Durée des requêtes SQL par nom d'url", QUERY_BUCKETS),
+    DB_QUERIES_PER_REQUEST: ("histogram", "Nombre de requêtes SQL par requête HTTP", QUERIES_COUNT_BUCKETS),
+    JWT_VALIDATION_DURATION: ("histogram", "Durée de validation des jetons d'accès", LATENCY_BUCKETS),
+    PASSWORD_HASH_DURATION: ("histogram", "Durée du hachage des mots de passe par nom d'url", LATENCY_BUCKETS),
+}
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# requête HTTP en cours: le nom d'url étiquette les mesures faites pendant son traitement
+current_request = ContextVar("softdesk_metrics_request", default=None)
+hashing_password = ContextVar("softdesk_metrics_hashing_password", default=False)
+
+
+def metrics_enabled():
+    return settings.SOFTDESK_METRICS
+
+
+def current_url_name():
+    request = current_request.get()
+    match = getattr(request, "resolver_match", None)
+    return match.url_name if match is not None and match.url_name else "unknown"
+
+
+class Registry:
+    """
+    Description: registre des compteurs et histogrammes du processus, étiquetés par des couples (nom, valeur).
+    Avec un répertoire (SOFTDESK_METRICS_DIR), chaque processus y écrit son état (un fichier JSON par processus,
+    remplacé de façon atomique, au plus toutes les SOFTDESK_METRICS_FLUSH_INTERVAL secondes): l'endpoint /metrics
+    de n'importe quel worker additionne les états de tous les processus, y compris ceux arrêtés (les compteurs
+    ne décroissent jamais).
+    """
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.flushed_at = None
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[index] += 1
+                    break
+            else:
+                histogram[len(buckets)] += 1
+            histogram[-1] += value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "counters": [[name, labels, value] for (name, labels), value in self.counters.items()],
+                "histograms": [[name, labels, list(values)] for (name, labels), values in self.histograms.items()],
+            }
+
+    def process_file(self):
+        return os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+
+    def flush(self, force=False):
+        """
+        Description: écrit l'état du processus dans son fichier, si le délai depuis la dernière écriture est écoulé.
+        """
+        if self.directory is None:
+            return False
+        now = monotonic()
+        if not force and self.flushed_at is not None and now - self.flushed_at < self.flush_interval:
+            return False
+        self.flushed_at = now
+        path = self.process_file()
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(self.snapshot(), file)
+        os.replace(temporary, path)
+        return True
+
+    def collect(self):
+        """
+        Description: état de tous les processus: celui du processus courant (en mémoire) et ceux des fichiers.
+        """
+        snapshots = [self.snapshot()]
+        if self.directory is not None:
+            own_file = self.process_file()
+            for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+                if path == own_file:
+                    continue
+                try:
+                    with open(path) as file:
+                        snapshots.append(json.load(file))
+                except (OSError, ValueError):
+                    continue
+        counters, histograms = {}, {}
+        for snapshot in snapshots:
+            for name, labels, value in snapshot["counters"]:
+                key = (name, tuple(tuple(label) for label in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, values in snapshot["histograms"]:
+                key = (name, tuple(tuple(label) for label in labels))
+                total = histograms.setdefault(key, [0] * len(values))
+                for index, value in enumerate(values):
+                    total[index] += value
+        return counters, histograms
+
+    def render(self):
+        """
+        Description: format texte d'exposition de Prometheus.
+        """
+        counters, histograms = self.collect()
+        lines = []
+        for name, (kind, description, buckets) in METRICS.items():
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+            if kind == "counter":
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+                continue
+            for (metric, labels), values in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(buckets) + [math.inf], values[:-1]):
+                    cumulative += count
+                    le = "+Inf" if bound == math.inf else format_value(bound)
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(labels)} {format_value(values[-1])}")
+                lines.append(f"{name}_count{format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = [
+        f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for key, value in labels
+    ]
+    return "{" + ",".join(escaped) + "}"
+
+
+def format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return repr(value)
+    return str(value)
+
+
+registry = Registry(settings.SOFTDESK_METRICS_DIR, settings.SOFTDESK_METRICS_FLUSH_INTERVAL)
+
+
+@contextmanager
+def observe_duration(name, **labels):
+    """
+    Description: mesure la durée du bloc dans l'histogramme name (rien si les métriques sont désactivées).
+    """
+    if not metrics_enabled():
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(name, labels, perf_counter() - start)
+
+
+@contextmanager
+def observe_password_hash():
+    """
+    Description: mesure un hachage de mot de passe. La vérification PBKDF2 hache elle-même le mot de passe:
+    le hachage imbriqué n'est pas mesuré une seconde fois.
+    """
+    if hashing_password.get():
+        yield
+        return
+    token = hashing_password.set(True)
+    try:
+        with observe_duration(PASSWORD_HASH_DURATION, url_name=current_url_name()):
+            yield
+    finally:
+        hashing_password.reset(token)
+
+
+class TimedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    Description: hacheur par défaut de Django (même algorithme, mêmes empreintes), dont le hachage et
+    la vérification des mots de passe sont mesurés (inscription, connexion, changement de mot de passe).
+    """
+
+    def encode(self, password, salt, iterations=None):
+        with observe_password_hash():
+            return super().encode(password, salt, iterations)
+
+    def verify(self, password, encoded):
+        with observe_password_hash():
+            return super().verify(password, encoded)
+
+
+class MetricsMiddleware:
+    """
+    Description: nombre et durée des requêtes HTTP, et durée de leurs requêtes SQL, par nom d'url (urls.py).
+    Désactivé (SOFTDESK_METRICS), le middleware est retiré de la chaîne dès le démarrage.
+    """
+
+    def __init__(self, get_response):
+        if not metrics_enabled():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        durations = []
+
+        def record_query(execute, sql, params, many, context):
+            start = perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                durations.append(perf_counter() - start)
+
+        token = current_request.set(request)
+        start = perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(record_query))
+                response = self.get_response(request)
+            url_name = current_url_name()
+        finally:
+            current_request.reset(token)
+        duration = perf_counter() - start
+
+        registry.inc(
+            REQUESTS_TOTAL, {"url_name": url_name, "method": request.method, "status": str(response.status_code)}
+        )
+        registry.observe(REQUEST_DURATION, {"url_name": url_name, "method": request.method}, duration)
+        for query_duration in durations:
+            registry.observe(DB_QUERY_DURATION, {"url_name": url_name}, query_duration)
+        registry.observe(DB_QUERIES_PER_REQUEST, {"url_name": url_name}, len(durations))
+        registry.flush()
+        return response
+
+
+def can_read_metrics(request):
+    """
+    Description: les métriques sont lues par le collecteur (jeton SOFTDESK_METRICS_TOKEN) ou par un superutilisateur
+    authentifié (jeton d'accès JWT). Retourne le statut de refus, ou None.
+    """
+    authorization = request.headers.get("Authorization", "")
+    token = settings.SOFTDESK_METRICS_TOKEN
+    if token and hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode()):
+        return None
+    # import local: authentication.tokens mesure la validation des jetons avec ce module
+    from authentication.tokens import SoftdeskJWTAuthentication
+
+    try:
+        authenticated = SoftdeskJWTAuthentication().authenticate(request)
+    except exceptions.AuthenticationFailed:
+        authenticated = None
+    if authenticated is None:
+        return 401
+    return None if authenticated[0].is_superuser else 403
+
+
+def metrics_view(request):
+    """
+    Description: endpoint /metrics, au format texte de Prometheus, lisible sans collecteur (curl).
+    """
+    refused = can_read_metrics(request)
+    if refused is not None:
+        response = HttpResponse(status=refused)
+        if refused == 401:
+            response["WWW-Authenticate"] = 'Bearer realm="metrics"'
+        return response
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
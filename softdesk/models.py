@@ -1,9 +1,28 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.utils.timezone import now
 
 
-class Projects(models.Model):
+class CountersMixin:
+    """
+    Description: les compteurs (counter_fields) sont maintenus par des UPDATE ... F() (softdesk.counters,
+    softdesk.versions).
+    L'enregistrement d'une instance existante ne les réécrit pas: ses valeurs en mémoire peuvent être périmées.
+    """
+
+    counter_fields = []
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        return super().save(*args, **kwargs)
+
+
+class Projects(CountersMixin, models.Model):
     title = models.CharField(max_length=200, null=False, blank=False)
     description = models.TextField(max_length=1850, null=False, blank=False)
     # type possible: back-end, front-end, iOS ou Android
@@ -15,9 +34,20 @@ class Projects(models.Model):
     # status possibles: Open, Archived, Canceled
     status = models.CharField(max_length=30, default="Open", null=False, blank=False)
     created_time = models.DateTimeField(default=now)
+    # date de dernière modification du projet ou de ses données: sert aux requêtes conditionnelles
+    updated_time = models.DateTimeField(auto_now=True)
+    # compteurs dénormalisés: nombre de problèmes, et de problèmes ouverts (To Do, In Progress)
+    issues_count = models.PositiveIntegerField(default=0)
+    open_issues_count = models.PositiveIntegerField(default=0)
+    # version du projet: incrémentée dans la transaction de chaque écriture du projet ou de ses données
+    version = models.PositiveBigIntegerField(default=0)
+
+    counter_fields = ["issues_count", "open_issues_count", "version"]
+
 
+class Issues(CountersMixin, models.Model):
+    OPEN_STATUSES = ["To Do", "In Progress"]
 
-class Issues(models.Model):
     title = models.CharField(max_length=200, null=False, blank=False)
     description = models.TextField(max_length=1850, null=False, blank=False)
     # balise possibles: BUG, TASK, FEATURE
@@ -38,6 +68,41 @@ class Issues(models.Model):
         blank=True,
     )
     created_time = models.DateTimeField(default=now)
+    updated_time = models.DateTimeField(auto_now=True)
+    # compteur dénormalisé du nombre de commentaires
+    comments_count = models.PositiveIntegerField(default=0)
+
+    counter_fields = ["comments_count"]
+
+    @classmethod
+    def unassign(cls, project_id, user_id):
+        """
+        Description: retire l'utilisateur des problèmes d'un projet qui lui sont attribués, en un seul UPDATE.
+        Retourne les identifiants des problèmes modifiés, lus dans la même transaction.
+        """
+        queryset = cls.objects.filter(project_id=project_id, assignee_user_id=user_id)
+        with transaction.atomic():
+            issues_ids = sorted(queryset.values_list("id", flat=True))
+            queryset.update(assignee_user_id=None, updated_time=now())
+        return issues_ids
+
+    class Meta:
+        indexes = [
+            # liste ordonnée des problèmes d'un projet (pagination par curseur)
+            models.Index(
+                fields=["project_id", "created_time"], name="issues_project_created_idx"
+            ),
+            # liste ordonnée des problèmes d'un projet filtrée par statut
+            models.Index(
+                fields=["project_id", "status", "created_time"],
+                name="issues_project_status_idx",
+            ),
+            # problèmes d'un projet attribués à un contributeur
+            models.Index(
+                fields=["project_id", "assignee_user_id"],
+                name="issues_project_assignee_idx",
+            ),
+        ]
 
 
 class Comments(models.Model):
@@ -47,6 +112,15 @@ class Comments(models.Model):
     author_user_id = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
     issue_id = models.ForeignKey(Issues, on_delete=models.CASCADE)
     created_time = models.DateTimeField(default=now)
+    updated_time = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # liste ordonnée des commentaires d'un problème
+            models.Index(
+                fields=["issue_id", "created_time"], name="comments_issue_created_idx"
+            ),
+        ]
 
 
 class Contributors(models.Model):
@@ -61,4 +135,68 @@ class Contributors(models.Model):
     created_time = models.DateTimeField(default=now)
 
     class Meta:
+        # l'index unique (user_id, project_id, role) couvre les contributions d'un utilisateur
         unique_together = ("user_id", "project_id", "role")
+        indexes = [
+            # index couvrant des contrôles par projet: contributeurs d'un rôle donné dans un projet
+            models.Index(
+                fields=["project_id", "role", "user_id"],
+                name="contributors_project_role_idx",
+            ),
+        ]
+
+
+class Jobs(models.Model):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "en attente"),
+        (RUNNING, "en cours"),
+        (DONE, "terminé"),
+        (FAILED, "en échec"),
+    ]
+    # type de traitement, associé à une fonction par softdesk.jobs.register_job
+    kind = models.CharField(max_length=50, null=False, blank=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    payload = models.JSONField(default=dict)
+    # avancement reporté par le traitement, par étape
+    progress = models.JSONField(default=dict)
+    error = models.TextField(blank=True, default="")
+    created_by = models.ForeignKey(
+        get_user_model(), on_delete=models.SET_NULL, null=True, blank=True
+    )
+    created_time = models.DateTimeField(default=now)
+    updated_time = models.DateTimeField(default=now)
+
+
+class Changes(models.Model):
+    """
+    Description: journal des écritures des problèmes, commentaires et contributeurs, par projet.
+    Les lignes sont insérées par des triggers SQLite (softdesk.changes), quel que soit le chemin d'écriture.
+    L'identifiant (AUTOINCREMENT, jamais réutilisé) sert de curseur de synchronisation.
+    Une seule entrée est conservée par ligne suivie: la dernière, éventuellement une suppression.
+    """
+
+    ISSUE = "issue"
+    COMMENT = "comment"
+    CONTRIBUTOR = "contributor"
+    KIND_CHOICES = [
+        (ISSUE, "problème"),
+        (COMMENT, "commentaire"),
+        (CONTRIBUTOR, "contributeur"),
+    ]
+    # pas de clé étrangère: les triggers journalisent aussi les suppressions faites en cascade d'un projet
+    project_id = models.BigIntegerField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # lecture des changements d'un projet depuis un curseur
+            models.Index(fields=["project_id", "id"], name="changes_project_cursor_idx"),
+            # compaction: un trigger remplace l'entrée précédente d'une même ligne
+            models.Index(fields=["kind", "object_id"], name="changes_object_idx"),
+        ]
@@ -0,0 +1,40 @@
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.response import Response
+
+
+CURSOR_PAGINATION_MODE = "cursor"
+
+
+class CreatedTimeCursorPagination(CursorPagination):
+    """
+    Description: pagination par curseur, ordonnée sur (created_time, id).
+    Le curseur est opaque (encodé en base64), et aucun comptage total n'est effectué:
+    le coût d'une page ne dépend pas de sa profondeur dans l'historique.
+    """
+
+    ordering = ("created_time", "id")
+    page_size_query_param = "limit"
+
+
+def get_paginator(request):
+    """
+    Description: la pagination limit/offset reste celle par défaut.
+    La pagination par curseur est activée par '?pagination=cursor' (ou la présence d'un curseur).
+    """
+    query_params = request.query_params
+    if (
+        query_params.get("pagination") == CURSOR_PAGINATION_MODE
+        or CreatedTimeCursorPagination.cursor_query_param in query_params
+    ):
+        return CreatedTimeCursorPagination()
+    return LimitOffsetPagination()
+
+
+def get_paginated_response(paginator, data):
+    """
+    Description: en mode curseur on retourne les liens 'next' et 'previous' avec les résultats.
+    En mode limit/offset, on conserve la réponse historique: la seule liste des résultats.
+    """
+    if isinstance(paginator, CursorPagination):
+        return paginator.get_paginated_response(data)
+    return Response(data)
@@ -1,54 +1,42 @@
-from rest_framework.permissions import BasePermission
-from django.db.models import Q
+from softdesk.instrumentation import SpanPermission
 
 from authentication.models import User
-from softdesk.models import Comments, Contributors, Projects, Issues
+from softdesk.models import Contributors
+from softdesk.membership import get_membership
 
 
-class AssigneeUserIsContributor(BasePermission):
+class AssigneeUserIsContributor(SpanPermission):
     def has_permission(self, request, view):
         """
         Description: on vérifie si un utilisateur est connu en tant que contributeur dans le projet.
         """
         project_id = request.resolver_match.kwargs["pk"]
-        user_id = request.user.id
         try:
             assignee_user_id = request.data["assignee_user_id"]
         except Exception:
             assignee_user_id = request.data["contributor_id"]
-        contributor_count = (
-            Contributors.objects.filter(project_id=project_id)
-            .filter(user_id=assignee_user_id)
-            .filter(role="CONTRIBUTOR")
-            .count()
-        )
+        roles = get_membership(request).user_roles(project_id, assignee_user_id)
         return bool(
-            request.user and request.user.is_authenticated and contributor_count > 0
+            request.user
+            and request.user.is_authenticated
+            and Contributors.CONTRIBUTOR in roles
         )
 
 
-class UserCanViewProject(BasePermission):
+class UserCanViewProject(SpanPermission):
     def has_permission(self, request, view):
         """
         Description: on vérifie l'utilisateur peut consulter un projet.
         """
         project_id = request.resolver_match.kwargs["pk"]
-        project_contributions_count = Contributors.objects.filter(
-            Q(user_id__in=[request.user.id])
-        ).count()
-        user_id = request.user.id
-        contributor_count = (
-            Contributors.objects.filter(project_id=project_id)
-            .filter(user_id=user_id)
-            .count()
-        )
-        try:
-            project = Projects.objects.get(id=project_id)
-        except Exception:
+        membership = get_membership(request)
+        if not membership.project_exists(project_id):
             return "Project not found"
 
         b1 = bool(
-            request.user and request.user.is_authenticated and contributor_count > 0
+            request.user
+            and request.user.is_authenticated
+            and membership.is_contributor(project_id)
         )
         b2 = bool(
             request.user and request.user.is_authenticated and request.user.is_superuser
@@ -56,7 +44,7 @@ class UserCanViewProject(BasePermission):
         return bool(b1 or b2)
 
 
-class UserCanViewUser(BasePermission):
+class UserCanViewUser(SpanPermission):
     def has_permission(self, request, view):
         """
         Description: on vérifie si l'utilisateur peut consulter le profile des autres utilisateurs.
@@ -81,7 +69,7 @@ class UserCanViewUser(BasePermission):
         return bool(b1 or b2 or b3)
 
 
-class UserCanUpdateUser(BasePermission):
+class UserCanUpdateUser(SpanPermission):
     def has_permission(self, request, view):
         """
         Description: on vérifie si l'utilisateur peut modifier le profile.
@@ -104,47 +92,38 @@ class UserCanUpdateUser(BasePermission):
         return bool(b1 or b2)
 
 
-class UserNotAlreadyInProject(BasePermission):
+class UserNotAlreadyInProject(SpanPermission):
     def has_permission(self, request, view):
         """
         Description: on vérifie si l'utilisateur ajouté à un projet, n'y est pas déjà inscrit.
         """
         project_id = request.resolver_match.kwargs["pk"]
         contributor_id = request.data["contributor_id"]
-        contributor_count = (
-            Contributors.objects.filter(project_id=project_id)
-            .filter(user_id=contributor_id)
-            .filter(role="CONTRIBUTOR")
-            .count()
-        )
+        roles = get_membership(request).user_roles(project_id, contributor_id)
 
         return bool(
-            request.user and request.user.is_authenticated and contributor_count == 0
+            request.user
+            and request.user.is_authenticated
+            and Contributors.CONTRIBUTOR not in roles
         )
 
 
-class UserCanDeleteProject(BasePermission):
+class UserCanDeleteProject(SpanPermission):
     def has_permission(self, request, view):
         """
         Description: on vérifie l'utilisateur a le droit de supprimer un projet spécifique.
         """
         project_id = request.resolver_match.kwargs["pk"]
-        user_id = request.user.id
-        author_count = (
-            Contributors.objects.filter(project_id=project_id)
-            .filter(user_id=user_id)
-            .filter(role="AUTHOR")
-            .count()
-        )
+        is_author = get_membership(request).is_author(project_id)
 
-        b1 = bool(request.user and request.user.is_authenticated and author_count > 0)
+        b1 = bool(request.user and request.user.is_authenticated and is_author)
         b2 = bool(
             request.user and request.user.is_authenticated and request.user.is_superuser
         )
         return bool(b1 or b2)
 
 
-class UserCanDeleteProjects(BasePermission):
+class UserCanDeleteProjects(SpanPermission):
     def has_permission(self, request, view):
         """
         Description: on vérifie l'utilisateur a le droit de supprimer tous les projets.
@@ -154,40 +133,36 @@ class UserCanDeleteProjects(BasePermission):
         )
 
 
-class UserCanDeleteUserFromProject(BasePermission):
+class UserCanDeleteUserFromProject(SpanPermission):
     def has_permission(self, request, view):
         """
         Description: on vérifie l'utilisateur a le droit de retirer un contributeur du projet.
         """
         project_id = request.resolver_match.kwargs["pk"]
-        user_id = request.user.id
         user_to_remove = request.resolver_match.kwargs["user_id"]
-        project = Projects.objects.get(id=project_id)
-        contributor_count = (
-            Contributors.objects.filter(project_id=project_id)
-            .filter(user_id=user_to_remove)
-            .filter(role="CONTRIBUTOR")
-            .count()
-        )
+        roles = get_membership(request).user_roles(project_id, user_to_remove)
 
         return bool(
-            request.user and request.user.is_authenticated and contributor_count > 0
+            request.user
+            and request.user.is_authenticated
+            and Contributors.CONTRIBUTOR in roles
         )
 
 
-class UserCanUpdateComment(BasePermission):
+class UserCanUpdateComment(SpanPermission):
     def has_permission(self, request, view):
         """
         Description: on vérifie si l'utilisateur peut modifier un commentaire.
         """
         user_id = request.user.id
         comment_id = request.resolver_match.kwargs["comment_id"]
-        comment = Comments.objects.get(id=comment_id)
+        comment = get_membership(request).comment(comment_id)
 
         b1 = bool(
             request.user
             and request.user.is_authenticated
-            and comment.author_user_id.id == user_id
+            and comment is not None
+            and comment.author_user_id_id == user_id
         )
         b2 = bool(
             request.user and request.user.is_authenticated and request.user.is_superuser
@@ -195,25 +170,24 @@ class UserCanUpdateComment(BasePermission):
         return bool(b1 or b2)
 
 
-class UserCanUpdateIssue(BasePermission):
+class UserCanUpdateIssue(SpanPermission):
     def has_permission(self, request, view):
         """
         Description: on vérifie si l'utilisateur peut mettre à jour un problème.
         """
         issue_id = request.resolver_match.kwargs["issue_id"]
         user_id = request.user.id
-        author_count = (
-            Issues.objects.filter(id=issue_id).filter(author_user_id=user_id).count()
-        )
+        issue = get_membership(request).issue(issue_id)
+        is_issue_author = bool(issue is not None and issue.author_user_id_id == user_id)
 
-        b1 = bool(request.user and request.user.is_authenticated and author_count > 0)
+        b1 = bool(request.user and request.user.is_authenticated and is_issue_author)
         b2 = bool(
             request.user and request.user.is_authenticated and request.user.is_superuser
         )
         return bool(b1 or b2)
 
 
-class UserCanUpdateIssueStatus(BasePermission):
+class UserCanUpdateIssueStatus(SpanPermission):
     def has_permission(self, request, view):
         """
         Description: on vérifie si l'utilisateur peut mettre à jour le statut d'un problème.
@@ -221,29 +195,22 @@ class UserCanUpdateIssueStatus(BasePermission):
         project_id = request.resolver_match.kwargs["pk"]
         issue_id = request.resolver_match.kwargs["issue_id"]
         user_id = request.user.id
+        membership = get_membership(request)
+        issue = membership.issue(issue_id)
 
-        try:
-            Projects.objects.get(id=project_id)
-            Issues.objects.get(id=issue_id)
-        except Exception:
+        if not membership.project_exists(project_id) or issue is None:
             # ce retour textuel n'est pas exploité. Un libellé était nécessaire pour permettre de jouer l'erreur 404.
             return "Project or Issue not found"
-        issue_assignee_user_count = (
-            Issues.objects.filter(id=issue_id).filter(assignee_user_id=user_id).count()
-        )
-        issue_author_user_count = (
-            Issues.objects.filter(id=issue_id).filter(author_user_id=user_id).count()
-        )
 
         b1 = bool(
             request.user
             and request.user.is_authenticated
-            and issue_assignee_user_count > 0
+            and issue.assignee_user_id_id == user_id
         )
         b2 = bool(
             request.user
             and request.user.is_authenticated
-            and issue_author_user_count > 0
+            and issue.author_user_id_id == user_id
         )
         b3 = bool(
             request.user and request.user.is_authenticated and request.user.is_superuser
@@ -251,59 +218,45 @@ class UserCanUpdateIssueStatus(BasePermission):
         return bool(b1 or b2 or b3)
 
 
-class UserCanCreateIssue(BasePermission):
+class UserCanCreateIssue(SpanPermission):
     def has_permission(self, request, view):
         """
         Description: on vérifie si l'utilisateur peut ajouter un problème à un projet.
         """
         project_id = request.resolver_match.kwargs["pk"]
-        user_id = request.user.id
-        contributor_count = (
-            Contributors.objects.filter(project_id=project_id).filter(user_id=user_id)
-        ).count()
+        is_contributor = get_membership(request).is_contributor(project_id)
 
-        b1 = bool(
-            request.user and request.user.is_authenticated and contributor_count > 0
-        )
+        b1 = bool(request.user and request.user.is_authenticated and is_contributor)
         b2 = bool(
             request.user and request.user.is_authenticated and request.user.is_superuser
         )
         return bool(b1 or b2)
 
 
-class UserCanUpdateProject(BasePermission):
+class UserCanUpdateProject(SpanPermission):
     def has_permission(self, request, view):
         """
         Description: on vérifie si l'utilisateur peut mettre à jour un projet.
         """
         project_id = request.resolver_match.kwargs["pk"]
-        user_id = request.user.id
-        author_count = (
-            Contributors.objects.filter(project_id=project_id)
-            .filter(user_id=user_id)
-            .filter(role="AUTHOR")
-            .count()
-        )
+        is_author = get_membership(request).is_author(project_id)
 
-        b1 = bool(request.user and request.user.is_authenticated and author_count > 0)
+        b1 = bool(request.user and request.user.is_authenticated and is_author)
         b2 = bool(
             request.user and request.user.is_authenticated and request.user.is_superuser
         )
         return bool(b1 or b2)
 
 
-class UserCanUpdateProjectUser(BasePermission):
+class UserCanUpdateProjectUser(SpanPermission):
     def has_permission(self, request, view):
         """
         Description: on vérifie si l'utilisateur peut ajouter un utilisateur à un projet.
         """
-        user_id = request.user.id
-        user = User.objects.get(id=user_id)
-
         b1 = bool(
             request.user
             and request.user.is_authenticated
-            and user.can_contribute_to_a_project
+            and request.user.can_contribute_to_a_project
         )
         b2 = bool(
             request.user and request.user.is_authenticated and request.user.is_superuser
@@ -311,23 +264,23 @@ class UserCanUpdateProjectUser(BasePermission):
         return bool(b1 or b2)
 
 
-class ProjectCanBeUpdate(BasePermission):
+class ProjectCanBeUpdate(SpanPermission):
     def has_permission(self, request, view):
         """
         Description: on vérifie si le projet est bien au statut Open.
         """
         project_id = request.resolver_match.kwargs["pk"]
-        project = Projects.objects.get(id=project_id)
+        project_status = get_membership(request).project_status(project_id)
 
-        return bool(project.status == "Open")
+        return bool(project_status == "Open")
 
 
-class IssueCanBeUpdate(BasePermission):
+class IssueCanBeUpdate(SpanPermission):
     def has_permission(self, request, view):
         """
         Description: on vérifie si le problème n'est pas au statut "Finished"
         """
         issue_id = request.resolver_match.kwargs["issue_id"]
-        issue = Issues.objects.get(id=issue_id)
+        issue = get_membership(request).issue(issue_id)
 
-        return bool(issue.status != "Finished")
+        return bool(issue is not None and issue.status != "Finished")
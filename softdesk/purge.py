@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from softdesk.jobs import register_job
+from softdesk.membership import invalidate_all_memberships
+from softdesk.models import Projects, Issues, Comments, Contributors, Jobs, Changes
+
+
+PURGE_JOB = "purge"
+
+
+class PurgeEngine:
+    """
+    Description: suppression de toutes les données de l'application, à l'exception des super utilisateurs.
+    Les tables sont vidées dans l'ordre des dépendances (les lignes qui référencent avant les lignes référencées),
+    par lots de batch_size lignes supprimés en une seule requête DELETE, sans collecte des cascades par Django.
+    Chaque lot est validé dans sa propre transaction: le verrou d'écriture de SQLite est relâché entre deux lots.
+    Les signaux post_delete ne sont pas émis: le cache des contributions est vidé à la fin.
+    """
+
+    def __init__(self, batch_size=None, progress=None):
+        self.batch_size = batch_size or settings.SOFTDESK_PURGE_BATCH_SIZE
+        self.progress = progress
+
+    def steps(self):
+        User = get_user_model()
+        return [
+            ("comments", Comments.objects.all()),
+            ("issues", Issues.objects.all()),
+            ("contributors", Contributors.objects.all()),
+            ("projects", Projects.objects.all()),
+            (
+                "users_groups",
+                User.groups.through.objects.filter(user__is_superuser=False),
+            ),
+            (
+                "users_permissions",
+                User.user_permissions.through.objects.filter(user__is_superuser=False),
+            ),
+            ("admin_log", LogEntry.objects.filter(user__is_superuser=False)),
+            ("users", User.objects.filter(is_superuser=False)),
+        ]
+
+    def report(self, step, deleted, total):
+        if self.progress is not None:
+            self.progress(step, deleted=deleted, total=total)
+
+    def delete_in_batches(self, step, queryset):
+        model = queryset.model
+        total = queryset.count()
+        deleted = 0
+        self.report(step, deleted, total)
+        while True:
+            with transaction.atomic():
+                ids = list(queryset.values_list("pk", flat=True)[: self.batch_size])
+                if not ids:
+                    break
+                deleted += model.objects.filter(pk__in=ids)._raw_delete(queryset.db)
+            self.report(step, deleted, total)
+        return deleted
+
+    def run(self):
+        """
+        Description: retourne le nombre de lignes supprimées par étape.
+        """
+        deleted = {}
+        # les traitements des utilisateurs supprimés sont conservés, sans auteur
+        Jobs.objects.filter(created_by__is_superuser=False).update(created_by=None)
+        for step, queryset in self.steps():
+            deleted[step] = self.delete_in_batches(step, queryset)
+            if step == "projects":
+                # sans projet, le journal des changements ne contient plus que les tombstones des étapes précédentes:
+                # un DELETE sans condition, que SQLite exécute sans parcourir les lignes
+                deleted["changes"] = Changes.objects.all()._raw_delete(Changes.objects.db)
+        invalidate_all_memberships()
+        return deleted
+
+
+@register_job(PURGE_JOB)
+def purge_job(job, report):
+    PurgeEngine(batch_size=job.payload.get("batch_size"), progress=report).run()
@@ -0,0 +1,188 @@
+from contextlib import ExitStack
+from hashlib import sha1
+from time import perf_counter
+import json
+import logging
+import os
+import random
+import re
+import sys
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+SOFTDESK_DIR = os.path.dirname(os.path.abspath(__file__))
+VIEWS_FILE = os.path.join(SOFTDESK_DIR, "views.py")
+PERMISSIONS_FILE = os.path.join(SOFTDESK_DIR, "permissions.py")
+
+IN_LIST = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+STRING = re.compile(r"'(?:[^']|'')*'")
+SPACES = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """
+    Description: forme normalisée d'une requête: les listes IN (%s, %s, ...) de toutes longueurs, les nombres
+    et les chaînes littérales sont remplacés, afin que les requêtes d'une même origine aient la même empreinte.
+    """
+    sql = STRING.sub("?", sql)
+    sql = IN_LIST.sub("(...)", sql)
+    sql = NUMBER.sub("?", sql)
+    return SPACES.sub(" ", sql).strip()
+
+
+def fingerprint(sql):
+    return sha1(normalize_sql(sql).encode()).hexdigest()[:12]
+
+
+def origin_frames():
+    """
+    Description: lignes de la vue et de la permission de softdesk à l'origine de la requête en cours.
+    """
+    view = permission = None
+    frame = sys._getframe(2)
+    while frame is not None and (view is None or permission is None):
+        filename = frame.f_code.co_filename
+        location = f"{os.path.basename(filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+        if view is None and filename == VIEWS_FILE:
+            view = location
+        elif permission is None and filename == PERMISSIONS_FILE:
+            permission = location
+        frame = frame.f_back
+    return view, permission
+
+
+class QueryInspector:
+    """
+    Description: requêtes SQL d'une requête HTTP, regroupées par empreinte.
+    Une même requête avec les mêmes paramètres exécutée plusieurs fois est un doublon; une même empreinte
+    exécutée au moins SOFTDESK_N_PLUS_ONE_THRESHOLD fois avec des paramètres différents est un N+1.
+    Les requêtes plus lentes que SOFTDESK_SLOW_QUERY_MS sont journalisées avec leur plan d'exécution.
+    """
+
+    def __init__(self, slow_query_ms=None, n_plus_one_threshold=None):
+        self.slow_query_ms = settings.SOFTDESK_SLOW_QUERY_MS if slow_query_ms is None else slow_query_ms
+        self.n_plus_one_threshold = n_plus_one_threshold or settings.SOFTDESK_N_PLUS_ONE_THRESHOLD
+        self.queries = {}
+        self.explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.explaining:
+            return execute(sql, params, many, context)
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (perf_counter() - start) * 1000
+            view, permission = origin_frames()
+            key = fingerprint(sql)
+            self.queries.setdefault(key, []).append(
+                {
+                    "sql": sql,
+                    "params": repr(params),
+                    "view": view,
+                    "permission": permission,
+                    "duration_ms": duration_ms,
+                }
+            )
+            if duration_ms >= self.slow_query_ms and not many:
+                self.log_slow_query(context["connection"], sql, params, duration_ms, view, permission)
+
+    def explain(self, connection, sql, params):
+        """
+        Description: plan d'exécution de la requête (EXPLAIN QUERY PLAN), pour les lectures sous SQLite.
+        """
+        if connection.vendor != "sqlite" or not sql.lstrip().upper().startswith("SELECT"):
+            return None
+        self.explaining = True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                return [row[-1] for row in cursor.fetchall()]
+        except Exception:
+            return None
+        finally:
+            self.explaining = False
+
+    def log_slow_query(self, connection, sql, params, duration_ms, view, permission):
+        logger.warning(
+            json.dumps(
+                {
+                    "event": "slow_query",
+                    "duration_ms": round(duration_ms, 2),
+                    "sql": sql,
+                    "view": view,
+                    "permission": permission,
+                    "plan": self.explain(connection, sql, params),
+                }
+            )
+        )
+
+    def findings(self):
+        """
+        Description: doublons et N+1 de la requête HTTP, une entrée par empreinte.
+        """
+        findings = []
+        for key, queries in self.queries.items():
+            if len(queries) < 2:
+                continue
+            distinct_params = {(query["sql"], query["params"]) for query in queries}
+            if len(distinct_params) < len(queries):
+                kind = "duplicate"
+            elif len(queries) >= self.n_plus_one_threshold:
+                kind = "n_plus_one"
+            else:
+                continue
+            findings.append(
+                {
+                    "event": kind,
+                    "fingerprint": key,
+                    "count": len(queries),
+                    "sql": normalize_sql(queries[0]["sql"]),
+                    "origins": sorted(
+                        {
+                            " <- ".join(frame for frame in [query["permission"], query["view"]] if frame) or "-"
+                            for query in queries
+                        }
+                    ),
+                }
+            )
+        return findings
+
+
+class QueryInspectorMiddleware:
+    """
+    Description: inspection des requêtes SQL (doublons, N+1, requêtes lentes) d'une part des requêtes HTTP,
+    tirées au sort selon SOFTDESK_QUERY_INSPECTOR_SAMPLE_RATE (1 en développement, 0.01 en production par exemple).
+    À 0, le middleware est retiré de la chaîne dès le démarrage.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SOFTDESK_QUERY_INSPECTOR_SAMPLE_RATE:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.SOFTDESK_QUERY_INSPECTOR_SAMPLE_RATE:
+            return self.get_response(request)
+        inspector = QueryInspector()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(inspector))
+            response = self.get_response(request)
+        match = getattr(request, "resolver_match", None)
+        for finding in inspector.findings():
+            finding.update(
+                {
+                    "method": request.method,
+                    "path": request.path,
+                    "url_name": match.url_name if match is not None else None,
+                }
+            )
+            logger.warning(json.dumps(finding))
+        return response
@@ -0,0 +1,186 @@
+import json
+import re
+
+from django.db import connections, transaction
+
+
+SEARCH_TABLE = "softdesk_search"
+# poids bm25 des colonnes indexées: un terme trouvé dans le titre compte plus que dans la description
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+SNIPPET_TOKENS = 16
+
+# Les problèmes et les commentaires partagent la table FTS5: leurs rowid sont entrelacés
+# (2 * id pour un problème, 2 * id + 1 pour un commentaire), pour des mises à jour par clé primaire.
+SEARCH_SCHEMA = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        title,
+        description,
+        kind UNINDEXED,
+        object_id UNINDEXED,
+        project_id UNINDEXED,
+        issue_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS softdesk_search_issues_insert AFTER INSERT ON softdesk_issues BEGIN
+        INSERT INTO {SEARCH_TABLE} (rowid, title, description, kind, object_id, project_id, issue_id)
+        VALUES (2 * new.id, new.title, new.description, 'issue', new.id, new.project_id_id, new.id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS softdesk_search_issues_update AFTER UPDATE ON softdesk_issues
+    WHEN old.title IS NOT new.title OR old.description IS NOT new.description BEGIN
+        UPDATE {SEARCH_TABLE} SET title = new.title, description = new.description WHERE rowid = 2 * old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS softdesk_search_issues_delete AFTER DELETE ON softdesk_issues BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = 2 * old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS softdesk_search_comments_insert AFTER INSERT ON softdesk_comments BEGIN
+        INSERT INTO {SEARCH_TABLE} (rowid, title, description, kind, object_id, project_id, issue_id)
+        VALUES (
+            2 * new.id + 1, new.title, new.description, 'comment', new.id,
+            (SELECT project_id_id FROM softdesk_issues WHERE id = new.issue_id_id), new.issue_id_id
+        );
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS softdesk_search_comments_update AFTER UPDATE ON softdesk_comments
+    WHEN old.title IS NOT new.title OR old.description IS NOT new.description BEGIN
+        UPDATE {SEARCH_TABLE} SET title = new.title, description = new.description WHERE rowid = 2 * old.id + 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS softdesk_search_comments_delete AFTER DELETE ON softdesk_comments BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = 2 * old.id + 1;
+    END
+    """,
+]
+
+
+def search_available(using="default"):
+    return connections[using].vendor == "sqlite"
+
+
+def search_index_exists(cursor):
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [SEARCH_TABLE]
+    )
+    return cursor.fetchone() is not None
+
+
+def load_search_index(cursor):
+    """
+    Description: FTS5 lit la configuration de la table à sa 1ère utilisation par une connexion. Faite par un trigger,
+    dans une transaction d'écriture, cette lecture bloque les autres écrivains et la connexion échoue aussitôt
+    ('database is locked', sans attente du verrou): elle est donc faite à l'ouverture de la connexion.
+    """
+    if search_index_exists(cursor):
+        cursor.execute(f"SELECT rowid FROM {SEARCH_TABLE} LIMIT 1")
+        cursor.fetchall()
+
+
+def install_search_index(using="default"):
+    """
+    Description: crée (si besoin) la table FTS5 et les triggers qui la synchronisent avec les problèmes
+    et les commentaires. Les triggers suivent aussi les écritures faites hors de l'ORM (bulk_create, purge).
+    Si la table n'existait pas, les données déjà présentes sont indexées. Retourne True dans ce cas.
+    """
+    if not search_available(using):
+        return False
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        created = not search_index_exists(cursor)
+        for statement in SEARCH_SCHEMA:
+            cursor.execute(statement)
+    if created:
+        rebuild_search_index(using)
+    return created
+
+
+def rebuild_search_index(using="default"):
+    """
+    Description: vide et reconstruit l'index depuis les tables des problèmes et des commentaires,
+    en deux requêtes INSERT ... SELECT, puis fusionne les segments de l'index ('optimize').
+    Retourne le nombre de problèmes et de commentaires indexés.
+    """
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(
+            f"""
+            INSERT INTO {SEARCH_TABLE} (rowid, title, description, kind, object_id, project_id, issue_id)
+            SELECT 2 * id, title, description, 'issue', id, project_id_id, id FROM softdesk_issues
+            """
+        )
+        issues = cursor.rowcount
+        cursor.execute(
+            f"""
+            INSERT INTO {SEARCH_TABLE} (rowid, title, description, kind, object_id, project_id, issue_id)
+            SELECT 2 * comment.id + 1, comment.title, comment.description, 'comment', comment.id,
+                issue.project_id_id, comment.issue_id_id
+            FROM softdesk_comments AS comment
+            INNER JOIN softdesk_issues AS issue ON issue.id = comment.issue_id_id
+            """
+        )
+        comments = cursor.rowcount
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+    return {"issues": issues, "comments": comments}
+
+
+def build_match_query(text):
+    """
+    Description: transforme le texte saisi en requête FTS5: chaque mot est cité (aucune syntaxe FTS5
+    ne peut être injectée) et tous les mots sont requis. Le dernier mot est un préfixe.
+    Retourne None si le texte ne contient aucun mot.
+    """
+    words = re.findall(r"\w+", text or "")
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search(text, project_ids=None, limit=10, offset=0, using="default"):
+    """
+    Description: recherche les problèmes et les commentaires, ordonnés par pertinence (bm25, le plus pertinent
+    en premier). Avec project_ids, seuls les résultats de ces projets sont retournés (None: tous les projets).
+    Les identifiants des projets sont passés en un seul paramètre JSON, quel que soit leur nombre.
+    """
+    match_query = build_match_query(text)
+    if match_query is None or project_ids == []:
+        return []
+    sql = f"""
+        SELECT kind, object_id, project_id, issue_id, title,
+            snippet({SEARCH_TABLE}, 1, '[', ']', '...', {SNIPPET_TOKENS}),
+            bm25({SEARCH_TABLE}, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT}) AS score
+        FROM {SEARCH_TABLE}
+        WHERE {SEARCH_TABLE} MATCH %s
+    """
+    params = [match_query]
+    if project_ids is not None:
+        sql += " AND project_id IN (SELECT value FROM json_each(%s))"
+        params.append(json.dumps(sorted(project_ids)))
+    sql += " ORDER BY score, rowid LIMIT %s OFFSET %s"
+    params += [limit, offset]
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return [
+        {
+            "kind": kind,
+            "id": object_id,
+            "project_id": project_id,
+            "issue_id": issue_id,
+            "title": title,
+            "snippet": snippet,
+            # bm25 retourne un score négatif: plus il est petit, plus le résultat est pertinent
+            "score": round(-score, 6),
+        }
+        for kind, object_id, project_id, issue_id, title, snippet, score in rows
+    ]
@@ -3,10 +3,13 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
+from django.db.models import Prefetch
 from datetime import date
 
-from softdesk.models import Projects, Issues, Comments, Contributors
+from authentication.tokens import get_user_instance
+from softdesk.models import Projects, Issues, Comments, Contributors, Jobs
 from softdesk.exceptions import UserProtectByRGPD
+from softdesk.instrumentation import SpanModelSerializer
 
 
 class ProjectsSerializerMixin:
@@ -18,26 +21,57 @@ class ProjectsSerializerMixin:
         return value
 
 
-class ProjectListSerializer(ProjectsSerializerMixin, serializers.ModelSerializer):
+class ProjectListSerializer(ProjectsSerializerMixin, SpanModelSerializer):
     class Meta:
         model = Projects
-        fields = ["id", "title", "type", "status"]
+        fields = ["id", "title", "type", "status", "issues_count", "open_issues_count", "version"]
+        read_only_fields = ["issues_count", "open_issues_count", "version"]
 
 
-class ProjectDetailSerializer(ProjectsSerializerMixin, serializers.ModelSerializer):
+class ProjectDetailSerializer(ProjectsSerializerMixin, SpanModelSerializer):
     project_users = serializers.SerializerMethodField()
 
     class Meta:
         model = Projects
-        fields = ["id", "title", "description", "type", "status", "project_users"]
+        fields = [
+            "id",
+            "title",
+            "description",
+            "type",
+            "status",
+            "issues_count",
+            "open_issues_count",
+            "version",
+            "project_users",
+        ]
+        read_only_fields = ["issues_count", "open_issues_count", "version"]
         extra_kwargs = {"project_users": {"write_only": True}}
 
+    @staticmethod
+    def get_contributors_queryset():
+        # ContributorListSerializer ne rend que l'id de l'utilisateur, déjà sur la ligne: pas de jointure
+        return Contributors.objects.order_by("id")
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """
+        Description: précharge en une requête les contributeurs de tous les projets du queryset.
+        """
+        return queryset.prefetch_related(
+            Prefetch(
+                "contributors_set",
+                queryset=cls.get_contributors_queryset(),
+                to_attr="prefetched_contributors",
+            )
+        )
+
     def get_project_users(self, instance):
-        project_users = instance.project_users.all()
-        project_queryset = Contributors.objects.filter(
-            user_id__in=project_users
-        ).filter(project_id=instance.id)
-        serializer = ContributorListSerializer(project_queryset, many=True)
+        contributors = getattr(instance, "prefetched_contributors", None)
+        if contributors is None:
+            contributors = self.get_contributors_queryset().filter(
+                project_id=instance.id
+            )
+        serializer = ContributorListSerializer(contributors, many=True)
         return serializer.data
 
     def validate_status(self, instance):
@@ -48,7 +82,7 @@ class ProjectDetailSerializer(ProjectsSerializerMixin, serializers.ModelSerializ
         return instance
 
 
-class ContributorListSerializer(serializers.ModelSerializer):
+class ContributorListSerializer(SpanModelSerializer):
     role = serializers.SerializerMethodField()
 
     class Meta:
@@ -59,7 +93,7 @@ class ContributorListSerializer(serializers.ModelSerializer):
         return obj.get_role_display()
 
 
-class ContributorUpdateSerializer(serializers.ModelSerializer):
+class ContributorUpdateSerializer(SpanModelSerializer):
     class Meta:
         model = Contributors
         fields = "__all__"
@@ -73,7 +107,7 @@ class ContributorUpdateSerializer(serializers.ModelSerializer):
         return value
 
 
-class RegisterUserSerializer(serializers.ModelSerializer):
+class RegisterUserSerializer(SpanModelSerializer):
     email = serializers.EmailField(
         required=True,
         validators=[UniqueValidator(queryset=get_user_model().objects.all())],
@@ -168,7 +202,7 @@ class RegisterUserSerializer(serializers.ModelSerializer):
         return user
 
 
-class UserDetailSerializer(serializers.ModelSerializer):
+class UserDetailSerializer(SpanModelSerializer):
     class Meta:
         model = get_user_model()
         fields = [
@@ -186,13 +220,37 @@ class UserDetailSerializer(serializers.ModelSerializer):
         ]
 
 
-class UserListSerializer(serializers.ModelSerializer):
+class UserListSerializer(SpanModelSerializer):
     class Meta:
         model = get_user_model()
         fields = ["id", "first_name", "last_name", "email"]
 
 
-class UserUpdatePasswordSerializer(serializers.ModelSerializer):
+class UserSummarySerializer(SpanModelSerializer):
+    """
+    Description: utilisateur imbriqué dans une liste (?expand=author,assignee).
+    Le profil n'est détaillé que s'il est consultable (règles de la vue du profil): sinon seul l'id est retourné.
+    """
+
+    # colonnes lues par la jointure (select_related) de l'utilisateur
+    only_fields = ["id", "username", "first_name", "last_name", "can_profile_viewable"]
+
+    class Meta:
+        model = get_user_model()
+        fields = ["id", "username", "first_name", "last_name"]
+
+    def to_representation(self, instance):
+        request = self.context.get("request")
+        viewer = getattr(request, "user", None)
+        if (
+            instance.can_profile_viewable
+            or (viewer is not None and (viewer.id == instance.id or viewer.is_superuser))
+        ):
+            return super().to_representation(instance)
+        return {"id": instance.id}
+
+
+class UserUpdatePasswordSerializer(SpanModelSerializer):
     old_password = serializers.CharField(required=True, write_only=True)
     password = serializers.CharField(
         required=True, write_only=False, validators=[validate_password]
@@ -216,7 +274,7 @@ class UserUpdatePasswordSerializer(serializers.ModelSerializer):
         return instance
 
     def validate_old_password(self, value):
-        user = self.context["request"].user
+        user = get_user_instance(self.context["request"].user)
         if not user.check_password(value):
             raise serializers.ValidationError(
                 {"old_password": "Old password is not correct"}
@@ -224,7 +282,7 @@ class UserUpdatePasswordSerializer(serializers.ModelSerializer):
         return value
 
 
-class UserUpdateSerializer(serializers.ModelSerializer):
+class UserUpdateSerializer(SpanModelSerializer):
     class Meta:
         model = get_user_model()
         fields = [
@@ -283,6 +341,24 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         return instance
 
 
+class SparseFieldsetMixin:
+    """
+    Description: sérialiseur de liste dont les champs retournés sont choisis par ?fields=...
+    et dont les utilisateurs référencés sont imbriqués par ?expand=... (voir softdesk.fieldsets).
+    expandable_fields: nom de l'expansion -> clé étrangère vers l'utilisateur.
+    """
+
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name in expand:
+            self.fields[name] = UserSummarySerializer(source=self.expandable_fields[name], read_only=True)
+
+
 class IssueMixin:
     def validate_balise(self, value):
         if value not in ["BUG", "TASK", "FEATURE"]:
@@ -306,7 +382,7 @@ class IssueMixin:
         return value
 
 
-class IssueSerializer(IssueMixin, serializers.ModelSerializer):
+class IssueSerializer(IssueMixin, SpanModelSerializer):
     class Meta:
         model = Issues
         fields = [
@@ -319,13 +395,56 @@ class IssueSerializer(IssueMixin, serializers.ModelSerializer):
         ]
 
 
-class IssuesSerializer(IssueMixin, serializers.ModelSerializer):
+class IssuesSerializer(SparseFieldsetMixin, IssueMixin, SpanModelSerializer):
+    expandable_fields = {"author": "author_user_id", "assignee": "assignee_user_id"}
+
     class Meta:
         model = Issues
         fields = "__all__"
+        read_only_fields = ["comments_count"]
+
+
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Description: résout la clé depuis les instances préchargées dans le contexte du sérialiseur ("preloaded"),
+    sans requête SQL par élément validé.
+    """
+
+    def to_internal_value(self, data):
+        instances = self.context.get("preloaded", {}).get(self.source)
+        if instances is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            return instances[int(data)]
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+
+class IssuesBulkSerializer(IssuesSerializer):
+    """
+    Description: sérialiseur d'un problème d'une création en masse.
+    Les utilisateurs et le projet référencés sont préchargés par la vue, ainsi que les contributeurs du projet.
+    """
+
+    serializer_related_field = PreloadedPrimaryKeyRelatedField
+
+    def validate_assignee_user_id(self, value):
+        if value is None:
+            return value
+        if value.id not in self.context.get("contributor_ids", set()):
+            raise serializers.ValidationError("Assignee must be a project contributor")
+        if not value.can_contribute_to_a_project:
+            raise serializers.ValidationError(
+                "user is no more available as a contributor"
+            )
+        return value
 
 
-class IssuesStatusSerializer(IssueMixin, serializers.ModelSerializer):
+class IssuesStatusSerializer(IssueMixin, SpanModelSerializer):
     class Meta:
         model = Issues
         fields = ["status"]
@@ -343,13 +462,15 @@ class CommentMixin:
         return value
 
 
-class CommentListSerializer(CommentMixin, serializers.ModelSerializer):
+class CommentListSerializer(SparseFieldsetMixin, CommentMixin, SpanModelSerializer):
+    expandable_fields = {"author": "author_user_id"}
+
     class Meta:
         model = Comments
         fields = ["id", "title", "author_user_id", "issue_id", "created_time"]
 
 
-class CommentDetailSerializer(CommentMixin, serializers.ModelSerializer):
+class CommentDetailSerializer(CommentMixin, SpanModelSerializer):
     class Meta:
         model = Comments
         fields = [
@@ -363,7 +484,22 @@ class CommentDetailSerializer(CommentMixin, serializers.ModelSerializer):
         ]
 
 
-class CommentUpdateSerializer(CommentMixin, serializers.ModelSerializer):
+class CommentUpdateSerializer(CommentMixin, SpanModelSerializer):
     class Meta:
         model = Comments
         fields = ["title", "description"]
+
+
+class JobSerializer(SpanModelSerializer):
+    class Meta:
+        model = Jobs
+        fields = [
+            "id",
+            "kind",
+            "status",
+            "progress",
+            "error",
+            "created_by",
+            "created_time",
+            "updated_time",
+        ]
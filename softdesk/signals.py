@@ -0,0 +1,37 @@
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from softdesk.changes import install_change_log
+from softdesk.jobs import ensure_worker
+from softdesk.membership import invalidate_user_memberships
+from softdesk.models import Contributors
+from softdesk.search import install_search_index
+from softdesk.sqlite_profiles import configure_sqlite_connection
+
+
+@receiver([post_save, post_delete], sender=Contributors)
+def invalidate_contributor_memberships(sender, instance, **kwargs):
+    """
+    Description: toute écriture d'un contributeur invalide les contributions en cache de l'utilisateur.
+    """
+    invalidate_user_memberships(instance.user_id_id)
+
+
+@receiver(post_migrate)
+def create_search_index(sender, using="default", **kwargs):
+    """
+    Description: la table FTS5 de recherche et les triggers (index de recherche, journal des changements)
+    ne sont pas des modèles: ils sont créés après migration.
+    """
+    if sender.name == "softdesk":
+        install_search_index(using)
+        install_change_log(using)
+
+
+# le worker des traitements en arrière-plan démarre avec la 1ère requête servie par le processus
+request_started.connect(ensure_worker, dispatch_uid="softdesk_jobs_worker")
+
+# profil de pragmas (SOFTDESK_SQLITE_PROFILE) appliqué à chaque nouvelle connexion SQLite
+connection_created.connect(configure_sqlite_connection, dispatch_uid="softdesk_sqlite_profile")
@@ -0,0 +1,64 @@
+from django.conf import settings
+
+from softdesk.search import load_search_index
+
+
+# Profils de pragmas appliqués à chaque nouvelle connexion SQLite ("default" sauf choix de SOFTDESK_SQLITE_PROFILE).
+# "wal", sur demande: les lectures ne bloquent plus les écritures (et inversement), synchronous=NORMAL
+# ne synchronise le disque qu'aux checkpoints (une transaction validée peut être perdue sur coupure de courant,
+# sans corruption de la base),
+# les écrivains concurrents attendent le verrou (busy_timeout) au lieu d'échouer aussitôt ("database is locked").
+# "default": les pragmas par défaut de SQLite (journal de rollback, synchronous=FULL); le module sqlite3 de Python
+# attend déjà le verrou 5 secondes.
+# Une base de DATABASES peut choisir son profil (clé SOFTDESK_SQLITE_PROFILE), SOFTDESK_SQLITE_PROFILE sinon.
+SQLITE_PROFILES = {
+    "default": {},
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        # 256 Mo de la base lus par projection mémoire, 64 Mo de cache de pages (valeur négative: en Kio)
+        "mmap_size": 268435456,
+        "cache_size": -65536,
+        "temp_store": "MEMORY",
+    },
+}
+
+
+def get_sqlite_pragmas(profile=None, overrides=None):
+    """
+    Description: pragmas d'un profil (SOFTDESK_SQLITE_PROFILE par défaut), complétés ou remplacés
+    par SOFTDESK_SQLITE_PRAGMAS.
+    """
+    profile = settings.SOFTDESK_SQLITE_PROFILE if profile is None else profile
+    overrides = settings.SOFTDESK_SQLITE_PRAGMAS if overrides is None else overrides
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"SQLite profile '{profile}' unknow. Authorized values: {', '.join(SQLITE_PROFILES)}")
+    return {**SQLITE_PROFILES[profile], **overrides}
+
+
+def pragma_statements(pragmas):
+    return [f"PRAGMA {name} = {value}" for name, value in pragmas.items()]
+
+
+def apply_sqlite_pragmas(cursor, pragmas):
+    """
+    Description: applique les pragmas sur un curseur (DB-API) d'une connexion SQLite.
+    Le mode WAL est un état du fichier de la base: il n'est pas modifiable dans une transaction,
+    et une base en mémoire reste en mode "memory".
+    """
+    for statement in pragma_statements(pragmas):
+        cursor.execute(statement)
+
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """
+    Description: receveur du signal connection_created: profil de pragmas de chaque nouvelle connexion SQLite,
+    puis chargement de l'index de recherche (softdesk.search.load_search_index).
+    """
+    if connection.vendor != "sqlite":
+        return
+    pragmas = get_sqlite_pragmas(connection.settings_dict.get("SOFTDESK_SQLITE_PROFILE"))
+    with connection.cursor() as cursor:
+        apply_sqlite_pragmas(cursor, pragmas)
+        load_search_index(cursor)
@@ -0,0 +1,268 @@
+from datetime import date, datetime, timedelta
+from time import perf_counter
+import random
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+
+from softdesk.counters import repair_projects_counters, repair_issues_counters
+from softdesk.models import Projects, Contributors, Issues, Comments
+
+
+PROJECT_TYPES = ["back-end", "front-end", "iOS", "Android"]
+PROJECT_STATUSES = (["Open", "Archived", "Canceled"], [80, 15, 5])
+ISSUE_BALISES = ["BUG", "TASK", "FEATURE"]
+ISSUE_PRIORITIES = (["LOW", "MEDIUM", "HIGH"], [50, 35, 15])
+ISSUE_STATUSES = (["To Do", "In Progress", "Finished"], [45, 20, 35])
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit phasellus posuere ultricies urna "
+    "nec molestie aliquam eleifend mi ante maximus interdum fusce diam euismod scelerisque sem "
+    "facture client android affichage fonction version serveur api connexion erreur"
+).split()
+
+
+class SyntheticDataGenerator:
+    """
+    Description: génère un jeu de données volumineux et réaliste, inséré par lots avec bulk_create.
+    Les distributions sont asymétriques: quelques utilisateurs sont auteurs de nombreux projets,
+    quelques projets concentrent la plupart des problèmes, et quelques problèmes la plupart des commentaires.
+    Les moyennes demandées (problèmes par projet, commentaires par problème) sont approximativement respectées.
+    Les identifiants sont attribués par le générateur pour éviter toute relecture de la base.
+    """
+
+    # paramètre de forme des lois de Pareto: plus il est petit, plus la distribution est asymétrique
+    PARETO_SHAPE = 1.5
+
+    def __init__(
+        self,
+        users,
+        projects,
+        issues_per_project,
+        comments_per_issue,
+        seed=None,
+        batch_size=5000,
+        password="applepie94",
+    ):
+        self.users_count = users
+        self.projects_count = projects
+        self.issues_per_project = issues_per_project
+        self.comments_per_issue = comments_per_issue
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        # le hachage du mot de passe est coûteux: il n'est calculé qu'une seule fois pour tous les utilisateurs
+        self.password_hash = make_password(password)
+        self.now = datetime.now().replace(microsecond=0)
+        self.rows = {}
+        self.durations = {}
+
+    def next_id(self, model):
+        return (model.objects.aggregate(max_id=Max("id"))["max_id"] or 0) + 1
+
+    def skewed_count(self, mean, maximum_factor=50):
+        """
+        Description: tirage d'un entier suivant une loi de Pareto de moyenne 'mean'.
+        """
+        if mean <= 0:
+            return 0
+        scale = mean * (self.PARETO_SHAPE - 1) / self.PARETO_SHAPE
+        value = scale * self.random.paretovariate(self.PARETO_SHAPE)
+        return min(int(value + 0.5), int(mean * maximum_factor))
+
+    def skewed_choice(self, values):
+        """
+        Description: tirage asymétrique: les premiers éléments sont beaucoup plus souvent choisis.
+        values ne doit pas être vide.
+        """
+        index = int(self.random.paretovariate(1.2)) - 1
+        return values[index % len(values)]
+
+    def weighted_choice(self, choices):
+        values, weights = choices
+        return self.random.choices(values, weights)[0]
+
+    def sentence(self, minimum, maximum):
+        words = self.random.choices(WORDS, k=self.random.randint(minimum, maximum))
+        return " ".join(words).capitalize()
+
+    def random_time(self, after, days=730):
+        start = max(after, self.now - timedelta(days=days))
+        seconds = int((self.now - start).total_seconds())
+        return start + timedelta(seconds=self.random.randint(0, max(seconds, 0)))
+
+    def insert(self, model, objects):
+        if not objects:
+            return
+        start = perf_counter()
+        with transaction.atomic():
+            model.objects.bulk_create(objects, batch_size=self.batch_size)
+        name = model.__name__
+        self.rows[name] = self.rows.get(name, 0) + len(objects)
+        self.durations[name] = self.durations.get(name, 0) + perf_counter() - start
+
+    def generate_users(self):
+        User = get_user_model()
+        first_id = self.next_id(User)
+        users, user_ids = [], []
+        for index in range(self.users_count):
+            user_id = first_id + index
+            birth_year = self.random.randint(1950, date.today().year - 10)
+            users.append(
+                User(
+                    id=user_id,
+                    username=f"synthetic.user{user_id}",
+                    first_name=f"user{user_id}",
+                    last_name="synthetic",
+                    email=f"synthetic.user{user_id}@bluelake.fr",
+                    password=self.password_hash,
+                    birthdate=date(birth_year, self.random.randint(1, 12), 1),
+                    general_cnil_approvement=True,
+                    can_contribute_to_a_project=self.random.random() < 0.95,
+                    can_profile_viewable=self.random.random() < 0.8,
+                    created_time=self.random_time(self.now - timedelta(days=1095)),
+                )
+            )
+            user_ids.append(user_id)
+            if len(users) >= self.batch_size:
+                self.insert(User, users)
+                users = []
+        self.insert(User, users)
+        return user_ids
+
+    def generate_projects(self, user_ids):
+        """
+        Description: crée les projets et leurs contributeurs. Retourne pour chaque projet
+        (id, statut, date de création, identifiants des contributeurs).
+        """
+        first_id = self.next_id(Projects)
+        projects, contributors, generated = [], [], []
+        for index in range(self.projects_count):
+            project_id = first_id + index
+            author_id = self.skewed_choice(user_ids)
+            project_status = self.weighted_choice(PROJECT_STATUSES)
+            created_time = self.random_time(self.now - timedelta(days=730))
+            projects.append(
+                Projects(
+                    id=project_id,
+                    title=self.sentence(3, 8),
+                    description=self.sentence(10, 60),
+                    type=self.random.choice(PROJECT_TYPES),
+                    status=project_status,
+                    created_time=created_time,
+                )
+            )
+            members = {author_id}
+            for _ in range(self.skewed_count(5, maximum_factor=20)):
+                members.add(self.random.choice(user_ids))
+            contributors.append(
+                Contributors(
+                    user_id_id=author_id,
+                    project_id_id=project_id,
+                    role=Contributors.AUTHOR,
+                    created_time=created_time,
+                )
+            )
+            for member_id in members:
+                contributors.append(
+                    Contributors(
+                        user_id_id=member_id,
+                        project_id_id=project_id,
+                        role=Contributors.CONTRIBUTOR,
+                        created_time=created_time,
+                    )
+                )
+            generated.append((project_id, project_status, created_time, list(members)))
+            if len(projects) >= self.batch_size:
+                self.insert(Projects, projects)
+                self.insert(Contributors, contributors)
+                projects, contributors = [], []
+        self.insert(Projects, projects)
+        self.insert(Contributors, contributors)
+        return generated
+
+    def generate_issues_and_comments(self, projects):
+        issue_id = self.next_id(Issues)
+        issues, comments = [], []
+        for project_id, project_status, project_time, members in projects:
+            for _ in range(self.skewed_count(self.issues_per_project)):
+                issue_time = self.random_time(project_time)
+                issues.append(
+                    Issues(
+                        id=issue_id,
+                        title=self.sentence(3, 10),
+                        description=self.sentence(10, 80),
+                        balise=self.random.choice(ISSUE_BALISES),
+                        priority=self.weighted_choice(ISSUE_PRIORITIES),
+                        project_id_id=project_id,
+                        status=(
+                            self.weighted_choice(ISSUE_STATUSES)
+                            if project_status == "Open"
+                            else "Finished"
+                        ),
+                        author_user_id_id=self.random.choice(members),
+                        assignee_user_id_id=(
+                            self.random.choice(members)
+                            if self.random.random() < 0.7
+                            else None
+                        ),
+                        created_time=issue_time,
+                    )
+                )
+                for _ in range(self.skewed_count(self.comments_per_issue)):
+                    comments.append(
+                        Comments(
+                            uuid=uuid.UUID(int=self.random.getrandbits(128), version=4),
+                            title=self.sentence(2, 8),
+                            description=self.sentence(5, 60),
+                            author_user_id_id=self.random.choice(members),
+                            issue_id_id=issue_id,
+                            created_time=self.random_time(issue_time),
+                        )
+                    )
+                issue_id += 1
+                if len(issues) + len(comments) >= self.batch_size:
+                    # les problèmes sont insérés avant les commentaires qui les référencent
+                    self.insert(Issues, issues)
+                    self.insert(Comments, comments)
+                    issues, comments = [], []
+        self.insert(Issues, issues)
+        self.insert(Comments, comments)
+
+    def generate_counters(self, first_project_id):
+        """
+        Description: calcule, par requêtes ensemblistes, les compteurs des projets générés et de leurs problèmes.
+        """
+        start = perf_counter()
+        project_ids = Projects.objects.filter(id__gte=first_project_id).values("id")
+        issue_ids = Issues.objects.filter(project_id__gte=first_project_id).values("id")
+        with transaction.atomic():
+            repair_projects_counters(project_ids)
+            repair_issues_counters(issue_ids)
+        self.durations["counters"] = perf_counter() - start
+
+    def run(self):
+        start = perf_counter()
+        user_ids = self.generate_users()
+        if not user_ids:
+            user_ids = list(get_user_model().objects.values_list("id", flat=True))
+        # sans utilisateur, aucun projet ne peut avoir d'auteur: rien n'est généré
+        projects = self.generate_projects(user_ids) if user_ids else []
+        self.generate_issues_and_comments(projects)
+        if projects:
+            self.generate_counters(projects[0][0])
+        self.durations["total"] = perf_counter() - start
+        self.rows["total"] = sum(self.rows.values())
+        return self.report()
+
+    def report(self):
+        """
+        Description: nombre de lignes insérées et débit (lignes par seconde), par table.
+        """
+        lines = []
+        for name, rows in self.rows.items():
+            duration = self.durations.get(name, 0)
+            rate = rows / duration if duration else 0
+            lines.append(f"{name}: {rows} rows in {duration:.2f}s ({rate:.0f} rows/s)")
+        return lines
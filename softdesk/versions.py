@@ -0,0 +1,29 @@
+from django.db.models import F
+from django.utils.timezone import now
+
+from softdesk.models import Projects
+
+
+def bump_projects_versions(project_ids):
+    """
+    Description: incrémente la version (et la date de modification) des projets, en un seul UPDATE.
+    À appeler dans la transaction de l'écriture: la nouvelle version n'est visible qu'avec les données écrites.
+    """
+    project_ids = set(project_ids)
+    if not project_ids:
+        return 0
+    return Projects.objects.filter(id__in=project_ids).update(
+        version=F("version") + 1, updated_time=now()
+    )
+
+
+def bump_project_version(project_id):
+    return bump_projects_versions([project_id])
+
+
+def project_version(project_id):
+    """
+    Description: version courante du projet, ou None si le projet n'existe pas.
+    Un cache (ou un client) qui conserve une donnée d'un projet la clé sur (project_id, version).
+    """
+    return Projects.objects.filter(id=project_id).values_list("version", flat=True).first()
@@ -6,11 +6,16 @@ from rest_framework import generics
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.pagination import LimitOffsetPagination
-from werkzeug.security import generate_password_hash
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from django.contrib.auth.hashers import make_password
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils.timezone import now
 import json
+import logging
 import uuid
 
 from softdesk.permissions import (
@@ -41,14 +46,42 @@ from softdesk.serializers import (
     ProjectListSerializer,
     IssueSerializer,
     IssuesSerializer,
+    IssuesBulkSerializer,
     IssuesStatusSerializer,
     CommentListSerializer,
     CommentDetailSerializer,
     CommentUpdateSerializer,
     ContributorUpdateSerializer,
     ContributorListSerializer,
+    JobSerializer,
 )
-from softdesk.models import Projects, Issues, Comments, Contributors
+from softdesk.models import Projects, Issues, Comments, Contributors, Jobs, Changes
+from softdesk.membership import get_membership, invalidate_user_memberships
+from softdesk.pagination import get_paginator, get_paginated_response
+from softdesk.export import EXPORT_FORMATS, EXPORTERS
+from softdesk.jobs import enqueue_job
+from softdesk.purge import PURGE_JOB, PurgeEngine
+from softdesk.cascades import enqueue_finish_project_issues, has_unfinished_issues
+from softdesk.search import build_match_query, search, search_available
+from softdesk.conditional import ConditionalGet, project_validators
+from softdesk.versions import bump_project_version, bump_projects_versions
+from softdesk.changes import change_log_available, read_changes
+from softdesk.fieldsets import Fieldset
+from softdesk.fast_serializers import get_values_serializer
+from softdesk import counters
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_list_conditional(request, project_id, fieldset):
+    """
+    Description: validateurs d'une liste d'un projet (version du projet), sauf si des utilisateurs sont imbriqués
+    (?expand=...): la modification d'un profil n'incrémente pas la version des projets.
+    """
+    if fieldset.expand:
+        return None
+    return ConditionalGet(request, *project_validators(project_id))
 
 
 class UserAPIView(APIView):
@@ -97,8 +130,19 @@ class UserAPIView(APIView):
             return Response(status=status.HTTP_404_NOT_FOUND)
 
         if UserCanUpdateUser().has_permission(self.request, self, *args, **kwargs):
+            # projets dont l'utilisateur est contributeur, assigné, auteur de problèmes ou de commentaires
+            versioned_projects_ids = set(
+                Contributors.objects.filter(user_id=pk)
+                .values_list("project_id")
+                .union(
+                    Issues.objects.filter(assignee_user_id=pk).values_list("project_id"),
+                    Issues.objects.filter(author_user_id=pk).values_list("project_id"),
+                    Comments.objects.filter(author_user_id=pk).values_list("issue_id__project_id"),
+                )
+                .values_list("project_id", flat=True)
+            )
             issues = Issues.objects.filter(assignee_user_id=pk).update(
-                assignee_user_id=""
+                assignee_user_id="", updated_time=now()
             )
             contributions_queryset = (
                 Contributors.objects.filter(Q(user_id__in=[self.request.user.id]))
@@ -109,8 +153,20 @@ class UserAPIView(APIView):
                 Q(id__in=contributions_queryset)
             )
             serializer = ContributorListSerializer(contributions_queryset, many=True)
+            # les problèmes et commentaires de l'utilisateur sont supprimés en cascade: compteurs à recalculer
+            projects_ids = set(
+                Issues.objects.filter(author_user_id=pk).values_list("project_id", flat=True)
+            )
+            issues_ids = set(
+                Comments.objects.filter(author_user_id=pk).values_list("issue_id", flat=True)
+            )
             projects_queryset.delete()
             user.delete()
+            counters.repair_projects_counters(projects_ids)
+            counters.repair_issues_counters(issues_ids)
+            bump_projects_versions(versioned_projects_ids)
+            invalidate_user_memberships(pk)
+            invalidate_user_memberships(self.request.user.id)
             return Response(status=status.HTTP_204_NO_CONTENT)
         message = {}
         return Response(message, status=status.HTTP_403_FORBIDDEN)
@@ -141,7 +197,7 @@ class UsersAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        paginator = LimitOffsetPagination()
+        paginator = get_paginator(request)
         queryset = get_user_model().objects.all()
         if queryset is None:
             return Response(status=status.HTTP_404_NOT_FOUND)
@@ -158,22 +214,28 @@ class UsersAPIView(APIView):
             serializer = UserListSerializer(
                 result_page, many=True, context={"request": request}
             )
-        return Response(serializer.data)
+        return get_paginated_response(paginator, serializer.data)
 
-    @transaction.atomic
     def delete(self, request, pk=None, *args, **kwargs):
-        users = get_user_model().objects.all()
-        if not users:
+        """
+        Description: supprime toutes les données, sauf les super utilisateurs, par lots validés au fil de l'eau.
+        Avec ?mode=async la suppression est confiée à un traitement en arrière-plan: la réponse (202) donne
+        l'url de consultation de son avancement.
+        """
+        if not get_user_model().objects.exists():
             return Response(status=status.HTTP_404_NOT_FOUND)
-        if self.request.user.is_superuser:
-            for user in users:
-                if not user.is_superuser:
-                    user.delete()
-            Issues.objects.all().delete()
-            Projects.objects.all().delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        else:
+        if not self.request.user.is_superuser:
             return Response(status=status.HTTP_403_FORBIDDEN)
+        if request.query_params.get("mode") == "async":
+            job = enqueue_job(PURGE_JOB, created_by=request.user.id)
+            message = {
+                "job_id": job.id,
+                "status": job.status,
+                "url": reverse("jobs_detail", kwargs={"pk": job.id}),
+            }
+            return Response(message, status=status.HTTP_202_ACCEPTED)
+        PurgeEngine().run()
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class UserUpdatePasswordGenericsAPIView(generics.UpdateAPIView):
@@ -200,9 +262,6 @@ class UserUpdatePasswordGenericsAPIView(generics.UpdateAPIView):
         )
         if serializer.is_valid():
             new_password = request.data["password"]
-            hashed_password = generate_password_hash(
-                new_password, method="pbkdf2:sha256", salt_length=16
-            )
             user.password = make_password(new_password)
             user.save()
             return Response(serializer.data)
@@ -226,7 +285,7 @@ class ProjectsUsersAPIView(APIView):
 
     def get(self, request, pk=None, user_id=None, *args, **kwargs):
         serializer = ProjectListSerializer()
-        paginator = LimitOffsetPagination()
+        paginator = get_paginator(request)
         if pk is None:
             if self.request.user.is_superuser:
                 queryset = Contributors.objects.all()
@@ -248,7 +307,7 @@ class ProjectsUsersAPIView(APIView):
                 else:
                     message = {}
                     return Response(message, status=status.HTTP_403_FORBIDDEN)
-            return Response(serializer.data)
+            return get_paginated_response(paginator, serializer.data)
         else:
             try:
                 queryset = Contributors.objects.filter(project_id=pk)
@@ -271,9 +330,7 @@ class ProjectsUsersAPIView(APIView):
             return Response(serializer.data)
 
     def post(self, request, pk, *args, **kwargs):
-        try:
-            Projects.objects.get(id=pk)
-        except Exception:
+        if not get_membership(request).project_exists(pk):
             return Response(status=status.HTTP_404_NOT_FOUND)
 
         if UserNotAlreadyInProject().has_permission(
@@ -304,7 +361,10 @@ class ProjectsUsersAPIView(APIView):
                         request.data["role"] = "CONTRIBUTOR"
                         serializer = ContributorUpdateSerializer(data=request.data)
                         if serializer.is_valid():
-                            serializer.save()
+                            with transaction.atomic():
+                                serializer.save()
+                                bump_project_version(pk)
+                            invalidate_user_memberships(user.id)
                             return Response(serializer.data)
                         return Response(
                             serializer.errors, status=status.HTTP_400_BAD_REQUEST
@@ -318,22 +378,29 @@ class ProjectsUsersAPIView(APIView):
     @transaction.atomic
     def delete(self, request, pk=None, user_id=None, *args, **kwargs):
         if UserCanUpdateProject().has_permission(self.request, self, *args, **kwargs):
+            if Contributors.CONTRIBUTOR not in get_membership(request).user_roles(
+                pk, user_id
+            ):
+                return Response(status=status.HTTP_404_NOT_FOUND)
             contributors = (
                 Contributors.objects.filter(project_id=pk)
                 .filter(user_id=user_id)
                 .filter(role="CONTRIBUTOR")
             )
-            if not contributors:
-                return Response(status=status.HTTP_404_NOT_FOUND)
             if ProjectCanBeUpdate().has_permission(self.request, self, *args, **kwargs):
                 if UserCanDeleteUserFromProject().has_permission(
                     self.request, self, *args, **kwargs
                 ):
                     contributors.delete()
-                    issues = Issues.objects.filter(assignee_user_id=user_id)
-                    for issue in issues:
-                        issue.assignee_user_id = None
-                        issue.save()
+                    invalidate_user_memberships(user_id)
+                    issues_ids = Issues.unassign(pk, user_id)
+                    bump_project_version(pk)
+                    logger.info(
+                        "project %s: user %s unassigned from %s issues",
+                        pk,
+                        user_id,
+                        len(issues_ids),
+                    )
                     return Response(status=status.HTTP_204_NO_CONTENT)
                 else:
                     message = {}
@@ -346,6 +413,163 @@ class ProjectsUsersAPIView(APIView):
             return Response(message, status=status.HTTP_403_FORBIDDEN)
 
 
+class IssuesBulkAPIView(APIView):
+    """
+    Description: dédiée à permettre l'ajout en masse de problèmes à un projet, dans une seule transaction.
+    Les utilisateurs assignés sont résolus en une seule requête, avec leur qualité de contributeur du projet.
+    Si un problème est invalide, aucun n'est créé et les erreurs sont retournées dans l'ordre des problèmes reçus.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk, *args, **kwargs):
+        if not get_membership(request).project_exists(pk):
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        if not ProjectCanBeUpdate().has_permission(self.request, self, *args, **kwargs):
+            message = {"message": "Projet doit être au statut 'Open'"}
+            return Response(message, status=status.HTTP_403_FORBIDDEN)
+        if not UserCanCreateIssue().has_permission(self.request, self, *args, **kwargs):
+            message = {}
+            return Response(message, status=status.HTTP_403_FORBIDDEN)
+
+        items = request.data
+        if not isinstance(items, list) or len(items) == 0:
+            message = {"message": "A non empty list of issues is expected"}
+            return Response(message, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.SOFTDESK_BULK_ISSUES_MAX_SIZE:
+            message = {
+                "message": f"At most {settings.SOFTDESK_BULK_ISSUES_MAX_SIZE} issues can be created at once"
+            }
+            return Response(message, status=status.HTTP_400_BAD_REQUEST)
+
+        author_user_id = request.user.id
+        args_list = []
+        users_ids = {author_user_id}
+        for item in items:
+            if isinstance(item, dict):
+                item = dict(item, project_id=pk, author_user_id=author_user_id)
+                try:
+                    users_ids.add(int(item.get("assignee_user_id")))
+                except (TypeError, ValueError):
+                    pass
+            args_list.append(item)
+
+        users = (
+            get_user_model()
+            .objects.filter(id__in=users_ids)
+            .annotate(
+                is_project_contributor=Exists(
+                    Contributors.objects.filter(project_id=pk, user_id=OuterRef("id"))
+                )
+            )
+            .in_bulk()
+        )
+        context = {
+            "preloaded": {
+                "project_id": {int(pk): Projects.objects.get(id=pk)},
+                "author_user_id": users,
+                "assignee_user_id": users,
+            },
+            "contributor_ids": {
+                user_id for user_id, user in users.items() if user.is_project_contributor
+            },
+        }
+        serializer = IssuesBulkSerializer(data=args_list, many=True, context=context)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            issues = Issues.objects.bulk_create(
+                [Issues(**attrs) for attrs in serializer.validated_data]
+            )
+            counters.issues_created(pk, [issue.status for issue in issues])
+            bump_project_version(pk)
+        serializer = IssuesSerializer(issues, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class ProjectExportAPIView(APIView):
+    """
+    Description: dédiée à l'export complet des problèmes d'un projet et de leurs commentaires.
+    La réponse est produite au fil de l'eau (NDJSON par défaut, ou CSV avec ?export_format=csv),
+    depuis des lignes values() lues par lots: la mémoire utilisée ne dépend pas de la taille du projet.
+    Le paramètre 'format' est réservé par Django REST framework au choix du rendu, d'où 'export_format'.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, *args, **kwargs):
+        if not get_membership(request).project_exists(pk):
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        if not self.request.user.is_superuser and not UserCanViewProject().has_permission(
+            self.request, self, *args, **kwargs
+        ):
+            message = {}
+            return Response(message, status=status.HTTP_403_FORBIDDEN)
+
+        export_format = request.query_params.get("export_format", "ndjson")
+        if export_format not in EXPORTERS:
+            message = {
+                "message": f"Export format '{export_format}' unknow. Authorized values: {', '.join(EXPORTERS)}"
+            }
+            return Response(message, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(
+            EXPORTERS[export_format](pk), content_type=EXPORT_FORMATS[export_format]
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="project_{pk}.{export_format}"'
+        )
+        return response
+
+
+class ProjectChangesAPIView(APIView):
+    """
+    Description: dédiée à la synchronisation incrémentale d'un projet (?since=curseur, 0 par défaut).
+    Retourne les problèmes, commentaires et contributeurs créés ou modifiés depuis le curseur,
+    les identifiants de ceux supprimés, et le curseur à passer à l'appel suivant.
+    Tant que 'more' est vrai, d'autres changements restent à lire.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, *args, **kwargs):
+        if not change_log_available():
+            message = {"message": "Changes require a SQLite database"}
+            return Response(message, status=status.HTTP_501_NOT_IMPLEMENTED)
+        if not get_membership(request).project_exists(pk):
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        if not self.request.user.is_superuser and not UserCanViewProject().has_permission(
+            self.request, self, *args, **kwargs
+        ):
+            message = {}
+            return Response(message, status=status.HTTP_403_FORBIDDEN)
+
+        since = request.query_params.get("since", "0")
+        if not since.isdigit():
+            message = {"message": "Query parameter 'since' must be a cursor returned by a previous call"}
+            return Response(message, status=status.HTTP_400_BAD_REQUEST)
+
+        changes = read_changes(pk, int(since), settings.SOFTDESK_CHANGES_PAGE_SIZE)
+        rows = changes["rows"]
+        return Response(
+            {
+                "cursor": changes["cursor"],
+                "version": changes["version"],
+                "more": changes["more"],
+                "issues": IssuesSerializer(rows[Changes.ISSUE], many=True).data,
+                "comments": CommentDetailSerializer(rows[Changes.COMMENT], many=True).data,
+                "contributors": ContributorListSerializer(rows[Changes.CONTRIBUTOR], many=True).data,
+                "deleted": {
+                    "issues": changes["deleted"][Changes.ISSUE],
+                    "comments": changes["deleted"][Changes.COMMENT],
+                    "contributors": changes["deleted"][Changes.CONTRIBUTOR],
+                },
+            }
+        )
+
+
 class IssuesRetrieveUpdateAPIView(generics.RetrieveUpdateAPIView):
     """
     Description: dédiée à permettre la modification du seul statut d'un problème.
@@ -363,10 +587,9 @@ class IssuesRetrieveUpdateAPIView(generics.RetrieveUpdateAPIView):
         return Issues.objects.all()
 
     def put(self, request, pk, issue_id, *args, **kwargs):
-        try:
-            Projects.objects.get(id=pk)
-            issue = Issues.objects.get(id=issue_id)
-        except Exception:
+        membership = get_membership(request)
+        issue = membership.issue(issue_id)
+        if not membership.project_exists(pk) or issue is None:
             return Response(status=status.HTTP_404_NOT_FOUND)
         serializer = IssuesStatusSerializer(issue, data=request.data, partial=True)
         if IssueCanBeUpdate().has_permission(self.request, self, *args, **kwargs):
@@ -378,7 +601,13 @@ class IssuesRetrieveUpdateAPIView(generics.RetrieveUpdateAPIView):
                         self.request, self, *args, **kwargs
                     ):
                         if serializer.is_valid():
-                            serializer.save()
+                            new_status = serializer.validated_data.get("status", issue.status)
+                            with transaction.atomic():
+                                if not counters.change_issue_status(issue, new_status):
+                                    message = {"message": "Le statut du problème a été modifié entre-temps"}
+                                    return Response(message, status=status.HTTP_409_CONFLICT)
+                                serializer.save()
+                                bump_project_version(issue.project_id_id)
                             return Response(serializer.data)
                 return Response(status=status.HTTP_403_FORBIDDEN)
             else:
@@ -392,6 +621,10 @@ class IssuesRetrieveUpdateAPIView(generics.RetrieveUpdateAPIView):
         message = {}
         return Response(message, status=status.HTTP_400_BAD_REQUEST)
 
+    def patch(self, request, pk, issue_id, *args, **kwargs):
+        # la mise à jour est déjà partielle: PATCH suit le même chemin (compteurs, version du projet)
+        return self.put(request, pk, issue_id, *args, **kwargs)
+
 
 class IssuesAPIView(APIView):
     """
@@ -407,36 +640,39 @@ class IssuesAPIView(APIView):
         return Issues.objects.all()
 
     def get(self, request, pk, issue_id=None, *args, **kwargs):
-        paginator = LimitOffsetPagination()
-        if Issues.objects.filter(project_id=pk).count() == 0:
+        paginator = get_paginator(request)
+        if not Projects.objects.filter(id=pk, issues_count__gt=0).exists():
             return Response(status=status.HTTP_404_NOT_FOUND)
         if issue_id is None:
-            try:
-                queryset = Issues.objects.filter(project_id=pk)
-            except Exception:
-                return Response(status=status.HTTP_404_NOT_FOUND)
+            if not self.request.user.is_superuser and not UserCanViewProject().has_permission(
+                self.request, self, *args, **kwargs
+            ):
+                message = {}
+                return Response(message, status=status.HTTP_403_FORBIDDEN)
 
-            if self.request.user.is_superuser:
-                result_page = paginator.paginate_queryset(queryset, request)
-                serializer = IssuesSerializer(
-                    result_page, many=True, context={"request": request}
-                )
+            fieldset = Fieldset(request, IssuesSerializer)
+            if fieldset.error is not None:
+                message = {"message": fieldset.error}
+                return Response(message, status=status.HTTP_400_BAD_REQUEST)
+            conditional = get_list_conditional(request, pk, fieldset)
+            if conditional is not None:
+                not_modified = conditional.not_modified()
+                if not_modified is not None:
+                    return not_modified
+            queryset = Issues.objects.filter(project_id=pk)
+            if fieldset.expand:
+                result_page = paginator.paginate_queryset(fieldset.apply(queryset), request)
+                data = IssuesSerializer(
+                    result_page, many=True, context={"request": request}, **fieldset.serializer_kwargs()
+                ).data
             else:
-                if UserCanViewProject().has_permission(
-                    self.request, self, *args, **kwargs
-                ):
-                    result_page = paginator.paginate_queryset(queryset, request)
-                    serializer = IssuesSerializer(
-                        result_page, many=True, context={"request": request}
-                    )
-                else:
-                    message = {}
-                    return Response(message, status=status.HTTP_403_FORBIDDEN)
-            return Response(serializer.data)
+                fast_serializer = get_values_serializer(IssuesSerializer, fieldset.fields_key())
+                data = fast_serializer.data(fast_serializer.paginate(paginator, queryset, request))
+            response = get_paginated_response(paginator, data)
+            return conditional.apply(response) if conditional is not None else response
         else:
-            try:
-                queryset = Issues.objects.get(id=issue_id)
-            except Exception:
+            queryset = get_membership(request).issue(issue_id)
+            if queryset is None:
                 return Response(status=status.HTTP_404_NOT_FOUND)
 
             if self.request.user.is_superuser:
@@ -453,9 +689,7 @@ class IssuesAPIView(APIView):
 
     def post(self, request, pk, *args, **kwargs):
         args_dict = json.loads(request.body)
-        try:
-            project = Projects.objects.get(id=pk)
-        except Exception:
+        if not get_membership(request).project_exists(pk):
             return Response(status=status.HTTP_404_NOT_FOUND)
 
         if ProjectCanBeUpdate().has_permission(self.request, self, *args, **kwargs):
@@ -472,12 +706,15 @@ class IssuesAPIView(APIView):
                 except Exception:
                     pass
                 author_user_id = request.user
-                args_dict["project_id"] = project.id
+                args_dict["project_id"] = pk
                 args_dict["author_user_id"] = author_user_id.id
 
                 serializer = IssuesSerializer(data=args_dict, many=False)
                 if serializer.is_valid():
-                    serializer.save()
+                    with transaction.atomic():
+                        issue = serializer.save()
+                        counters.issues_created(pk, [issue.status])
+                        bump_project_version(issue.project_id_id)
                 else:
                     return Response(
                         serializer.errors, status=status.HTTP_400_BAD_REQUEST
@@ -492,10 +729,9 @@ class IssuesAPIView(APIView):
 
     def put(self, request, pk, issue_id, *args, **kwargs):
         args_dict = json.loads(request.body)
-        try:
-            Projects.objects.get(id=pk)
-            issue = Issues.objects.get(id=issue_id)
-        except Exception:
+        membership = get_membership(request)
+        issue = membership.issue(issue_id)
+        if not membership.project_exists(pk) or issue is None:
             return Response(status=status.HTTP_404_NOT_FOUND)
 
         if IssueCanBeUpdate().has_permission(self.request, self, *args, **kwargs):
@@ -513,7 +749,13 @@ class IssuesAPIView(APIView):
                                 issue, data=request.data, partial=True
                             )
                             if serializer.is_valid():
-                                serializer.save()
+                                new_status = serializer.validated_data.get("status", issue.status)
+                                with transaction.atomic():
+                                    if not counters.change_issue_status(issue, new_status):
+                                        message = {"message": "Le statut du problème a été modifié entre-temps"}
+                                        return Response(message, status=status.HTTP_409_CONFLICT)
+                                    serializer.save()
+                                    bump_project_version(issue.project_id_id)
                                 return Response(serializer.data)
                             return Response(
                                 serializer.errors, status=status.HTTP_400_BAD_REQUEST
@@ -524,7 +766,13 @@ class IssuesAPIView(APIView):
                             issue, data=request.data, partial=True
                         )
                         if serializer.is_valid():
-                            serializer.save()
+                            new_status = serializer.validated_data.get("status", issue.status)
+                            with transaction.atomic():
+                                if not counters.change_issue_status(issue, new_status):
+                                    message = {"message": "Le statut du problème a été modifié entre-temps"}
+                                    return Response(message, status=status.HTTP_409_CONFLICT)
+                                serializer.save()
+                                bump_project_version(issue.project_id_id)
                             return Response(serializer.data)
                         return Response(
                             serializer.errors, status=status.HTTP_400_BAD_REQUEST
@@ -541,19 +789,21 @@ class IssuesAPIView(APIView):
         return Response(message, status=status.HTTP_403_FORBIDDEN)
 
     def delete(self, request, pk, issue_id, *args, **kwargs):
-        try:
-            Projects.objects.get(id=pk)
-            issue = Issues.objects.get(id=issue_id)
-        except Exception:
+        membership = get_membership(request)
+        issue = membership.issue(issue_id)
+        if not membership.project_exists(pk) or issue is None:
             return Response(status=status.HTTP_404_NOT_FOUND)
 
         if ProjectCanBeUpdate().has_permission(self.request, self, *args, **kwargs):
             if UserCanUpdateProject().has_permission(
                 self.request, self, *args, **kwargs
             ):
-                if issue.status in ["To Do", "In Progress"]:
-                    issue.status = "Finished"
-                    issue.save()
+                if issue.status in Issues.OPEN_STATUSES:
+                    with transaction.atomic():
+                        # fermé entre-temps par une requête concurrente: déjà supprimé
+                        if not counters.change_issue_status(issue, "Finished"):
+                            return Response(status=status.HTTP_404_NOT_FOUND)
+                        bump_project_version(issue.project_id_id)
                     return Response(status=status.HTTP_204_NO_CONTENT)
                 else:
                     return Response(status=status.HTTP_404_NOT_FOUND)
@@ -576,46 +826,47 @@ class CommentsAPIView(APIView):
         return Comments.objects.all()
 
     def get(self, request, pk, issue_id, comment_id=None, *args, **kwargs):
-        paginator = LimitOffsetPagination()
-        if Issues.objects.filter(project_id=pk).count() == 0:
+        paginator = get_paginator(request)
+        if not Projects.objects.filter(id=pk, issues_count__gt=0).exists():
             return Response(status=status.HTTP_404_NOT_FOUND)
 
         if comment_id is None:
-            try:
-                Projects.objects.get(id=pk)
-                Issues.objects.get(id=issue_id)
-                queryset = Comments.objects.filter(issue_id=issue_id)
-            except Exception:
+            membership = get_membership(request)
+            if not membership.project_exists(pk) or membership.issue(issue_id) is None:
+                return Response(status=status.HTTP_404_NOT_FOUND)
+            if not self.request.user.is_superuser and not UserCanViewProject().has_permission(
+                self.request, self, *args, **kwargs
+            ):
+                message = {}
+                return Response(message, status=status.HTTP_403_FORBIDDEN)
+            if membership.issue(issue_id).comments_count == 0:
                 return Response(status=status.HTTP_404_NOT_FOUND)
 
-            if self.request.user.is_superuser:
-                result_page = paginator.paginate_queryset(queryset, request)
-                serializer = CommentListSerializer(
-                    result_page, many=True, context={"request": request}
-                )
+            fieldset = Fieldset(request, CommentListSerializer)
+            if fieldset.error is not None:
+                message = {"message": fieldset.error}
+                return Response(message, status=status.HTTP_400_BAD_REQUEST)
+            conditional = get_list_conditional(request, pk, fieldset)
+            if conditional is not None:
+                not_modified = conditional.not_modified()
+                if not_modified is not None:
+                    return not_modified
+            queryset = Comments.objects.filter(issue_id=issue_id)
+            if fieldset.expand:
+                result_page = paginator.paginate_queryset(fieldset.apply(queryset), request)
+                data = CommentListSerializer(
+                    result_page, many=True, context={"request": request}, **fieldset.serializer_kwargs()
+                ).data
             else:
-                if UserCanViewProject().has_permission(
-                    self.request, self, *args, **kwargs
-                ):
-                    result_page = paginator.paginate_queryset(queryset, request)
-                    serializer = CommentListSerializer(
-                        result_page, many=True, context={"request": request}
-                    )
-                else:
-                    message = {}
-                    return Response(message, status=status.HTTP_403_FORBIDDEN)
-            if not queryset:
-                return Response(status=status.HTTP_404_NOT_FOUND)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+                fast_serializer = get_values_serializer(CommentListSerializer, fieldset.fields_key())
+                data = fast_serializer.data(fast_serializer.paginate(paginator, queryset, request))
+            response = get_paginated_response(paginator, data)
+            return conditional.apply(response) if conditional is not None else response
         else:
-            try:
-                Projects.objects.get(id=pk)
-                Issues.objects.get(id=issue_id)
-                queryset = Comments.objects.filter(issue_id=issue_id).filter(
-                    id=comment_id
-                )
-            except Exception:
+            membership = get_membership(request)
+            if not membership.project_exists(pk) or membership.issue(issue_id) is None:
                 return Response(status=status.HTTP_404_NOT_FOUND)
+            queryset = Comments.objects.filter(issue_id=issue_id).filter(id=comment_id)
 
             if not queryset:
                 return Response(status=status.HTTP_404_NOT_FOUND)
@@ -636,10 +887,9 @@ class CommentsAPIView(APIView):
     def post(self, request, pk, issue_id, *args, **kwargs):
         args_dict = json.loads(request.body)
         comment_uuid = f"{uuid.uuid4()}"
-        try:
-            Projects.objects.get(id=pk)
-            issue_id = Issues.objects.get(id=issue_id)
-        except Exception:
+        membership = get_membership(request)
+        issue_id = membership.issue(issue_id)
+        if not membership.project_exists(pk) or issue_id is None:
             return Response(status=status.HTTP_404_NOT_FOUND)
 
         if IssueCanBeUpdate().has_permission(self.request, self, *args, **kwargs):
@@ -652,7 +902,10 @@ class CommentsAPIView(APIView):
                     args_dict["issue_id"] = issue_id.id
                     serializer = CommentDetailSerializer(data=args_dict, many=False)
                     if serializer.is_valid():
-                        serializer.save()
+                        with transaction.atomic():
+                            serializer.save()
+                            counters.comment_created(issue_id.id)
+                            bump_project_version(issue_id.project_id_id)
                         return Response(serializer.data)
                     else:
                         return Response(
@@ -671,11 +924,10 @@ class CommentsAPIView(APIView):
 
     def put(self, request, pk, issue_id, comment_id, *args, **kwargs):
         args_dict = json.loads(request.body)
-        try:
-            Projects.objects.get(id=pk)
-            issue = Issues.objects.get(id=issue_id)
-            comment = Comments.objects.get(id=comment_id)
-        except Exception:
+        membership = get_membership(request)
+        issue = membership.issue(issue_id)
+        comment = membership.comment(comment_id)
+        if not membership.project_exists(pk) or issue is None or comment is None:
             return Response(status=status.HTTP_404_NOT_FOUND)
 
         if IssueCanBeUpdate().has_permission(self.request, self, *args, **kwargs):
@@ -691,7 +943,9 @@ class CommentsAPIView(APIView):
                             comment, data=request.data, partial=True
                         )
                         if serializer.is_valid():
-                            serializer.save()
+                            with transaction.atomic():
+                                serializer.save()
+                                bump_project_version(issue.project_id_id)
                             return Response(serializer.data)
                         return Response(
                             serializer.errors, status=status.HTTP_400_BAD_REQUEST
@@ -708,11 +962,10 @@ class CommentsAPIView(APIView):
         return Response(message, status=status.HTTP_403_FORBIDDEN)
 
     def delete(self, request, pk, issue_id, comment_id, *args, **kwargs):
-        try:
-            Projects.objects.get(id=pk)
-            issue = Issues.objects.get(id=issue_id)
-            comment = Comments.objects.get(id=comment_id)
-        except Exception:
+        membership = get_membership(request)
+        issue = membership.issue(issue_id)
+        comment = membership.comment(comment_id)
+        if not membership.project_exists(pk) or issue is None or comment is None:
             return Response(status=status.HTTP_404_NOT_FOUND)
 
         if IssueCanBeUpdate().has_permission(self.request, self, *args, **kwargs):
@@ -723,7 +976,10 @@ class CommentsAPIView(APIView):
                     if UserCanUpdateComment().has_permission(
                         self.request, self, *args, **kwargs
                     ):
-                        comment.delete()
+                        with transaction.atomic():
+                            comment.delete()
+                            counters.comment_deleted(issue.id)
+                            bump_project_version(issue.project_id_id)
                         return Response(status=status.HTTP_204_NO_CONTENT)
             else:
                 message = {"message": "Projet doit être au statut 'Open'"}
@@ -761,70 +1017,54 @@ class ProjectsAPIView(APIView):
         return projects_queryset
 
     def get(self, request, pk=None, *args, **kwargs):
-        paginator = LimitOffsetPagination()
-        if Projects.objects.all().count() == 0:
+        paginator = get_paginator(request)
+        if not Projects.objects.exists():
             return Response(status=status.HTTP_404_NOT_FOUND)
         if pk is None:
             if self.request.user.is_superuser:
                 projects_queryset = Projects.objects.all()
-                result_page = paginator.paginate_queryset(projects_queryset, request)
-                serializer = ProjectListSerializer(
-                    result_page, many=True, context={"request": request}
-                )
             else:
-                contributions_queryset = Contributors.objects.filter(
-                    Q(user_id__in=[self.request.user.id])
-                ).values_list("project_id")
                 projects_queryset = Projects.objects.filter(
-                    Q(id__in=contributions_queryset)
+                    Q(id__in=get_membership(request).project_ids())
                 )
-                result_page = paginator.paginate_queryset(projects_queryset, request)
-                serializer = ProjectListSerializer(
-                    result_page, many=True, context={"request": request}
-                )
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            fast_serializer = get_values_serializer(ProjectListSerializer)
+            result_page = fast_serializer.paginate(paginator, projects_queryset, request)
+            return get_paginated_response(paginator, fast_serializer.data(result_page))
         else:
-            try:
-                project = Projects.objects.get(id=pk)
-            except Exception:
+            membership = get_membership(request)
+            if not membership.project_exists(pk):
                 return Response(status=status.HTTP_404_NOT_FOUND)
-
-            if self.request.user.is_superuser:
-                queryset = Projects.objects.get(id=pk)
-                serializer = ProjectDetailSerializer(queryset, many=False)
-                return Response(serializer.data)
-            else:
-                user = self.request.user
-                contributions_queryset = Contributors.objects.filter(
-                    Q(user_id__in=[self.request.user.id])
-                ).values_list("project_id")
-
-                projects_queryset = Projects.objects.filter(
-                    Q(id__in=contributions_queryset)
-                )
-                if project in projects_queryset:
-                    queryset = Projects.objects.get(id=pk)
-                    serializer = ProjectDetailSerializer(queryset, many=False)
-                    return Response(serializer.data)
+            if not self.request.user.is_superuser and not membership.is_contributor(pk):
                 message = {}
                 return Response(message, status=status.HTTP_403_FORBIDDEN)
 
+            conditional = ConditionalGet(request, *project_validators(pk))
+            not_modified = conditional.not_modified()
+            if not_modified is not None:
+                return not_modified
+            projects_queryset = ProjectDetailSerializer.setup_eager_loading(
+                Projects.objects.filter(id=pk)
+            )
+            serializer = ProjectDetailSerializer(projects_queryset.get(), many=False)
+            return conditional.apply(Response(serializer.data))
+
     def post(self, request, *args, **kwargs):
-        user = get_user_model().objects.get(id=request.user.id)
-        request.data["author_user_id"] = user.id
+        user_id = request.user.id
+        request.data["author_user_id"] = user_id
         serializer = ProjectDetailSerializer(data=request.data)
         if serializer.is_valid():
             project_id = serializer.save()
             Contributors.objects.create(
-                user_id=user,
+                user_id_id=user_id,
                 project_id=project_id,
                 role="AUTHOR",
             )
             Contributors.objects.create(
-                user_id=user,
+                user_id_id=user_id,
                 project_id=project_id,
                 role="CONTRIBUTOR",
             )
+            invalidate_user_memberships(user_id)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -842,12 +1082,16 @@ class ProjectsAPIView(APIView):
                 self.request, self, *args, **kwargs
             ):
                 if serializer.is_valid():
-                    serializer.save()
-                    if serializer.data["status"] != "Open":
-                        Issues.objects.filter(project_id=project.id).update(
-                            status="Finished"
-                        )
-                    return Response(serializer.data)
+                    with transaction.atomic():
+                        serializer.save()
+                        bump_project_version(project.id)
+                    project.refresh_from_db(fields=["version", "updated_time"])
+                    headers = {}
+                    # sans problème ouvert, aucun problème à terminer: pas de traitement
+                    if serializer.data["status"] != "Open" and has_unfinished_issues(project.id):
+                        job = enqueue_finish_project_issues(project.id, request.user.id)
+                        headers["Job-Location"] = reverse("jobs_detail", kwargs={"pk": job.id})
+                    return Response(serializer.data, headers=headers)
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             else:
                 message = {}
@@ -858,13 +1102,14 @@ class ProjectsAPIView(APIView):
 
     def delete(self, request, pk=None, *args, **kwargs):
         if pk is None:
-            total_projects = Projects.objects.all().count()
-            if total_projects == 0:
+            if not Projects.objects.exists():
                 return Response(status=status.HTTP_404_NOT_FOUND)
             if UserCanDeleteProjects().has_permission(
                 self.request, self, *args, **kwargs
             ):
                 Projects.objects.all().delete()
+                # sans projet, le journal des changements ne contient plus que des tombstones
+                Changes.objects.all().delete()
                 return Response(status=status.HTTP_204_NO_CONTENT)
             else:
                 message = {}
@@ -878,20 +1123,87 @@ class ProjectsAPIView(APIView):
             if UserCanDeleteProject().has_permission(
                 self.request, self, *args, **kwargs
             ):
-                project_issues_count = Issues.objects.filter(
-                    project_id=project.id
-                ).count()
                 if project.status == "Open":
-                    if project_issues_count == 0:
-                        project.status = "Canceled"
-                    else:
+                    if project.issues_count > 0:
                         project.status = "Archived"
-                    project.save()
-                    Issues.objects.filter(project_id=project.id).update(
-                        status="Finished"
-                    )
-                    return Response(status=status.HTTP_204_NO_CONTENT)
+                    else:
+                        project.status = "Canceled"
+                    with transaction.atomic():
+                        project.save()
+                        bump_project_version(project.id)
+                    headers = {}
+                    if has_unfinished_issues(project.id):
+                        job = enqueue_finish_project_issues(project.id, request.user.id)
+                        headers["Job-Location"] = reverse("jobs_detail", kwargs={"pk": job.id})
+                    return Response(status=status.HTTP_204_NO_CONTENT, headers=headers)
                 return Response(status=status.HTTP_404_NOT_FOUND)
             else:
                 message = {}
                 return Response(message, status=status.HTTP_403_FORBIDDEN)
+
+
+class JobAPIView(APIView):
+    """
+    Description: dédiée à la consultation de l'avancement d'un traitement en arrière-plan.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, *args, **kwargs):
+        job = Jobs.objects.filter(id=pk).first()
+        if job is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        if not self.request.user.is_superuser and job.created_by_id != request.user.id:
+            message = {}
+            return Response(message, status=status.HTTP_403_FORBIDDEN)
+        serializer = JobSerializer(job, many=False)
+        return Response(serializer.data)
+
+
+class SearchAPIView(APIView):
+    """
+    Description: dédiée à la recherche plein texte dans les problèmes et les commentaires (?q=mots à chercher).
+    Les résultats sont ordonnés par pertinence (bm25) et limités aux projets de l'utilisateur.
+    La pagination est de type limit/offset, sans comptage du nombre total de résultats.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        if not search_available():
+            message = {"message": "Search requires a SQLite database"}
+            return Response(message, status=status.HTTP_501_NOT_IMPLEMENTED)
+        text = request.query_params.get("q", "")
+        if build_match_query(text) is None:
+            message = {"message": "Query parameter 'q' must contain at least one word"}
+            return Response(message, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = LimitOffsetPagination()
+        limit = paginator.get_limit(request)
+        offset = paginator.get_offset(request)
+        project_ids = None
+        if not self.request.user.is_superuser:
+            project_ids = sorted(get_membership(request).project_ids())
+        # une ligne de plus que la page: indique s'il existe une page suivante
+        results = search(text, project_ids, limit + 1, offset)
+
+        url = request.build_absolute_uri()
+        next_url = None
+        if len(results) > limit:
+            next_url = replace_query_param(
+                replace_query_param(url, paginator.limit_query_param, limit),
+                paginator.offset_query_param,
+                offset + limit,
+            )
+        previous_url = None
+        if offset > 0:
+            previous_url = replace_query_param(url, paginator.limit_query_param, limit)
+            if offset - limit > 0:
+                previous_url = replace_query_param(
+                    previous_url, paginator.offset_query_param, offset - limit
+                )
+            else:
+                previous_url = remove_query_param(previous_url, paginator.offset_query_param)
+        return Response(
+            {"next": next_url, "previous": previous_url, "results": results[:limit]}
+        )
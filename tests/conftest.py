@@ -0,0 +1,14 @@
+from django.core.cache import caches
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """
+    Les identifiants sont réutilisés d'un test à l'autre: on vide les caches entre chaque test.
+    """
+    for cache in caches.all():
+        cache.clear()
+    yield
+    for cache in caches.all():
+        cache.clear()
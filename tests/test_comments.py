@@ -1073,3 +1073,38 @@ class TestCommentsCrudAndAuthorization:
             headers=headers,
         )
         assert response.status_code == 403
+
+    @pytest.mark.django_db
+    def test_get_comments_list_with_sparse_fields_and_expanded_author(self):
+        """
+        Ensure the comments list can be trimmed with ?fields= and returns its authors with ?expand=author.
+        """
+        client = Client()
+        client.post(reverse("signup"), data=self.user_data1)
+        response = client.post(
+            reverse("login"),
+            data={"username": self.user_data1["username"], "password": self.user_data1["password"]},
+        )
+        headers = {"Authorization": f"Bearer {response.data['access']}"}
+        response = client.post(
+            reverse("projects"), data=self.project_data1, content_type="application/json", headers=headers
+        )
+        project_id = response.data["id"]
+        response = client.post(
+            reverse("issues", kwargs={"pk": project_id}),
+            data=self.issue_data1,
+            content_type="application/json",
+            headers=headers,
+        )
+        issue_id = response.data["id"]
+        url = reverse("comments", kwargs={"pk": project_id, "issue_id": issue_id})
+        response = client.post(url, data=self.comment_data1, content_type="application/json", headers=headers)
+        assert response.status_code == 200
+
+        response = client.get(url, data={"fields": "id,title", "expand": "author"}, headers=headers)
+        assert response.status_code == 200
+        assert list(response.data[0]) == ["id", "title", "author"]
+        assert response.data[0]["author"]["username"] == self.user_data1["username"]
+
+        response = client.get(url, data={"expand": "assignee"}, headers=headers)
+        assert response.status_code == 400
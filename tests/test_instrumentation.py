@@ -0,0 +1,193 @@
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+import json
+import logging
+import pytest
+
+from authentication.models import User
+from softdesk import metrics
+from softdesk.counters import repair_projects_counters
+from softdesk.instrumentation import PERMISSIONS_SPAN, Recorder, current_recorder, span
+from softdesk.models import Projects, Issues, Contributors
+from softdesk.query_inspector import QueryInspector, fingerprint
+
+
+@pytest.mark.django_db
+class TestInstrumentation:
+    def setup_project(self, issues_count):
+        owner = User.objects.create_user(
+            username="donald.duck",
+            email="donald.duck@bluelake.fr",
+            password="applepie94",
+            birthdate="2001-07-15",
+            general_cnil_approvement=True,
+        )
+        project = Projects.objects.create(title="projet", description="bla bla bla", type="back-end")
+        Contributors.objects.create(user_id=owner, project_id=project, role=Contributors.AUTHOR)
+        Contributors.objects.create(user_id=owner, project_id=project, role=Contributors.CONTRIBUTOR)
+        for index in range(issues_count):
+            Issues.objects.create(
+                title=f"problème {index}",
+                description="bla bla bla",
+                balise="BUG",
+                priority="LOW",
+                project_id=project,
+                author_user_id=owner,
+            )
+        repair_projects_counters()
+        return owner, project
+
+    def login(self, client):
+        response = client.post(reverse("login"), data={"username": "donald.duck", "password": "applepie94"})
+        return {"Authorization": f"Bearer {response.data['access']}"}
+
+    def test_server_timing_and_log_line_per_request(self, settings, caplog):
+        """
+        Ensure an instrumented request reports its queries, permissions, serializer and render durations.
+        """
+        settings.SOFTDESK_INSTRUMENTATION = True
+        owner, project = self.setup_project(issues_count=3)
+        client = Client()
+        headers = self.login(client)
+        url = reverse("issues_detail", kwargs={"pk": project.id, "issue_id": project.issues_set.first().id})
+
+        with caplog.at_level(logging.INFO, logger="softdesk.instrumentation"):
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        metrics = dict(metric.split(";", 1) for metric in response["Server-Timing"].split(", "))
+        assert set(metrics) == {"db", "permissions", "serializer", "render", "total"}
+        assert f'desc="{len(context.captured_queries)} queries"' in metrics["db"]
+
+        line = json.loads(caplog.records[-1].getMessage())
+        assert line["view"] == "issues_detail"
+        assert line["status"] == 200
+        assert line["queries"] == len(context.captured_queries)
+        assert {"db_ms", "permissions_ms", "serializer_ms", "render_ms", "total_ms"} <= set(line)
+
+    def test_disabled_instrumentation_is_not_in_the_middleware_chain(self, settings):
+        """
+        Ensure no header is sent when disabled, and that spans outside an instrumented request record nothing.
+        """
+        settings.SOFTDESK_INSTRUMENTATION = False
+        owner, project = self.setup_project(issues_count=1)
+        client = Client()
+        headers = self.login(client)
+        response = client.get(reverse("issues", kwargs={"pk": project.id}), headers=headers)
+        assert response.status_code == 200
+        assert "Server-Timing" not in response
+
+        recorder = Recorder()
+        token = current_recorder.set(recorder)
+        try:
+            with span(PERMISSIONS_SPAN):
+                with span(PERMISSIONS_SPAN):
+                    pass
+        finally:
+            current_recorder.reset(token)
+        assert recorder.counts == {PERMISSIONS_SPAN: 1}
+
+
+@pytest.mark.django_db
+class TestQueryInspector:
+    setup_project = TestInstrumentation.setup_project
+    login = TestInstrumentation.login
+
+    def test_duplicate_queries_are_reported_with_their_view_and_permission(self, settings, caplog):
+        """
+        Ensure a sampled request reports its duplicated queries, with the permission frames running them.
+        """
+        settings.SOFTDESK_QUERY_INSPECTOR_SAMPLE_RATE = 1
+        owner, project = self.setup_project(issues_count=1)
+        client = Client()
+        headers = self.login(client)
+
+        with caplog.at_level(logging.WARNING, logger="softdesk.query_inspector"):
+            response = client.get(reverse("users_detail", kwargs={"pk": owner.id}), headers=headers)
+        assert response.status_code == 200
+        findings = [json.loads(record.getMessage()) for record in caplog.records]
+        duplicates = [finding for finding in findings if finding["event"] == "duplicate"]
+        assert duplicates
+        assert duplicates[0]["url_name"] == "users_detail"
+        assert duplicates[0]["count"] >= 2
+        assert any("permissions.py" in origin for origin in duplicates[0]["origins"])
+
+    def test_slow_queries_are_logged_with_their_plan(self, caplog):
+        """
+        Ensure a query above the threshold is logged with its query plan, and that SQL fingerprints ignore values.
+        """
+        inspector = QueryInspector(slow_query_ms=0)
+        with caplog.at_level(logging.WARNING, logger="softdesk.query_inspector"):
+            with connection.execute_wrapper(inspector):
+                for issue_id in [1, 2, 3]:
+                    Issues.objects.filter(id=issue_id).first()
+        slow = [json.loads(record.getMessage()) for record in caplog.records]
+        assert len(slow) == 3
+        assert slow[0]["event"] == "slow_query"
+        assert any("softdesk_issues" in step for step in slow[0]["plan"])
+        assert [finding["event"] for finding in inspector.findings()] == ["n_plus_one"]
+
+        assert fingerprint("SELECT * FROM t WHERE id IN (%s, %s) AND name = 'a'") == fingerprint(
+            "SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'b'"
+        )
+
+
+@pytest.mark.django_db
+class TestMetrics:
+    setup_project = TestInstrumentation.setup_project
+    login = TestInstrumentation.login
+
+    def test_metrics_endpoint_reports_requests_db_and_auth_latencies(self, settings, monkeypatch):
+        """
+        Ensure /metrics reports the requests by url name, their SQL queries, the JWT and password hash durations,
+        to the scraper token or a superuser only.
+        """
+        settings.SOFTDESK_METRICS = True
+        settings.SOFTDESK_METRICS_TOKEN = "scraper-secret"
+        monkeypatch.setattr(metrics, "registry", metrics.Registry())
+        owner, project = self.setup_project(issues_count=2)
+        client = Client()
+        headers = self.login(client)
+        response = client.get(reverse("issues", kwargs={"pk": project.id}), headers=headers)
+        assert response.status_code == 200
+
+        assert client.get(reverse("metrics")).status_code == 401
+        assert client.get(reverse("metrics"), headers={"Authorization": "Bearer wrong"}).status_code == 401
+        assert client.get(reverse("metrics"), headers=headers).status_code == 403
+
+        response = client.get(reverse("metrics"), headers={"Authorization": "Bearer scraper-secret"})
+        assert response.status_code == 200
+        assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+        text = response.content.decode()
+        assert 'softdesk_http_requests_total{method="GET",status="200",url_name="issues"} 1' in text
+        assert 'softdesk_http_requests_total{method="POST",status="200",url_name="login"} 1' in text
+        assert 'softdesk_http_request_duration_seconds_count{method="GET",url_name="issues"} 1' in text
+        assert 'softdesk_db_query_duration_seconds_bucket{url_name="issues",le="+Inf"}' in text
+        assert 'softdesk_password_hash_duration_seconds_count{url_name="login"} 1' in text
+        assert "softdesk_jwt_validation_duration_seconds_count 3" in text
+
+        User.objects.filter(id=owner.id).update(is_superuser=True)
+        assert client.get(reverse("metrics"), headers=headers).status_code == 200
+
+    def test_registry_adds_up_the_processes_files(self, tmp_path):
+        """
+        Ensure the registries of the workers sharing a directory are added up, histograms buckets included.
+        """
+        registry = metrics.Registry(str(tmp_path), flush_interval=60)
+        registry.inc(metrics.REQUESTS_TOTAL, {"url_name": "projects", "method": "GET", "status": "200"})
+        registry.observe(metrics.REQUEST_DURATION, {"url_name": "projects", "method": "GET"}, 0.02)
+        assert registry.flush()
+        assert not registry.flush()
+
+        other_worker = metrics.Registry()
+        other_worker.inc(metrics.REQUESTS_TOTAL, {"url_name": "projects", "method": "GET", "status": "200"}, 2)
+        other_worker.observe(metrics.REQUEST_DURATION, {"url_name": "projects", "method": "GET"}, 20)
+        (tmp_path / "metrics-999999.json").write_text(json.dumps(other_worker.snapshot()))
+
+        text = registry.render()
+        assert 'softdesk_http_requests_total{method="GET",status="200",url_name="projects"} 3' in text
+        assert 'softdesk_http_request_duration_seconds_bucket{method="GET",url_name="projects",le="0.025"} 1' in text
+        assert 'softdesk_http_request_duration_seconds_bucket{method="GET",url_name="projects",le="+Inf"} 2' in text
+        assert 'softdesk_http_request_duration_seconds_sum{method="GET",url_name="projects"} 20.02' in text
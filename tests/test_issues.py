@@ -1,8 +1,13 @@
 from django.urls import reverse
 from django.test import Client
+from django.core.cache import cache
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 import pytest
 
-from softdesk.models import Projects, Issues
+from authentication.models import User
+from softdesk.counters import repair_projects_counters
+from softdesk.models import Projects, Issues, Contributors
 
 
 @pytest.mark.django_db
@@ -1769,3 +1774,348 @@ class TestIssuesCrudAndAuthorization:
         )
         issue = Issues.objects.get(id=1)
         assert response.status_code == 400
+
+    @pytest.mark.django_db
+    def test_get_issues_list_with_cursor_pagination(self):
+        """
+        Ensure issues can be paginated with an opaque cursor, ordered by creation time, without total count.
+        The limit/offset pagination stays the default one.
+        """
+        client = Client()
+        url = reverse("signup")
+        client.post(url, data=self.user_data1)
+
+        url = reverse("login")
+        data = {
+            "username": self.user_data1["username"],
+            "password": self.user_data1["password"],
+        }
+        response = client.post(url, data=data)
+
+        access_token = response.data["access"]
+        headers = {"Authorization": f"Bearer {access_token}"}
+        url = reverse("projects")
+        response = client.post(
+            url,
+            data=self.project_data1,
+            content_type="application/json",
+            headers=headers,
+        )
+        assert response.status_code == 200
+
+        project = Projects.objects.get(id=1)
+        for index in range(12):
+            Issues.objects.create(
+                title=f"problème {index}",
+                description="Phasellus posuere ultricies urna nec molestie.",
+                balise="BUG",
+                priority="LOW",
+                project_id=project,
+                author_user_id_id=1,
+            )
+        repair_projects_counters()
+
+        url = reverse("issues", kwargs={"pk": 1})
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        assert len(response.data) == 5
+
+        titles = []
+        next_url = f"{url}?pagination=cursor"
+        with CaptureQueriesContext(connection) as context:
+            while next_url:
+                response = client.get(next_url, headers=headers)
+                assert response.status_code == 200
+                assert "count" not in response.data
+                titles += [issue["title"] for issue in response.data["results"]]
+                next_url = response.data["next"]
+        assert titles == [f"problème {index}" for index in range(12)]
+        assert not any("COUNT(" in query["sql"] for query in context.captured_queries)
+
+    @pytest.mark.django_db
+    def test_get_issues_list_with_sparse_fields_and_expanded_users(self):
+        """
+        Ensure ?fields= trims the response and the SELECT, and ?expand= joins the users in the same query.
+        A user whose profile is not viewable is expanded to his id only.
+        """
+        client = Client()
+        client.post(reverse("signup"), data=self.user_data1)
+        response = client.post(
+            reverse("login"),
+            data={"username": self.user_data1["username"], "password": self.user_data1["password"]},
+        )
+        headers = {"Authorization": f"Bearer {response.data['access']}"}
+        response = client.post(
+            reverse("projects"), data=self.project_data1, content_type="application/json", headers=headers
+        )
+        assert response.status_code == 200
+
+        donald = User.objects.get(username=self.user_data1["username"])
+        daisy = User.objects.create_user(
+            username="daisy.duck",
+            email="daisy.duck@bluelake.fr",
+            password="applepie94",
+            birthdate="2002-08-24",
+            general_cnil_approvement=True,
+            can_profile_viewable=False,
+        )
+        project = Projects.objects.get(id=response.data["id"])
+        for index in range(3):
+            Issues.objects.create(
+                title=f"problème {index}",
+                description="Phasellus posuere ultricies urna nec molestie.",
+                balise="BUG",
+                priority="LOW",
+                project_id=project,
+                author_user_id=donald,
+                assignee_user_id=daisy,
+            )
+        repair_projects_counters()
+        url = reverse("issues", kwargs={"pk": project.id})
+
+        with CaptureQueriesContext(connection) as full_context:
+            response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        assert "description" in response.data[0]
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, data={"fields": "id,title,status"}, headers=headers)
+        assert response.status_code == 200
+        assert list(response.data[0]) == ["id", "title", "status"]
+        selects = [query["sql"] for query in context.captured_queries if 'FROM "softdesk_issues"' in query["sql"]]
+        assert selects and not any('"description"' in sql for sql in selects)
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, data={"fields": "id,title", "expand": "author,assignee"}, headers=headers)
+        assert response.status_code == 200
+        assert list(response.data[0]) == ["id", "title", "author", "assignee"]
+        assert response.data[0]["author"] == {
+            "id": donald.id, "username": "donald.duck", "first_name": "donald", "last_name": "duck"
+        }
+        assert response.data[0]["assignee"] == {"id": daisy.id}
+        assert "ETag" not in response
+        assert len(context.captured_queries) <= len(full_context.captured_queries)
+        selects = [query["sql"] for query in context.captured_queries if 'FROM "softdesk_issues"' in query["sql"]]
+        assert any('JOIN "authentication_user"' in sql for sql in selects)
+
+        response = client.get(url, data={"fields": "id,password"}, headers=headers)
+        assert response.status_code == 400
+        response = client.get(url, data={"expand": "project"}, headers=headers)
+        assert response.status_code == 400
+
+    @pytest.mark.django_db
+    def test_bulk_create_issues_in_a_single_transaction(self):
+        """
+        Ensure a contributor can create many issues at once, with a constant number of queries.
+        """
+        client = Client()
+        url = reverse("signup")
+        client.post(url, data=self.user_data1)
+        client.post(url, data=self.user_data2)
+
+        url = reverse("login")
+        data = {
+            "username": self.user_data1["username"],
+            "password": self.user_data1["password"],
+        }
+        response = client.post(url, data=data)
+
+        access_token = response.data["access"]
+        headers = {"Authorization": f"Bearer {access_token}"}
+        url = reverse("projects")
+        response = client.post(
+            url,
+            data=self.project_data1,
+            content_type="application/json",
+            headers=headers,
+        )
+        assert response.status_code == 200
+
+        url = reverse("projects_users", kwargs={"pk": 1})
+        response = client.post(
+            url,
+            data=self.contributor_project1a,
+            content_type="application/json",
+            headers=headers,
+        )
+        assert response.status_code == 200
+
+        url = reverse("issues_bulk", kwargs={"pk": 1})
+        issues = []
+        for index in range(20):
+            issue = dict(self.issue_data0, title=f"problème {index}")
+            issue["assignee_user_id"] = [None, 1, 2][index % 3]
+            issues.append(issue)
+        with CaptureQueriesContext(connection) as small_batch:
+            response = client.post(
+                url, data=issues[:2], content_type="application/json", headers=headers
+            )
+        assert response.status_code == 201
+        with CaptureQueriesContext(connection) as large_batch:
+            response = client.post(
+                url, data=issues[2:], content_type="application/json", headers=headers
+            )
+        assert response.status_code == 201
+        assert len(large_batch) == len(small_batch)
+        assert [issue["title"] for issue in response.data] == [
+            f"problème {index}" for index in range(2, 20)
+        ]
+        assert Issues.objects.filter(project_id=1).count() == 20
+        assert Issues.objects.filter(assignee_user_id=2).count() == 6
+
+    @pytest.mark.django_db
+    def test_bulk_create_issues_returns_errors_in_positional_order(self):
+        """
+        Ensure no issue is created if one is invalid, and that errors are returned in the order of the issues.
+        """
+        client = Client()
+        url = reverse("signup")
+        client.post(url, data=self.user_data1)
+        client.post(url, data=self.user_data2)
+        client.post(url, data=self.user_data4)
+
+        url = reverse("login")
+        data = {
+            "username": self.user_data1["username"],
+            "password": self.user_data1["password"],
+        }
+        response = client.post(url, data=data)
+
+        access_token = response.data["access"]
+        headers = {"Authorization": f"Bearer {access_token}"}
+        url = reverse("projects")
+        response = client.post(
+            url,
+            data=self.project_data1,
+            content_type="application/json",
+            headers=headers,
+        )
+        assert response.status_code == 200
+
+        url = reverse("issues_bulk", kwargs={"pk": 1})
+        issues = [
+            self.issue_data0,
+            dict(self.issue_data0, balise="EPIC"),
+            dict(self.issue_data0, assignee_user_id=3),
+            dict(self.issue_data0, assignee_user_id=99),
+            self.issue_data0,
+        ]
+        response = client.post(
+            url, data=issues, content_type="application/json", headers=headers
+        )
+        assert response.status_code == 400
+        assert len(response.data) == 5
+        assert response.data[0] == {}
+        assert list(response.data[1]) == ["balise"]
+        assert list(response.data[2]) == ["assignee_user_id"]
+        assert list(response.data[3]) == ["assignee_user_id"]
+        assert response.data[4] == {}
+        assert Issues.objects.count() == 0
+
+        response = client.post(
+            url, data=self.issue_data0, content_type="application/json", headers=headers
+        )
+        assert response.status_code == 400
+
+        url = reverse("login")
+        data = {
+            "username": self.user_data2["username"],
+            "password": self.user_data2["password"],
+        }
+        response = client.post(url, data=data)
+        headers = {"Authorization": f"Bearer {response.data['access']}"}
+        url = reverse("issues_bulk", kwargs={"pk": 1})
+        response = client.post(
+            url, data=[self.issue_data0], content_type="application/json", headers=headers
+        )
+        assert response.status_code == 403
+
+    @pytest.mark.django_db
+    def test_remove_contributor_assigned_to_many_issues_runs_in_constant_queries(self):
+        """
+        Ensure removing a contributor unassigns his issues of the project only, with the same number of queries
+        whether he is assigned to 10 or to 10000 issues.
+        """
+        client = Client()
+        url = reverse("signup")
+        client.post(url, data=self.user_data1)
+        client.post(url, data=self.user_data2)
+        client.post(url, data=self.user_data4)
+        owner, assignee, other = User.objects.order_by("id")
+
+        def create_project(issues_count):
+            project = Projects.objects.create(
+                title="Un projet", description="bla bla bla", type="back-end"
+            )
+            for user, role in [(owner, "AUTHOR"), (owner, "CONTRIBUTOR"), (assignee, "CONTRIBUTOR")]:
+                Contributors.objects.create(user_id=user, project_id=project, role=role)
+            Issues.objects.bulk_create(
+                Issues(
+                    title=f"problème {index}",
+                    description="bla bla bla",
+                    balise="BUG",
+                    priority="LOW",
+                    project_id=project,
+                    author_user_id=owner,
+                    assignee_user_id=assignee if index % 2 == 0 else other,
+                )
+                for index in range(issues_count)
+            )
+            return project
+
+        small_project = create_project(20)
+        large_project = create_project(20000)
+
+        url = reverse("login")
+        data = {
+            "username": self.user_data1["username"],
+            "password": self.user_data1["password"],
+        }
+        response = client.post(url, data=data)
+        headers = {"Authorization": f"Bearer {response.data['access']}"}
+        queries_count = []
+        for project in [small_project, large_project]:
+            url = reverse("projects_users_detail", kwargs={"pk": project.id, "user_id": assignee.id})
+            # même état du cache des contributions pour les deux mesures
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                response = client.delete(url, headers=headers)
+            assert response.status_code == 204
+            queries_count.append(len(context))
+            updates = [
+                query for query in context.captured_queries
+                if query["sql"].startswith('UPDATE "softdesk_issues"')
+            ]
+            assert len(updates) == 1
+        assert queries_count[0] == queries_count[1]
+        assert not Issues.objects.filter(assignee_user_id=assignee).exists()
+        assert Issues.objects.filter(assignee_user_id=other).count() == 10 + 10000
+
+    @pytest.mark.django_db
+    def test_unassign_is_scoped_to_the_project_and_returns_issues_ids(self):
+        """
+        Ensure the unassignment only updates the project issues, and returns their ids.
+        """
+        client = Client()
+        url = reverse("signup")
+        client.post(url, data=self.user_data1)
+        owner = User.objects.get()
+        projects = [
+            Projects.objects.create(title=f"projet {index}", description="bla bla bla", type="iOS")
+            for index in range(2)
+        ]
+        issues = [
+            Issues.objects.create(
+                title="problème",
+                description="bla bla bla",
+                balise="BUG",
+                priority="LOW",
+                project_id=projects[index % 2],
+                author_user_id=owner,
+                assignee_user_id=owner,
+            )
+            for index in range(5)
+        ]
+        assert Issues.unassign(projects[0].id, owner.id) == [issues[0].id, issues[2].id, issues[4].id]
+        assert Issues.unassign(projects[0].id, owner.id) == []
+        assert Issues.objects.filter(assignee_user_id=owner).count() == 2
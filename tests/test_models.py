@@ -0,0 +1,298 @@
+from asgiref.sync import sync_to_async
+from django.core.signals import request_finished, request_started
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test.utils import CaptureQueriesContext
+import asyncio
+import pytest
+
+from authentication.models import User
+from softdesk.db_pool import ConnectionPool, ConnectionPoolMiddleware
+from softdesk.membership import ProjectMembership
+from softdesk.models import Projects, Issues, Comments, Contributors
+from softdesk.sqlite_profiles import get_sqlite_pragmas
+from softdesk.synthetic import SyntheticDataGenerator
+
+
+def explain_query_plan(sql, params=()):
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def queryset_plan(queryset):
+    sql, params = queryset.query.sql_with_params()
+    return explain_query_plan(sql, params)
+
+
+@pytest.mark.django_db
+class TestModelsIndexes:
+    """
+    On s'assure, via l'EXPLAIN QUERY PLAN de SQLite, que les requêtes fréquentes utilisent les index déclarés.
+    """
+
+    def test_membership_queries_use_contributors_indexes(self):
+        user_plan = queryset_plan(
+            Contributors.objects.filter(user_id=2).filter(project_id=1).values_list("role")
+        )
+        assert user_plan == [
+            "SEARCH softdesk_contributors USING COVERING INDEX "
+            "softdesk_contributors_user_id_id_project_id_id_role_4d6c54f4_uniq "
+            "(user_id_id=? AND project_id_id=?)"
+        ]
+
+        project_plan = queryset_plan(
+            Contributors.objects.filter(project_id=1)
+            .filter(role="CONTRIBUTOR")
+            .values_list("user_id")
+        )
+        assert project_plan == [
+            "SEARCH softdesk_contributors USING COVERING INDEX contributors_project_role_idx "
+            "(project_id_id=? AND role=?)"
+        ]
+
+    def test_membership_resolver_does_not_scan_projects(self):
+        user = User.objects.create(
+            username="donald.duck",
+            email="donald.duck@bluelake.fr",
+            birthdate="2001-07-15",
+            general_cnil_approvement=True,
+        )
+        with CaptureQueriesContext(connection) as context:
+            ProjectMembership(user, project_id=1).roles
+        assert len(context.captured_queries) == 1
+        plan = explain_query_plan(context.captured_queries[0]["sql"])
+        assert not any(step.startswith("SCAN") for step in plan)
+
+    def test_issues_listing_uses_project_indexes(self):
+        status_plan = queryset_plan(
+            Issues.objects.filter(project_id=1)
+            .filter(status="To Do")
+            .order_by("created_time")
+        )
+        assert status_plan == [
+            "SEARCH softdesk_issues USING INDEX issues_project_status_idx "
+            "(project_id_id=? AND status=?)"
+        ]
+
+        cursor_plan = queryset_plan(
+            Issues.objects.filter(project_id=1).order_by("created_time", "id")
+        )
+        assert cursor_plan == [
+            "SEARCH softdesk_issues USING INDEX issues_project_created_idx (project_id_id=?)"
+        ]
+
+        assignee_plan = queryset_plan(
+            Issues.objects.filter(project_id=1)
+            .filter(assignee_user_id=2)
+            .values_list("id")
+        )
+        assert assignee_plan == [
+            "SEARCH softdesk_issues USING COVERING INDEX issues_project_assignee_idx "
+            "(project_id_id=? AND assignee_user_id_id=?)"
+        ]
+
+    def test_comments_listing_uses_issue_index(self):
+        plan = queryset_plan(
+            Comments.objects.filter(issue_id=1).order_by("created_time", "id")
+        )
+        assert plan == [
+            "SEARCH softdesk_comments USING INDEX comments_issue_created_idx (issue_id_id=?)"
+        ]
+
+
+@pytest.mark.django_db
+class TestSyntheticDataGenerator:
+    def test_generator_is_reproducible_and_consistent(self):
+        """
+        Ensure the generator inserts the requested users and projects, skewed issues and comments,
+        and that a project author is also a contributor of his project.
+        """
+        generator = SyntheticDataGenerator(
+            users=30,
+            projects=10,
+            issues_per_project=8,
+            comments_per_issue=3,
+            seed=42,
+            batch_size=50,
+        )
+        report = generator.run()
+
+        assert User.objects.count() == 30
+        assert Projects.objects.count() == 10
+        assert Issues.objects.count() == generator.rows["Issues"]
+        assert Comments.objects.count() == generator.rows["Comments"]
+        assert any(line.startswith("total:") for line in report)
+        for author in Contributors.objects.filter(role=Contributors.AUTHOR):
+            assert Contributors.objects.filter(
+                project_id=author.project_id_id,
+                user_id=author.user_id_id,
+                role=Contributors.CONTRIBUTOR,
+            ).exists()
+        assert not Issues.objects.exclude(project_id__status="Open").exclude(
+            status="Finished"
+        ).exists()
+
+        issues_titles = list(Issues.objects.order_by("id").values_list("title", flat=True))
+        Comments.objects.all().delete()
+        Issues.objects.all().delete()
+        Contributors.objects.all().delete()
+        Projects.objects.all().delete()
+        User.objects.all().delete()
+        SyntheticDataGenerator(
+            users=30,
+            projects=10,
+            issues_per_project=8,
+            comments_per_issue=3,
+            seed=42,
+            batch_size=50,
+        ).run()
+        assert (
+            list(Issues.objects.order_by("id").values_list("title", flat=True))
+            == issues_titles
+        )
+
+    def test_generator_without_users_generates_nothing(self):
+        """
+        Ensure projects are not generated, without error, when there is no user to be their author.
+        """
+        SyntheticDataGenerator(
+            users=0, projects=3, issues_per_project=2, comments_per_issue=2, seed=1
+        ).run()
+        assert not Projects.objects.exists()
+
+
+@pytest.mark.django_db
+class TestSqliteProfiles:
+    def file_connection(self, path, **settings_dict):
+        default = connections["default"]
+        return default.__class__({**default.settings_dict, "NAME": str(path), **settings_dict}, "profile")
+
+    def read_pragmas(self, database, names):
+        database.ensure_connection()
+        try:
+            with database.cursor() as cursor:
+                pragmas = {}
+                for name in names:
+                    cursor.execute(f"PRAGMA {name}")
+                    pragmas[name] = cursor.fetchone()[0]
+                return pragmas
+        finally:
+            database.close()
+
+    def test_profile_is_applied_on_every_new_connection(self, tmp_path, settings):
+        """
+        Ensure each new connection gets the pragmas of the profile (SOFTDESK_SQLITE_PROFILE, or the
+        database own profile), with the SOFTDESK_SQLITE_PRAGMAS overrides.
+        """
+        names = ["journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size", "temp_store"]
+        settings.SOFTDESK_SQLITE_PROFILE = "wal"
+        settings.SOFTDESK_SQLITE_PRAGMAS = {"busy_timeout": 10000}
+        assert self.read_pragmas(self.file_connection(tmp_path / "wal.sqlite3"), names) == {
+            "journal_mode": "wal",
+            "synchronous": 1,
+            "busy_timeout": 10000,
+            "cache_size": -65536,
+            "mmap_size": 268435456,
+            "temp_store": 2,
+        }
+
+        settings.SOFTDESK_SQLITE_PRAGMAS = {}
+        default = self.file_connection(tmp_path / "default.sqlite3", SOFTDESK_SQLITE_PROFILE="default")
+        assert self.read_pragmas(default, ["journal_mode", "synchronous", "temp_store"]) == {
+            "journal_mode": "delete",
+            "synchronous": 2,
+            "temp_store": 0,
+        }
+
+    def test_unknown_profile_is_refused(self):
+        with pytest.raises(ValueError):
+            get_sqlite_pragmas("fast")
+
+
+@pytest.mark.django_db
+class TestConnectionPool:
+    def test_concurrent_tasks_share_the_pool_connections(self):
+        """
+        Ensure concurrent async tasks borrow the connections of the pool instead of opening their own,
+        and leave the connection of the calling thread untouched.
+        """
+        pool = ConnectionPool(size=2)
+        opened = []
+        default = connections["default"]
+
+        def receiver(sender, connection, **kwargs):
+            opened.append(connection)
+
+        async def main():
+            return await asyncio.gather(*(pool.run(Projects.objects.count) for index in range(10)))
+
+        connection_created.connect(receiver, dispatch_uid="test_connection_pool")
+        try:
+            assert asyncio.run(main()) == [0] * 10
+            assert asyncio.run(main()) == [0] * 10
+        finally:
+            connection_created.disconnect(dispatch_uid="test_connection_pool")
+            pool.close_all()
+        assert 1 <= len(opened) <= 2
+        assert all(connection in pool.wrappers for connection in opened)
+        assert connections["default"] is default
+
+    def test_asgi_requests_borrow_a_pool_connection(self):
+        """
+        Ensure each ASGI request runs with a connection of the pool, given back once the request is served.
+        """
+        pool = ConnectionPool(size=1)
+        seen = []
+
+        async def application(scope, receive, send):
+            await sync_to_async(lambda: seen.append(connections["default"]))()
+
+        async def main():
+            middleware = ConnectionPoolMiddleware(application, pool)
+            await asyncio.gather(*(middleware({"type": "http"}, None, None) for index in range(4)))
+
+        asyncio.run(main())
+        assert len(seen) == 4
+        assert pool.wrappers == [seen[0]]
+        assert all(connection is seen[0] for connection in seen)
+        assert pool.idle.qsize() == 1
+
+    def test_borrowed_connection_outlives_conn_max_age(self, tmp_path):
+        """
+        Ensure close_old_connections at request_finished never closes a borrowed connection, whatever CONN_MAX_AGE,
+        while it closes the connections outside the pool; the pool closes its connections after its own max age.
+        """
+        alias = "pool"
+        connections.settings[alias] = {
+            **connections["default"].settings_dict,
+            "NAME": str(tmp_path / "pool.sqlite3"),
+            "CONN_MAX_AGE": 0,
+        }
+        pool = ConnectionPool(alias, size=1)
+        expiring_pool = ConnectionPool(alias, size=1, max_age=0)
+        try:
+            with pool.connection() as wrapper:
+                wrapper.ensure_connection()
+                opened = wrapper.connection
+                request_started.send(sender=None)
+                request_finished.send(sender=None)
+                assert wrapper.connection is opened
+            with pool.connection() as borrowed:
+                assert borrowed is wrapper
+                assert wrapper.connection is opened
+
+            connections[alias].ensure_connection()
+            request_finished.send(sender=None)
+            assert connections[alias].connection is None
+
+            with expiring_pool.connection() as wrapper:
+                wrapper.ensure_connection()
+            with expiring_pool.connection() as borrowed:
+                assert borrowed is wrapper
+                assert wrapper.connection is None
+        finally:
+            pool.close_all()
+            expiring_pool.close_all()
+            del connections[alias]
+            del connections.settings[alias]
@@ -1,10 +1,30 @@
 from django.urls import reverse
 from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.conf import settings
+from django.utils.timezone import now
+from rest_framework.renderers import JSONRenderer
+from datetime import timedelta
 from time import sleep
+import csv
+import io
+import json
+import uuid
 import pytest
 
-from softdesk.models import Projects, Issues, Contributors
+from authentication.models import User
+from softdesk.cascades import enqueue_finish_project_issues
+from softdesk.counters import change_issue_status, repair_projects_counters, repair_issues_counters
+from softdesk.jobs import run_pending_jobs
+from softdesk.models import Projects, Issues, Comments, Contributors, Jobs
+from softdesk.fast_serializers import ValuesSerializer
+from softdesk.serializers import (
+    ProjectDetailSerializer,
+    ProjectListSerializer,
+    IssuesSerializer,
+    CommentListSerializer,
+)
 
 
 @pytest.mark.django_db
@@ -1134,3 +1154,878 @@ class TestProjectsCrudAndAuthorization:
             headers=headers,
         )
         assert response.status_code == 403
+
+    @pytest.mark.django_db
+    def test_add_contributor_permissions_resolve_membership_once(self):
+        """
+        Ensure the chained permissions of an add contributor request read the caller's membership once.
+        """
+        client = Client()
+        url = reverse("signup")
+        client.post(url, data=self.user_data1)
+        client.post(url, data=self.user_data2)
+
+        url = reverse("login")
+        data = {
+            "username": self.user_data1["username"],
+            "password": self.user_data1["password"],
+        }
+        response = client.post(url, data=data)
+
+        access_token = response.data["access"]
+        headers = {"Authorization": f"Bearer {access_token}"}
+        url = reverse("projects")
+        response = client.post(
+            url,
+            data=self.project_data1,
+            content_type="application/json",
+            headers=headers,
+        )
+        assert response.status_code == 200
+
+        url = reverse("projects_users", kwargs={"pk": 1})
+        with CaptureQueriesContext(connection) as context:
+            response = client.post(
+                url,
+                data=self.contributor_project1a,
+                content_type="application/json",
+                headers=headers,
+            )
+        assert response.status_code == 200
+        queries = [query["sql"] for query in context.captured_queries]
+        membership_queries = [sql for sql in queries if "UNION ALL" in sql]
+        count_queries = [sql for sql in queries if "COUNT(*)" in sql]
+        # une seule lecture des contributions de l'utilisateur et du statut du projet
+        assert len(membership_queries) == 1
+        assert len(count_queries) == 0
+
+    @pytest.mark.django_db
+    def test_memberships_are_cached_between_requests_and_invalidated_on_writes(self):
+        """
+        Ensure the caller's memberships are read from the cache on a second request,
+        and that adding a contributor invalidates the cached memberships of the added user.
+        """
+        client = Client()
+        url = reverse("signup")
+        client.post(url, data=self.user_data1)
+        client.post(url, data=self.user_data2)
+
+        url = reverse("login")
+        data = {
+            "username": self.user_data1["username"],
+            "password": self.user_data1["password"],
+        }
+        response = client.post(url, data=data)
+        headers1 = {"Authorization": f"Bearer {response.data['access']}"}
+        data = {
+            "username": self.user_data2["username"],
+            "password": self.user_data2["password"],
+        }
+        response = client.post(url, data=data)
+        headers2 = {"Authorization": f"Bearer {response.data['access']}"}
+
+        url = reverse("projects")
+        response = client.post(
+            url,
+            data=self.project_data1,
+            content_type="application/json",
+            headers=headers1,
+        )
+        assert response.status_code == 200
+
+        url = reverse("projects_detail", kwargs={"pk": 1})
+        response = client.get(url, headers=headers2)
+        assert response.status_code == 403
+
+        url = reverse("projects_detail", kwargs={"pk": 1})
+        client.get(url, headers=headers1)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, headers=headers1)
+        assert response.status_code == 200
+        assert not any("UNION ALL" in query["sql"] for query in context.captured_queries)
+
+        url = reverse("projects_users", kwargs={"pk": 1})
+        response = client.post(
+            url,
+            data=self.contributor_project1a,
+            content_type="application/json",
+            headers=headers1,
+        )
+        assert response.status_code == 200
+
+        url = reverse("projects_detail", kwargs={"pk": 1})
+        response = client.get(url, headers=headers2)
+        assert response.status_code == 200
+
+    @pytest.mark.django_db
+    def test_project_status_is_not_cached_between_requests(self):
+        """
+        Ensure a project archived without invalidation (as by another process) is no more writable at once.
+        """
+        client = Client()
+        url = reverse("signup")
+        client.post(url, data=self.user_data1)
+        client.post(url, data=self.user_data2)
+
+        url = reverse("login")
+        data = {
+            "username": self.user_data1["username"],
+            "password": self.user_data1["password"],
+        }
+        response = client.post(url, data=data)
+        headers = {"Authorization": f"Bearer {response.data['access']}"}
+
+        url = reverse("projects")
+        response = client.post(
+            url,
+            data=self.project_data1,
+            content_type="application/json",
+            headers=headers,
+        )
+        assert response.status_code == 200
+        url = reverse("projects_detail", kwargs={"pk": 1})
+        assert client.get(url, headers=headers).status_code == 200
+
+        # update(): pas de signal, donc pas d'invalidation du cache
+        Projects.objects.filter(id=1).update(status="Archived")
+        url = reverse("projects_users", kwargs={"pk": 1})
+        response = client.post(
+            url,
+            data=self.contributor_project1a,
+            content_type="application/json",
+            headers=headers,
+        )
+        assert response.status_code == 403
+        assert response.data == {"message": "Projet doit être au statut 'Open'"}
+
+
+@pytest.mark.django_db
+class TestProjectDetailSerializer:
+    def test_project_users_are_serialized_from_prefetched_contributors(
+        self, django_assert_num_queries
+    ):
+        """
+        Ensure many projects with their contributors are serialized with one query for the projects
+        and one query for all the contributors.
+        """
+        users = [
+            User.objects.create(
+                username=f"duck{index}",
+                email=f"duck{index}@bluelake.fr",
+                birthdate="2001-07-15",
+                general_cnil_approvement=True,
+            )
+            for index in range(5)
+        ]
+        for index in range(3):
+            project = Projects.objects.create(
+                title=f"projet {index}", description="bla bla bla", type="back-end"
+            )
+            Contributors.objects.create(
+                user_id=users[0], project_id=project, role=Contributors.AUTHOR
+            )
+            for user in users:
+                Contributors.objects.create(
+                    user_id=user, project_id=project, role=Contributors.CONTRIBUTOR
+                )
+
+        with django_assert_num_queries(2) as context:
+            queryset = ProjectDetailSerializer.setup_eager_loading(
+                Projects.objects.order_by("id")
+            )
+            data = ProjectDetailSerializer(queryset, many=True).data
+
+        assert "JOIN" not in context.captured_queries[1]["sql"]
+        assert len(data) == 3
+        assert all(len(project["project_users"]) == 6 for project in data)
+        assert data[0]["project_users"][0]["role"] == "auteur"
+        assert data[0]["project_users"][1]["role"] == "contributeur"
+
+
+@pytest.mark.django_db
+class TestProjectExport:
+    def setup_project(self):
+        users = [
+            User.objects.create_user(
+                username=f"duck{index}",
+                email=f"duck{index}@bluelake.fr",
+                password="applepie94",
+                birthdate="2001-07-15",
+                general_cnil_approvement=True,
+            )
+            for index in range(2)
+        ]
+        project = Projects.objects.create(
+            title="projet exporté", description="bla bla bla", type="back-end"
+        )
+        Contributors.objects.create(
+            user_id=users[0], project_id=project, role=Contributors.AUTHOR
+        )
+        Contributors.objects.create(
+            user_id=users[0], project_id=project, role=Contributors.CONTRIBUTOR
+        )
+        for index in range(7):
+            issue = Issues.objects.create(
+                title=f"problème {index}",
+                description="Phasellus posuere ultricies urna nec molestie.",
+                balise="BUG",
+                priority="LOW",
+                project_id=project,
+                author_user_id=users[0],
+            )
+            for comment_index in range(index % 3):
+                Comments.objects.create(
+                    uuid=uuid.uuid4(),
+                    title=f"commentaire {index}.{comment_index}",
+                    description="bla bla bla",
+                    author_user_id=users[0],
+                    issue_id=issue,
+                )
+        return project, users
+
+    def login(self, client, user):
+        url = reverse("login")
+        data = {"username": user.username, "password": "applepie94"}
+        response = client.post(url, data=data)
+        return {"Authorization": f"Bearer {response.data['access']}"}
+
+    def test_export_project_as_ndjson(self, settings):
+        """
+        Ensure a contributor can stream the project issues with their nested comments, read by chunks.
+        """
+        settings.SOFTDESK_EXPORT_CHUNK_SIZE = 3
+        project, users = self.setup_project()
+        client = Client()
+        headers = self.login(client, users[0])
+
+        url = reverse("projects_export", kwargs={"pk": project.id})
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, headers=headers)
+            lines = b"".join(response.streaming_content).decode().splitlines()
+        assert response.status_code == 200
+        assert response["Content-Type"] == "application/x-ndjson"
+        issues = [json.loads(line) for line in lines]
+        assert [issue["title"] for issue in issues] == [f"problème {index}" for index in range(7)]
+        assert [len(issue["comments"]) for issue in issues] == [index % 3 for index in range(7)]
+        assert issues[2]["comments"][1]["title"] == "commentaire 2.1"
+        assert issues[0]["project_id"] == project.id
+        # un parcours des problèmes, et une requête des commentaires par lot de 3 problèmes
+        comments_queries = [
+            query for query in context.captured_queries
+            if query["sql"].startswith('SELECT "softdesk_comments"')
+        ]
+        assert len(comments_queries) == 3
+
+    def test_export_project_as_csv(self):
+        """
+        Ensure the export can be streamed as CSV, an issue row followed by its comments rows.
+        """
+        project, users = self.setup_project()
+        client = Client()
+        headers = self.login(client, users[0])
+
+        url = reverse("projects_export", kwargs={"pk": project.id})
+        response = client.get(f"{url}?export_format=csv", headers=headers)
+        assert response.status_code == 200
+        assert response["Content-Type"] == "text/csv"
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+        assert len(rows) == 7 + 6
+        assert [row["record"] for row in rows[:4]] == ["issue", "issue", "comment", "issue"]
+        assert rows[2]["title"] == "commentaire 1.0"
+        assert rows[2]["issue_id"] == rows[1]["id"]
+
+        response = client.get(f"{url}?export_format=xml", headers=headers)
+        assert response.status_code == 400
+
+    def test_export_project_requires_contribution(self):
+        """
+        Ensure only the contributors of a project can export it.
+        """
+        project, users = self.setup_project()
+        client = Client()
+        headers = self.login(client, users[1])
+
+        url = reverse("projects_export", kwargs={"pk": project.id})
+        response = client.get(url, headers=headers)
+        assert response.status_code == 403
+
+        url = reverse("projects_export", kwargs={"pk": project.id + 1})
+        response = client.get(url, headers=headers)
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db
+class TestProjectStatusCascade:
+    def setup_project(self, issues_count=5):
+        owner = User.objects.create_user(
+            username="donald.duck",
+            email="donald.duck@bluelake.fr",
+            password="applepie94",
+            birthdate="2001-07-15",
+            general_cnil_approvement=True,
+        )
+        project = Projects.objects.create(
+            title="projet", description="bla bla bla", type="back-end"
+        )
+        Contributors.objects.create(user_id=owner, project_id=project, role=Contributors.AUTHOR)
+        Contributors.objects.create(user_id=owner, project_id=project, role=Contributors.CONTRIBUTOR)
+        Issues.objects.bulk_create(
+            Issues(
+                title=f"problème {index}",
+                description="bla bla bla",
+                balise="BUG",
+                priority="LOW",
+                project_id=project,
+                author_user_id=owner,
+                status=["To Do", "In Progress"][index % 2],
+            )
+            for index in range(issues_count)
+        )
+        repair_projects_counters()
+        return owner, project
+
+    def login(self, client):
+        url = reverse("login")
+        response = client.post(url, data={"username": "donald.duck", "password": "applepie94"})
+        return {"Authorization": f"Bearer {response.data['access']}"}
+
+    def test_archiving_a_project_finishes_its_issues_by_batches(self, settings):
+        """
+        Ensure the issues of a project leaving the 'Open' status are finished by a job, by batches.
+        """
+        settings.SOFTDESK_CASCADE_BATCH_SIZE = 2
+        owner, project = self.setup_project()
+        client = Client()
+        headers = self.login(client)
+
+        url = reverse("projects_detail", kwargs={"pk": project.id})
+        with CaptureQueriesContext(connection) as context:
+            response = client.put(
+                url, data={"status": "Archived"}, content_type="application/json", headers=headers
+            )
+        assert response.status_code == 200
+        assert Projects.objects.get(id=project.id).status == "Archived"
+        assert not Issues.objects.exclude(status="Finished").exists()
+        updates = [
+            query for query in context.captured_queries
+            if query["sql"].startswith('UPDATE "softdesk_issues"')
+        ]
+        assert len(updates) == 3
+
+        response = client.get(response["Job-Location"], headers=headers)
+        assert response.status_code == 200
+        assert response.data["kind"] == "finish_project_issues"
+        assert response.data["status"] == "done"
+        assert response.data["progress"] == {"issues": {"updated": 5, "total": 5}}
+
+    def test_deleting_a_project_finishes_its_issues(self):
+        """
+        Ensure a deleted project is archived, and that its issues are finished once the job completes.
+        """
+        owner, project = self.setup_project()
+        client = Client()
+        headers = self.login(client)
+
+        url = reverse("projects_detail", kwargs={"pk": project.id})
+        response = client.delete(url, headers=headers)
+        assert response.status_code == 204
+        assert Projects.objects.get(id=project.id).status == "Archived"
+        job = Jobs.objects.get(id=response["Job-Location"].split("/")[-2])
+        assert job.status == Jobs.DONE
+        assert not Issues.objects.exclude(status="Finished").exists()
+
+    def test_no_job_without_open_issues(self):
+        """
+        Ensure a project leaving the 'Open' status without open issues does not enqueue a job.
+        """
+        owner, project = self.setup_project(issues_count=0)
+        other_project = Projects.objects.create(title="autre", description="bla bla bla", type="back-end")
+        Contributors.objects.create(user_id=owner, project_id=other_project, role=Contributors.AUTHOR)
+        client = Client()
+        headers = self.login(client)
+
+        url = reverse("projects_detail", kwargs={"pk": project.id})
+        response = client.delete(url, headers=headers)
+        assert response.status_code == 204
+        assert Projects.objects.get(id=project.id).status == "Canceled"
+        assert "Job-Location" not in response
+
+        url = reverse("projects_detail", kwargs={"pk": other_project.id})
+        response = client.put(url, data={"status": "Archived"}, content_type="application/json", headers=headers)
+        assert response.status_code == 200
+        assert "Job-Location" not in response
+        assert not Jobs.objects.exists()
+
+    def test_job_is_enqueued_despite_a_wrong_open_issues_counter(self):
+        """
+        Ensure the issues are finished when the project open issues counter is wrong.
+        """
+        owner, project = self.setup_project(issues_count=2)
+        Projects.objects.filter(id=project.id).update(open_issues_count=0)
+        client = Client()
+        headers = self.login(client)
+
+        url = reverse("projects_detail", kwargs={"pk": project.id})
+        response = client.delete(url, headers=headers)
+        assert response.status_code == 204
+        assert "Job-Location" in response
+        assert Projects.objects.get(id=project.id).status == "Archived"
+        assert not Issues.objects.exclude(status="Finished").exists()
+
+    def test_pending_and_interrupted_jobs_are_run_by_the_worker(self, settings):
+        """
+        Ensure queued jobs are kept in the database until run, and that interrupted jobs are resumed.
+        """
+        settings.SOFTDESK_JOBS_EAGER = False
+        owner, project = self.setup_project()
+        job = enqueue_finish_project_issues(project.id, owner.id)
+        assert Jobs.objects.get(id=job.id).status == Jobs.PENDING
+
+        interrupted_job = Jobs.objects.create(
+            kind="finish_project_issues",
+            payload={"project_id": project.id},
+            status=Jobs.RUNNING,
+            updated_time=now() - timedelta(seconds=settings.SOFTDESK_JOBS_STALE_AFTER + 1),
+        )
+        running_job = Jobs.objects.create(
+            kind="finish_project_issues",
+            payload={"project_id": project.id},
+            status=Jobs.RUNNING,
+        )
+
+        jobs = run_pending_jobs()
+        assert [job.id for job in jobs] == [job.id, interrupted_job.id]
+        assert all(job.status == Jobs.DONE for job in jobs)
+        assert Jobs.objects.get(id=running_job.id).status == Jobs.RUNNING
+        assert not Issues.objects.exclude(status="Finished").exists()
+
+
+@pytest.mark.django_db
+class TestProjectCounters:
+    setup_project = TestProjectStatusCascade.setup_project
+    login = TestProjectStatusCascade.login
+
+    def get_counters(self, project):
+        project = Projects.objects.get(id=project.id)
+        return project.issues_count, project.open_issues_count
+
+    def test_counters_follow_issues_and_comments_writes(self):
+        """
+        Ensure issues and comments counters are maintained by the issues and comments endpoints.
+        """
+        owner, project = self.setup_project(issues_count=2)
+        client = Client()
+        headers = self.login(client)
+        assert self.get_counters(project) == (2, 2)
+
+        url = reverse("issues", kwargs={"pk": project.id})
+        data = {"title": "nouveau", "description": "bla bla bla", "balise": "TASK", "priority": "HIGH"}
+        response = client.post(url, data=data, content_type="application/json", headers=headers)
+        assert response.status_code == 200
+        issue_id = response.data["id"]
+        assert response.data["comments_count"] == 0
+        assert self.get_counters(project) == (3, 3)
+
+        url = reverse("issues_status", kwargs={"pk": project.id, "issue_id": issue_id})
+        response = client.put(url, data={"status": "Finished"}, content_type="application/json", headers=headers)
+        assert response.status_code == 200
+        assert self.get_counters(project) == (3, 2)
+
+        issue_id = Issues.objects.filter(project_id=project, status="To Do").first().id
+        url = reverse("comments", kwargs={"pk": project.id, "issue_id": issue_id})
+        assert client.get(url, headers=headers).status_code == 404
+        response = client.post(
+            url, data={"title": "commentaire", "description": "bla bla bla"},
+            content_type="application/json", headers=headers
+        )
+        assert response.status_code == 200
+        assert Issues.objects.get(id=issue_id).comments_count == 1
+        assert client.get(url, headers=headers).status_code == 200
+
+        url = reverse(
+            "comments_detail", kwargs={"pk": project.id, "issue_id": issue_id, "comment_id": response.data["id"]}
+        )
+        assert client.delete(url, headers=headers).status_code == 204
+        assert Issues.objects.get(id=issue_id).comments_count == 0
+
+        url = reverse("issues_detail", kwargs={"pk": project.id, "issue_id": issue_id})
+        assert client.delete(url, headers=headers).status_code == 204
+        assert self.get_counters(project) == (3, 1)
+
+        url = reverse("projects_detail", kwargs={"pk": project.id})
+        response = client.put(url, data={"status": "Archived"}, content_type="application/json", headers=headers)
+        assert response.status_code == 200
+        assert response.data["issues_count"] == 3
+        assert self.get_counters(project) == (3, 0)
+
+    def test_issues_and_comments_are_only_reached_through_their_project(self):
+        """
+        Ensure an issue (or a comment) addressed through another project url is not found, and counters are kept.
+        """
+        owner, project = self.setup_project(issues_count=1)
+        other_project = Projects.objects.create(title="autre", description="bla bla bla", type="iOS")
+        Contributors.objects.create(user_id=owner, project_id=other_project, role=Contributors.AUTHOR)
+        other_issue = Issues.objects.create(
+            title="problème", description="bla bla bla", balise="BUG", priority="LOW",
+            project_id=other_project, author_user_id=owner,
+        )
+        comment = Comments.objects.create(
+            uuid=uuid.uuid4(), title="commentaire", description="bla bla bla",
+            author_user_id=owner, issue_id=other_issue,
+        )
+        repair_projects_counters()
+        repair_issues_counters()
+        issue = Issues.objects.get(project_id=project)
+        client = Client()
+        headers = self.login(client)
+
+        kwargs = {"pk": project.id, "issue_id": other_issue.id}
+        url = reverse("issues_status", kwargs=kwargs)
+        response = client.put(url, data={"status": "Finished"}, content_type="application/json", headers=headers)
+        assert response.status_code == 404
+        url = reverse("issues_detail", kwargs=kwargs)
+        assert client.get(url, headers=headers).status_code == 404
+        assert client.delete(url, headers=headers).status_code == 404
+        url = reverse("comments_detail", kwargs={"pk": project.id, "issue_id": issue.id, "comment_id": comment.id})
+        assert client.delete(url, headers=headers).status_code == 404
+
+        assert self.get_counters(project) == (1, 1)
+        assert self.get_counters(other_project) == (1, 1)
+        assert Issues.objects.get(id=other_issue.id).status == "To Do"
+        assert Comments.objects.filter(id=comment.id).exists()
+
+    def test_concurrent_status_changes_are_counted_once(self):
+        """
+        Ensure two status changes read from the same status only update the counters once.
+        """
+        owner, project = self.setup_project(issues_count=1)
+        issue = Issues.objects.get(project_id=project)
+        concurrent_issue = Issues.objects.get(id=issue.id)
+
+        assert change_issue_status(issue, "Finished")
+        assert not change_issue_status(concurrent_issue, "Finished")
+        assert not change_issue_status(concurrent_issue, "In Progress")
+        assert Issues.objects.get(id=issue.id).status == "Finished"
+        assert self.get_counters(project) == (1, 0)
+
+    def test_saving_a_project_does_not_overwrite_its_counters(self):
+        """
+        Ensure a stale instance saved after a counter update keeps the counter value of the database.
+        """
+        owner, project = self.setup_project(issues_count=2)
+        stale_project = Projects.objects.get(id=project.id)
+        Issues.objects.create(
+            title="problème", description="bla bla bla", balise="BUG", priority="LOW",
+            project_id=project, author_user_id=owner,
+        )
+        repair_projects_counters()
+        stale_project.title = "nouveau titre"
+        stale_project.save()
+        project = Projects.objects.get(id=project.id)
+        assert project.title == "nouveau titre"
+        assert (project.issues_count, project.open_issues_count) == (3, 3)
+
+    def test_repair_fixes_only_wrong_counters(self):
+        """
+        Ensure the repair command recomputes the wrong counters, and only them.
+        """
+        owner, project = self.setup_project(issues_count=3)
+        other_project = Projects.objects.create(title="autre", description="bla bla bla", type="iOS")
+        issue = Issues.objects.filter(project_id=project).first()
+        Comments.objects.create(
+            uuid=uuid.uuid4(), title="commentaire", description="bla bla bla",
+            author_user_id=owner, issue_id=issue,
+        )
+        Projects.objects.filter(id=project.id).update(issues_count=10, open_issues_count=0)
+
+        assert repair_projects_counters() == 1
+        assert repair_issues_counters() == 1
+        assert self.get_counters(project) == (3, 3)
+        assert self.get_counters(other_project) == (0, 0)
+        assert Issues.objects.get(id=issue.id).comments_count == 1
+        assert repair_projects_counters() == 0
+        assert repair_issues_counters() == 0
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+    setup_project = TestProjectStatusCascade.setup_project
+    login = TestProjectStatusCascade.login
+
+    def assert_not_modified_without_serializing(self, client, url, headers, **params):
+        with CaptureQueriesContext(connection) as full_context:
+            response = client.get(url, data=params, headers=headers)
+        assert response.status_code == 200
+        assert response["ETag"].startswith('"')
+        assert "Last-Modified" in response
+        assert "private" in response["Cache-Control"]
+        etag = response["ETag"]
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, data=params, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response["ETag"] == etag
+        assert len(context.captured_queries) < len(full_context.captured_queries)
+        return etag
+
+    def test_project_detail_is_revalidated_with_etag(self):
+        """
+        Ensure a project detail answers 304 while unchanged, and a new ETag once a contributor is added.
+        """
+        owner, project = self.setup_project(issues_count=2)
+        client = Client()
+        headers = self.login(client)
+        url = reverse("projects_detail", kwargs={"pk": project.id})
+        etag = self.assert_not_modified_without_serializing(client, url, headers)
+
+        daisy = User.objects.create_user(
+            username="daisy.duck",
+            email="daisy.duck@bluelake.fr",
+            password="applepie94",
+            birthdate="2001-07-15",
+            general_cnil_approvement=True,
+            can_contribute_to_a_project=True,
+        )
+        version = Projects.objects.get(id=project.id).version
+        response = client.post(
+            reverse("projects_users", kwargs={"pk": project.id}),
+            data={"contributor_id": daisy.id},
+            content_type="application/json",
+            headers=headers,
+        )
+        assert response.status_code == 200
+        response = client.get(url, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+        assert response.data["version"] == version + 1
+
+    def test_issues_list_is_revalidated_with_etag(self):
+        """
+        Ensure an issues page answers 304 while unchanged, and a new ETag once one of its issues changes.
+        """
+        owner, project = self.setup_project(issues_count=3)
+        client = Client()
+        headers = self.login(client)
+        url = reverse("issues", kwargs={"pk": project.id})
+        etag = self.assert_not_modified_without_serializing(client, url, headers)
+        other_page_etag = client.get(url, data={"limit": 1}, headers=headers)["ETag"]
+        assert other_page_etag != etag
+
+        issue = Issues.objects.filter(project_id=project).first()
+        comment_url = reverse("comments", kwargs={"pk": project.id, "issue_id": issue.id})
+        response = client.post(
+            comment_url, data={"title": "commentaire", "description": "bla bla bla"},
+            content_type="application/json", headers=headers
+        )
+        assert response.status_code == 200
+        response = client.get(url, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+
+    def test_comments_list_is_revalidated_with_etag_and_last_modified(self):
+        """
+        Ensure a comments list answers 304 to If-None-Match or If-Modified-Since while unchanged.
+        """
+        owner, project = self.setup_project(issues_count=1)
+        issue = Issues.objects.get(project_id=project)
+        client = Client()
+        headers = self.login(client)
+        comment_url = reverse("comments", kwargs={"pk": project.id, "issue_id": issue.id})
+        response = client.post(
+            comment_url, data={"title": "commentaire", "description": "bla bla bla"},
+            content_type="application/json", headers=headers
+        )
+        comment_id = response.data["id"]
+        etag = self.assert_not_modified_without_serializing(client, comment_url, headers)
+
+        last_modified = client.get(comment_url, headers=headers)["Last-Modified"]
+        response = client.get(comment_url, headers={**headers, "If-Modified-Since": last_modified})
+        assert response.status_code == 304
+        response = client.get(
+            comment_url, headers={**headers, "If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"}
+        )
+        assert response.status_code == 200
+
+        url = reverse("comments_detail", kwargs={"pk": project.id, "issue_id": issue.id, "comment_id": comment_id})
+        response = client.put(url, data={"title": "nouveau titre"}, content_type="application/json", headers=headers)
+        assert response.status_code == 200
+        response = client.get(comment_url, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.data[0]["title"] == "nouveau titre"
+
+    def test_issue_change_renews_the_etag_of_its_own_project(self):
+        """
+        Ensure an issue write bumps the version of the project owning the issue, never the one of another url.
+        """
+        owner, project = self.setup_project(issues_count=1)
+        other_project = Projects.objects.create(title="autre", description="bla bla bla", type="iOS")
+        Contributors.objects.create(user_id=owner, project_id=other_project, role=Contributors.AUTHOR)
+        Contributors.objects.create(user_id=owner, project_id=other_project, role=Contributors.CONTRIBUTOR)
+        other_issue = Issues.objects.create(
+            title="problème", description="bla bla bla", balise="BUG", priority="LOW",
+            project_id=other_project, author_user_id=owner,
+        )
+        repair_projects_counters()
+        client = Client()
+        headers = self.login(client)
+        url = reverse("issues", kwargs={"pk": other_project.id})
+        etag = client.get(url, headers=headers)["ETag"]
+        version = Projects.objects.get(id=project.id).version
+
+        kwargs = {"pk": project.id, "issue_id": other_issue.id}
+        response = client.put(
+            reverse("issues_status", kwargs=kwargs), data={"status": "In Progress"},
+            content_type="application/json", headers=headers
+        )
+        assert response.status_code == 404
+        assert client.get(url, headers={**headers, "If-None-Match": etag}).status_code == 304
+
+        kwargs = {"pk": other_project.id, "issue_id": other_issue.id}
+        response = client.put(
+            reverse("issues_status", kwargs=kwargs), data={"status": "In Progress"},
+            content_type="application/json", headers=headers
+        )
+        assert response.status_code == 200
+        response = client.get(url, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.data[0]["status"] == "In Progress"
+        assert Projects.objects.get(id=project.id).version == version
+
+
+@pytest.mark.django_db
+class TestProjectChanges:
+    setup_project = TestProjectStatusCascade.setup_project
+    login = TestProjectStatusCascade.login
+
+    def test_changes_since_a_cursor_with_tombstones(self):
+        """
+        Ensure a first sync returns the whole project, and the next ones only the rows written since the cursor.
+        """
+        owner, project = self.setup_project(issues_count=3)
+        first, second, third = Issues.objects.filter(project_id=project).order_by("id")
+        client = Client()
+        headers = self.login(client)
+        url = reverse("projects_changes", kwargs={"pk": project.id})
+
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        assert [issue["id"] for issue in response.data["issues"]] == [first.id, second.id, third.id]
+        assert len(response.data["contributors"]) == 2
+        assert response.data["more"] is False
+        cursor = response.data["cursor"]
+        response = client.get(url, data={"since": cursor}, headers=headers)
+        assert response.data["issues"] == []
+        assert response.data["cursor"] == cursor
+
+        comment = Comments.objects.create(
+            uuid=uuid.uuid4(), title="commentaire", description="bla bla bla", author_user_id=owner, issue_id=first
+        )
+        Issues.objects.filter(id=second.id).update(title="nouveau titre")
+        third_id = third.id
+        third.delete()
+        response = client.get(url, data={"since": cursor}, headers=headers)
+        assert [issue["id"] for issue in response.data["issues"]] == [second.id]
+        assert response.data["issues"][0]["title"] == "nouveau titre"
+        assert [row["id"] for row in response.data["comments"]] == [comment.id]
+        assert response.data["deleted"] == {"issues": [third_id], "comments": [], "contributors": []}
+        assert response.data["version"] == Projects.objects.get(id=project.id).version
+        cursor = response.data["cursor"]
+
+        comment_id = comment.id
+        comment.delete()
+        response = client.get(url, data={"since": cursor}, headers=headers)
+        assert response.data["comments"] == []
+        assert response.data["deleted"]["comments"] == [comment_id]
+
+        response = client.get(url, data={"since": "hier"}, headers=headers)
+        assert response.status_code == 400
+
+    def test_changes_are_read_by_pages_of_the_log(self, settings):
+        """
+        Ensure the changes are read by pages, each row once, until 'more' is false.
+        """
+        settings.SOFTDESK_CHANGES_PAGE_SIZE = 2
+        owner, project = self.setup_project(issues_count=5)
+        client = Client()
+        headers = self.login(client)
+        url = reverse("projects_changes", kwargs={"pk": project.id})
+
+        issues, contributors, cursor, more = [], [], 0, True
+        while more:
+            response = client.get(url, data={"since": cursor}, headers=headers)
+            assert len(response.data["issues"]) + len(response.data["contributors"]) <= 2
+            issues += [issue["id"] for issue in response.data["issues"]]
+            contributors += [contributor["id"] for contributor in response.data["contributors"]]
+            cursor, more = response.data["cursor"], response.data["more"]
+        assert sorted(issues) == list(
+            Issues.objects.filter(project_id=project).order_by("id").values_list("id", flat=True)
+        )
+        assert len(contributors) == 2
+
+        outsider = User.objects.create_user(
+            username="daisy.duck",
+            email="daisy.duck@bluelake.fr",
+            password="applepie94",
+            birthdate="2001-07-15",
+            general_cnil_approvement=True,
+        )
+        response = client.post(reverse("login"), data={"username": outsider.username, "password": "applepie94"})
+        response = client.get(url, headers={"Authorization": f"Bearer {response.data['access']}"})
+        assert response.status_code == 403
+
+
+@pytest.mark.django_db
+class TestValuesSerializers:
+    setup_project = TestProjectStatusCascade.setup_project
+    login = TestProjectStatusCascade.login
+
+    def test_values_serializers_render_the_same_json(self):
+        """
+        Ensure the lists serialized from values() rows render byte-identical JSON to the DRF serializers.
+        """
+        owner, project = self.setup_project(issues_count=3)
+        issue = Issues.objects.filter(project_id=project).order_by("id").first()
+        Issues.objects.filter(id=issue.id).update(assignee_user_id=owner)
+        Comments.objects.create(
+            uuid=uuid.uuid4(), title="commentaire", description="bla bla bla", author_user_id=owner, issue_id=issue
+        )
+        cases = [
+            (ProjectListSerializer, Projects.objects.all(), None),
+            (IssuesSerializer, Issues.objects.all(), None),
+            (IssuesSerializer, Issues.objects.all(), ("id", "title", "assignee_user_id", "updated_time")),
+            (CommentListSerializer, Comments.objects.all(), None),
+        ]
+        for serializer_class, queryset, fields in cases:
+            kwargs = {} if fields is None else {"fields": list(fields)}
+            expected = JSONRenderer().render(serializer_class(queryset, many=True, **kwargs).data)
+            fast_serializer = ValuesSerializer(serializer_class, fields)
+            rows = queryset.values_list(*fast_serializer.columns)
+            assert JSONRenderer().render(fast_serializer.data(rows)) == expected
+
+    def test_lists_are_read_from_values_with_both_paginations(self):
+        """
+        Ensure the issues list pages (limit/offset and cursor) match the DRF serializer output.
+        """
+        owner, project = self.setup_project(issues_count=7)
+        client = Client()
+        headers = self.login(client)
+        url = reverse("issues", kwargs={"pk": project.id})
+        expected = IssuesSerializer(
+            Issues.objects.filter(project_id=project).order_by("created_time", "id"), many=True
+        )
+
+        response = client.get(url, data={"limit": 10}, headers=headers)
+        assert response.content == JSONRenderer().render(expected.data)
+
+        results, next_url = [], f"{url}?pagination=cursor&limit=3"
+        while next_url:
+            response = client.get(next_url, headers=headers)
+            results += response.json()["results"]
+            next_url = response.json()["next"]
+        assert results == json.loads(JSONRenderer().render(expected.data))
+
+        response = client.get(reverse("projects"), headers=headers)
+        assert response.content == JSONRenderer().render(
+            ProjectListSerializer(Projects.objects.filter(id=project.id), many=True).data
+        )
@@ -0,0 +1,635 @@
+"""
+Budgets de requêtes SQL et de latence, pour chaque route de oc_projet10_rest_framework/urls.py.
+
+Chaque route a son fichier de budget dans tests/budgets/<nom de la route>.json, par méthode HTTP:
+le nombre maximal de requêtes SQL par appel, et l'enveloppe de latence (p50 et p95, en millisecondes).
+Le test échoue si une modification augmente le nombre de requêtes, ou sort de l'enveloppe de latence
+(SOFTDESK_BUDGET_LATENCY=1): les latences dépendent de la machine et du jeu de données.
+
+Variables d'environnement:
+    SOFTDESK_BUDGET_DATASET_SIZE: taille du jeu de données (défaut 10): utilisateurs, projets,
+        problèmes par projet et commentaires par problème.
+    SOFTDESK_BUDGET_REPEAT: nombre d'appels mesurés par route et méthode (défaut 15).
+    SOFTDESK_BUDGET_UPDATE=1: réécrit les fichiers de budget à partir des mesures au lieu de les vérifier.
+    SOFTDESK_BUDGET_LATENCY=1: vérifie aussi les latences.
+"""
+
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+from time import perf_counter
+import json
+import os
+import uuid
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, resolve, reverse
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+import pytest
+
+from authentication.models import User
+from softdesk import counters
+from softdesk.counters import repair_projects_counters, repair_issues_counters
+from softdesk.membership import invalidate_all_memberships
+from softdesk.models import Projects, Issues, Comments, Contributors, Jobs, Changes
+
+
+BUDGETS_DIR = Path(__file__).resolve().parent / "budgets"
+DATASET_SIZE = int(os.environ.get("SOFTDESK_BUDGET_DATASET_SIZE", 10))
+REPEAT = int(os.environ.get("SOFTDESK_BUDGET_REPEAT", 15))
+UPDATE_BUDGETS = os.environ.get("SOFTDESK_BUDGET_UPDATE") == "1"
+# les latences des budgets, mesurées sur une machine et pour un jeu de données, ne sont vérifiées que sur demande
+CHECK_LATENCY = os.environ.get("SOFTDESK_BUDGET_LATENCY") == "1"
+# marge appliquée aux latences mesurées lors de la réécriture des budgets
+LATENCY_MARGIN = 5
+PASSWORD = "applepie94"
+
+
+@lru_cache(maxsize=None)
+def password_hash():
+    """
+    Description: le mot de passe n'est haché qu'une seule fois pour tout le jeu de données.
+    """
+    return make_password(PASSWORD)
+
+
+def create_users(count, prefix, **kwargs):
+    return User.objects.bulk_create(
+        [
+            User(
+                username=f"{prefix}.{index}",
+                first_name=prefix,
+                last_name=f"duck{index}",
+                email=f"{prefix}.{index}@bluelake.fr",
+                birthdate=date(2001, 7, 15),
+                general_cnil_approvement=True,
+                password=password_hash(),
+                **kwargs,
+            )
+            for index in range(count)
+        ]
+    )
+
+
+def create_project(author, contributors, issues_count, comments_count):
+    project = Projects.objects.create(
+        title=f"Projet de {author.username}", description="bla bla bla", type="back-end"
+    )
+    Contributors.objects.bulk_create(
+        [Contributors(user_id=author, project_id=project, role=Contributors.AUTHOR)]
+        + [
+            Contributors(user_id=user, project_id=project, role=Contributors.CONTRIBUTOR)
+            for user in [author] + contributors
+        ]
+    )
+    # bulk_create n'envoie pas les signaux qui invalident les contributions en cache
+    invalidate_all_memberships()
+    issues = Issues.objects.bulk_create(
+        [
+            Issues(
+                title=f"problème {index}",
+                description="Phasellus posuere ultricies urna nec molestie.",
+                balise="BUG",
+                priority="HIGH",
+                project_id=project,
+                author_user_id=author,
+                assignee_user_id=contributors[index % len(contributors)],
+            )
+            for index in range(issues_count)
+        ]
+    )
+    Comments.objects.bulk_create(
+        [
+            Comments(
+                uuid=uuid.uuid4(),
+                title=f"commentaire {index}",
+                description="Aliquam eleifend mi sit amet ante maximus interdum.",
+                author_user_id=author,
+                issue_id=issues[0],
+            )
+            for index in range(comments_count)
+        ]
+    )
+    return project, issues
+
+
+def build_dataset(size):
+    """
+    Description: un administrateur, un auteur de projets, un contributeur et 'size' autres utilisateurs.
+    L'auteur a 'size' projets, avec 'size' problèmes chacun; le 1er problème a 'size' commentaires.
+    """
+    admin = create_users(1, "admin", is_superuser=True, is_staff=True)[0]
+    owner, contributor = create_users(2, "owner")
+    create_users(size, "user")
+    projects = [
+        create_project(owner, [contributor], size, size) for index in range(size)
+    ]
+    repair_projects_counters()
+    repair_issues_counters()
+    project, issues = projects[0]
+    return {
+        "admin": admin,
+        "owner": owner,
+        "contributor": contributor,
+        "project": project,
+        "issue": issues[0],
+        "comment": Comments.objects.filter(issue_id=issues[0]).first(),
+    }
+
+
+def bearer(user):
+    return {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+
+
+def fresh_user(context):
+    return create_users(1, f"fresh{uuid.uuid4().hex[:8]}")[0]
+
+
+def fresh_issue(context, **kwargs):
+    issue = Issues.objects.create(
+        title="problème à traiter",
+        description="Phasellus posuere ultricies urna nec molestie.",
+        balise="TASK",
+        priority="LOW",
+        project_id=context["project"],
+        author_user_id=context["owner"],
+        **kwargs,
+    )
+    counters.issues_created(context["project"].id, [issue.status])
+    return issue
+
+
+def fresh_comment(context):
+    comment = Comments.objects.create(
+        uuid=uuid.uuid4(),
+        title="commentaire à supprimer",
+        description="Aliquam eleifend mi sit amet ante maximus interdum.",
+        author_user_id=context["owner"],
+        issue_id=context["issue"],
+    )
+    counters.comment_created(context["issue"].id)
+    return comment
+
+
+def signup(context):
+    name = f"signup{uuid.uuid4().hex[:8]}"
+    data = {
+        "username": name,
+        "first_name": name,
+        "last_name": "duck",
+        "birthdate": "2002-05-12",
+        "email": f"{name}@bluelake.fr",
+        "password": PASSWORD,
+        "password2": PASSWORD,
+        "general_cnil_approvement": True,
+    }
+    return reverse("signup"), data, {}
+
+
+def login(context):
+    data = {"username": context["owner"].username, "password": PASSWORD}
+    return reverse("login"), data, {}
+
+
+def token_refresh(context):
+    data = {"refresh": str(RefreshToken.for_user(context["owner"]))}
+    return reverse("token_refresh"), data, {}
+
+
+def metrics_scrape(context):
+    return reverse("metrics"), None, bearer(context["admin"])
+
+
+def users_list(context):
+    return reverse("users"), None, bearer(context["owner"])
+
+
+def users_delete_all(context):
+    create_users(DATASET_SIZE, f"purge{uuid.uuid4().hex[:8]}")
+    return reverse("users"), None, bearer(context["admin"])
+
+
+def jobs_detail(context):
+    job = Jobs.objects.create(kind="purge", created_by=context["admin"])
+    return reverse("jobs_detail", kwargs={"pk": job.id}), None, bearer(context["admin"])
+
+
+def search_issues_and_comments(context):
+    return reverse("search") + "?q=commentaire", None, bearer(context["contributor"])
+
+
+def users_detail(context):
+    url = reverse("users_detail", kwargs={"pk": context["contributor"].id})
+    return url, None, bearer(context["owner"])
+
+
+def users_detail_update(context):
+    url = reverse("users_detail", kwargs={"pk": context["owner"].id})
+    return url, {"first_name": "donald"}, bearer(context["owner"])
+
+
+def users_detail_delete(context):
+    user = fresh_user(context)
+    Contributors.objects.create(
+        user_id=user, project_id=context["project"], role=Contributors.CONTRIBUTOR
+    )
+    url = reverse("users_detail", kwargs={"pk": user.id})
+    return url, None, bearer(user)
+
+
+def change_password(context):
+    url = reverse("change_password", kwargs={"pk": context["owner"].id})
+    data = {"old_password": PASSWORD, "password": PASSWORD, "password2": PASSWORD}
+    return url, data, bearer(context["owner"])
+
+
+def projects_list(context):
+    return reverse("projects"), None, bearer(context["owner"])
+
+
+def projects_create(context):
+    data = {"title": "Un projet", "description": "bla bla bla", "type": "front-end"}
+    return reverse("projects"), data, bearer(context["owner"])
+
+
+def projects_delete_all(context):
+    create_project(context["owner"], [context["contributor"]], 1, 1)
+    return reverse("projects"), None, bearer(context["admin"])
+
+
+def projects_detail(context):
+    url = reverse("projects_detail", kwargs={"pk": context["project"].id})
+    return url, None, bearer(context["owner"])
+
+
+def projects_detail_update(context):
+    url = reverse("projects_detail", kwargs={"pk": context["project"].id})
+    return url, {"description": "bla bla bla bla"}, bearer(context["owner"])
+
+
+def projects_detail_delete(context):
+    project, issues = create_project(
+        context["owner"], [context["contributor"]], DATASET_SIZE, DATASET_SIZE
+    )
+    # compteurs à jour, comme après des écritures par l'API: le projet est archivé, ses problèmes terminés
+    repair_projects_counters([project.id])
+    url = reverse("projects_detail", kwargs={"pk": project.id})
+    return url, None, bearer(context["owner"])
+
+
+def projects_users(context):
+    url = reverse("projects_users", kwargs={"pk": context["project"].id})
+    return url, None, bearer(context["owner"])
+
+
+def projects_users_create(context):
+    user = fresh_user(context)
+    url = reverse("projects_users", kwargs={"pk": context["project"].id})
+    return url, {"contributor_id": user.id}, bearer(context["owner"])
+
+
+def projects_users_delete(context):
+    user = fresh_user(context)
+    Contributors.objects.create(
+        user_id=user, project_id=context["project"], role=Contributors.CONTRIBUTOR
+    )
+    for index in range(DATASET_SIZE):
+        fresh_issue(context, assignee_user_id=user)
+    url = reverse(
+        "projects_users_detail",
+        kwargs={"pk": context["project"].id, "user_id": user.id},
+    )
+    return url, None, bearer(context["owner"])
+
+
+def projects_export(context):
+    url = reverse("projects_export", kwargs={"pk": context["project"].id})
+    return url, None, bearer(context["contributor"])
+
+
+def projects_changes(context):
+    # un client déjà synchronisé: seules les dernières entrées du journal du projet sont lues
+    last = Changes.objects.filter(project_id=context["project"].id).order_by("-id").values_list("id", flat=True)
+    since = max((last.first() or 0) - 5, 0)
+    url = reverse("projects_changes", kwargs={"pk": context["project"].id})
+    return f"{url}?since={since}", None, bearer(context["contributor"])
+
+
+def issues_list(context):
+    url = reverse("issues", kwargs={"pk": context["project"].id})
+    return url, None, bearer(context["contributor"])
+
+
+def issues_create(context):
+    url = reverse("issues", kwargs={"pk": context["project"].id})
+    data = {
+        "title": "Un problème",
+        "description": "Phasellus posuere ultricies urna nec molestie.",
+        "balise": "BUG",
+        "priority": "HIGH",
+        "assignee_user_id": context["contributor"].id,
+    }
+    return url, data, bearer(context["owner"])
+
+
+def issues_bulk_create(context):
+    url = reverse("issues_bulk", kwargs={"pk": context["project"].id})
+    data = [
+        {
+            "title": f"Un problème {index}",
+            "description": "Phasellus posuere ultricies urna nec molestie.",
+            "balise": "BUG",
+            "priority": "HIGH",
+            "assignee_user_id": context["contributor"].id,
+        }
+        for index in range(DATASET_SIZE)
+    ]
+    return url, data, bearer(context["owner"])
+
+
+def issues_detail(context):
+    url = reverse(
+        "issues_detail",
+        kwargs={"pk": context["project"].id, "issue_id": context["issue"].id},
+    )
+    return url, None, bearer(context["contributor"])
+
+
+def issues_detail_update(context):
+    url = reverse(
+        "issues_detail",
+        kwargs={"pk": context["project"].id, "issue_id": context["issue"].id},
+    )
+    return url, {"priority": "MEDIUM"}, bearer(context["owner"])
+
+
+def issues_detail_delete(context):
+    issue = fresh_issue(context)
+    url = reverse(
+        "issues_detail", kwargs={"pk": context["project"].id, "issue_id": issue.id}
+    )
+    return url, None, bearer(context["owner"])
+
+
+def issues_status(context):
+    issue = fresh_issue(context, assignee_user_id=context["contributor"])
+    url = reverse(
+        "issues_status", kwargs={"pk": context["project"].id, "issue_id": issue.id}
+    )
+    return url, {"status": "In Progress"}, bearer(context["contributor"])
+
+
+def comments_list(context):
+    url = reverse(
+        "comments",
+        kwargs={"pk": context["project"].id, "issue_id": context["issue"].id},
+    )
+    return url, None, bearer(context["contributor"])
+
+
+def comments_create(context):
+    url = reverse(
+        "comments",
+        kwargs={"pk": context["project"].id, "issue_id": context["issue"].id},
+    )
+    data = {"title": "Un commentaire", "description": "Aliquam eleifend mi sit amet."}
+    return url, data, bearer(context["contributor"])
+
+
+def comments_detail(context):
+    url = reverse(
+        "comments_detail",
+        kwargs={
+            "pk": context["project"].id,
+            "issue_id": context["issue"].id,
+            "comment_id": context["comment"].id,
+        },
+    )
+    return url, None, bearer(context["contributor"])
+
+
+def comments_detail_update(context):
+    url = reverse(
+        "comments_detail",
+        kwargs={
+            "pk": context["project"].id,
+            "issue_id": context["issue"].id,
+            "comment_id": context["comment"].id,
+        },
+    )
+    return url, {"description": "Aliquam eleifend mi."}, bearer(context["owner"])
+
+
+def comments_detail_delete(context):
+    comment = fresh_comment(context)
+    url = reverse(
+        "comments_detail",
+        kwargs={
+            "pk": context["project"].id,
+            "issue_id": context["issue"].id,
+            "comment_id": comment.id,
+        },
+    )
+    return url, None, bearer(context["owner"])
+
+
+# (nom de la route, méthode HTTP, préparation d'un appel, codes de retour attendus)
+BUDGET_CASES = [
+    ("signup", "POST", signup, {201}),
+    ("login", "POST", login, {200}),
+    ("token_refresh", "POST", token_refresh, {200}),
+    ("users", "GET", users_list, {200}),
+    ("users", "DELETE", users_delete_all, {204}),
+    ("users_detail", "GET", users_detail, {200}),
+    ("users_detail", "PUT", users_detail_update, {200}),
+    ("users_detail", "DELETE", users_detail_delete, {204}),
+    ("change_password", "PUT", change_password, {200}),
+    ("projects", "GET", projects_list, {200}),
+    ("projects", "POST", projects_create, {200}),
+    ("projects", "DELETE", projects_delete_all, {204}),
+    ("projects_detail", "GET", projects_detail, {200}),
+    ("projects_detail", "PUT", projects_detail_update, {200}),
+    ("projects_detail", "DELETE", projects_detail_delete, {204}),
+    ("projects_users", "GET", projects_users, {200}),
+    ("projects_users", "POST", projects_users_create, {200}),
+    ("projects_users_detail", "DELETE", projects_users_delete, {204}),
+    ("projects_export", "GET", projects_export, {200}),
+    ("projects_changes", "GET", projects_changes, {200}),
+    ("issues", "GET", issues_list, {200}),
+    ("issues", "POST", issues_create, {200}),
+    ("issues_bulk", "POST", issues_bulk_create, {201}),
+    ("issues_detail", "GET", issues_detail, {200}),
+    ("issues_detail", "PUT", issues_detail_update, {200}),
+    ("issues_detail", "DELETE", issues_detail_delete, {204}),
+    ("issues_status", "PUT", issues_status, {200}),
+    ("comments", "GET", comments_list, {200}),
+    ("comments", "POST", comments_create, {200}),
+    ("comments_detail", "GET", comments_detail, {200}),
+    ("comments_detail", "PUT", comments_detail_update, {200}),
+    ("comments_detail", "DELETE", comments_detail_delete, {204}),
+    ("jobs_detail", "GET", jobs_detail, {200}),
+    ("search", "GET", search_issues_and_comments, {200}),
+    ("metrics", "GET", metrics_scrape, {200}),
+]
+
+
+def percentile(values, rank):
+    values = sorted(values)
+    return values[round(rank * (len(values) - 1))]
+
+
+def load_budget(route):
+    with open(BUDGETS_DIR / f"{route}.json", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_budget(route, method, measures):
+    path = BUDGETS_DIR / f"{route}.json"
+    budget = load_budget(route) if path.exists() else {}
+    budget[method] = {
+        "max_queries": measures["max_queries"],
+        "p50_ms": round(measures["p50_ms"] * LATENCY_MARGIN + 10, 1),
+        "p95_ms": round(measures["p95_ms"] * LATENCY_MARGIN + 20, 1),
+    }
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(dict(sorted(budget.items())), file, indent=4)
+        file.write("\n")
+
+
+def measure(client, context, prepare, expected_status_codes, method):
+    queries, timings = [], []
+    # un 1er appel non mesuré, pour ne pas compter les imports et la résolution des urls
+    for index in range(REPEAT + 1):
+        url, data, headers = prepare(context)
+        with CaptureQueriesContext(connection) as queries_context:
+            start = perf_counter()
+            response = client.generic(
+                method,
+                url,
+                data=json.dumps(data) if data is not None else "",
+                content_type="application/json",
+                headers=headers,
+            )
+            if response.streaming:
+                # une réponse en flux n'est produite, et ses requêtes exécutées, qu'à sa lecture
+                b"".join(response.streaming_content)
+            elapsed = perf_counter() - start
+        assert response.status_code in expected_status_codes, response.content
+        if index > 0:
+            queries.append(len(queries_context.captured_queries))
+            timings.append(elapsed * 1000)
+    return {
+        "max_queries": max(queries),
+        "p50_ms": percentile(timings, 0.5),
+        "p95_ms": percentile(timings, 0.95),
+    }
+
+
+def test_every_route_has_a_budget():
+    routes = {
+        getattr(pattern, "name", None)
+        for pattern in get_resolver().url_patterns
+        if getattr(pattern, "name", None)
+    }
+    measured_routes = {route for route, method, prepare, codes in BUDGET_CASES}
+    assert routes == measured_routes
+    for route in routes:
+        assert (BUDGETS_DIR / f"{route}.json").exists(), route
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "route, method, prepare, expected_status_codes",
+    BUDGET_CASES,
+    ids=[f"{route}-{method}" for route, method, prepare, codes in BUDGET_CASES],
+)
+def test_route_query_and_latency_budget(route, method, prepare, expected_status_codes):
+    """
+    Ensure a route does not exceed its checked-in queries count, and latency envelope (SOFTDESK_BUDGET_LATENCY=1).
+    """
+    context = build_dataset(DATASET_SIZE)
+    measures = measure(Client(), context, prepare, expected_status_codes, method)
+    if UPDATE_BUDGETS:
+        save_budget(route, method, measures)
+        return
+
+    budget = load_budget(route)[method]
+    assert measures["max_queries"] <= budget["max_queries"]
+    if CHECK_LATENCY:
+        assert measures["p50_ms"] <= budget["p50_ms"], measures
+        assert measures["p95_ms"] <= budget["p95_ms"], measures
+
+
+# écritures sans incidence sur la version d'un projet: (vue, méthode) -> raison
+UNVERSIONED_WRITES = {
+    ("UserRegisterGenericsAPIView", "POST"): "création d'un utilisateur",
+    ("UsersAPIView", "DELETE"): "purge: les projets sont supprimés",
+    ("UserAPIView", "PUT"): "profil de l'utilisateur",
+    ("UserUpdatePasswordGenericsAPIView", "PUT"): "mot de passe de l'utilisateur",
+    ("UserUpdatePasswordGenericsAPIView", "PATCH"): "mot de passe de l'utilisateur",
+    ("ProjectsAPIView", "POST"): "création: un projet démarre à la version 0",
+}
+
+# écritures d'un projet ou de ses données: (vue, méthode) -> préparation d'un appel
+VERSIONED_WRITES = {
+    ("UserAPIView", "DELETE"): users_detail_delete,
+    ("ProjectsAPIView", "PUT"): projects_detail_update,
+    ("ProjectsAPIView", "DELETE"): projects_detail_delete,
+    ("ProjectsUsersAPIView", "POST"): projects_users_create,
+    ("ProjectsUsersAPIView", "DELETE"): projects_users_delete,
+    ("IssuesBulkAPIView", "POST"): issues_bulk_create,
+    ("IssuesAPIView", "POST"): issues_create,
+    ("IssuesAPIView", "PUT"): issues_detail_update,
+    ("IssuesAPIView", "DELETE"): issues_detail_delete,
+    ("IssuesRetrieveUpdateAPIView", "PUT"): issues_status,
+    ("IssuesRetrieveUpdateAPIView", "PATCH"): issues_status,
+    ("CommentsAPIView", "POST"): comments_create,
+    ("CommentsAPIView", "PUT"): comments_detail_update,
+    ("CommentsAPIView", "DELETE"): comments_detail_delete,
+}
+
+
+def mutating_views():
+    views = set()
+    for pattern in get_resolver().url_patterns:
+        view_class = getattr(pattern.callback, "view_class", None)
+        if view_class is None or view_class.__module__ != "softdesk.views":
+            continue
+        for method in ["post", "put", "patch", "delete"]:
+            if hasattr(view_class, method):
+                views.add((view_class.__name__, method.upper()))
+    return views
+
+
+def test_every_mutating_view_is_versioned_or_exempted():
+    assert mutating_views() == set(VERSIONED_WRITES) | set(UNVERSIONED_WRITES)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "view, method", sorted(VERSIONED_WRITES), ids=[f"{view}-{method}" for view, method in sorted(VERSIONED_WRITES)]
+)
+def test_project_writes_bump_the_project_version(view, method):
+    """
+    Ensure every write of a project, or of its issues, comments and contributors, bumps the project version.
+    """
+    context = build_dataset(2)
+    prepare = VERSIONED_WRITES[(view, method)]
+    expected_status_codes = next(codes for route, m, p, codes in BUDGET_CASES if p is prepare)
+    url, data, headers = prepare(context)
+    match = resolve(url)
+    project_id = context["project"].id if match.url_name == "users_detail" else match.kwargs["pk"]
+    version = Projects.objects.get(id=project_id).version
+
+    response = Client().generic(
+        method,
+        url,
+        data=json.dumps(data) if data is not None else "",
+        content_type="application/json",
+        headers=headers,
+    )
+    assert response.status_code in expected_status_codes, response.content
+    assert Projects.objects.get(id=project_id).version > version
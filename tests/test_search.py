@@ -0,0 +1,134 @@
+from django.core.management import call_command
+from django.db import connection
+from django.urls import reverse
+from django.test import Client
+import uuid
+import pytest
+
+from authentication.models import User
+from softdesk.models import Projects, Issues, Comments, Contributors
+from softdesk.search import SEARCH_TABLE, build_match_query, rebuild_search_index, search
+
+
+@pytest.mark.django_db
+class TestFullTextSearch:
+    def create_user(self, username):
+        return User.objects.create_user(
+            username=username,
+            email=f"{username}@bluelake.fr",
+            password="applepie94",
+            birthdate="2001-07-15",
+            general_cnil_approvement=True,
+        )
+
+    def create_project(self, owner, title="projet"):
+        project = Projects.objects.create(title=title, description="bla bla bla", type="back-end")
+        Contributors.objects.create(user_id=owner, project_id=project, role=Contributors.AUTHOR)
+        Contributors.objects.create(user_id=owner, project_id=project, role=Contributors.CONTRIBUTOR)
+        return project
+
+    def create_issue(self, project, owner, title, description="bla bla bla"):
+        return Issues.objects.create(
+            title=title,
+            description=description,
+            balise="BUG",
+            priority="LOW",
+            project_id=project,
+            author_user_id=owner,
+        )
+
+    def create_comment(self, issue, owner, title, description="bla bla bla"):
+        return Comments.objects.create(
+            uuid=uuid.uuid4(), title=title, description=description, author_user_id=owner, issue_id=issue
+        )
+
+    def login(self, client, username):
+        url = reverse("login")
+        response = client.post(url, data={"username": username, "password": "applepie94"})
+        return {"Authorization": f"Bearer {response.data['access']}"}
+
+    def test_search_is_ranked_and_scoped_to_the_user_projects(self):
+        """
+        Ensure issues and comments are found by their text, best match first, within the user projects only.
+        """
+        donald = self.create_user("donald.duck")
+        daisy = self.create_user("daisy.duck")
+        project = self.create_project(donald)
+        other_project = self.create_project(daisy, title="autre projet")
+        issue = self.create_issue(project, donald, "erreur de connexion", "le serveur refuse la connexion")
+        comment = self.create_comment(issue, donald, "relance", "toujours une erreur de connexion au serveur")
+        self.create_issue(project, donald, "affichage", "la version android affiche une erreur")
+        self.create_issue(other_project, daisy, "erreur de connexion", "confidentiel")
+
+        client = Client()
+        headers = self.login(client, "donald.duck")
+        response = client.get(reverse("search"), data={"q": "Connexion erreur"}, headers=headers)
+        assert response.status_code == 200
+        results = response.data["results"]
+        assert [(result["kind"], result["id"]) for result in results] == [
+            ("issue", issue.id),
+            ("comment", comment.id),
+        ]
+        assert results[1]["issue_id"] == issue.id
+        assert results[1]["project_id"] == project.id
+        assert "[connexion]" in results[1]["snippet"]
+        assert results[0]["score"] > results[1]["score"]
+
+        response = client.get(reverse("search"), data={"q": "   "}, headers=headers)
+        assert response.status_code == 400
+        response = Client().get(reverse("search"), data={"q": "erreur"})
+        assert response.status_code == 401
+
+    def test_search_is_paginated(self):
+        """
+        Ensure the search results are paginated by limit and offset, with next and previous links.
+        """
+        donald = self.create_user("donald.duck")
+        project = self.create_project(donald)
+        for index in range(5):
+            self.create_issue(project, donald, f"facture {index}")
+
+        client = Client()
+        headers = self.login(client, "donald.duck")
+        response = client.get(reverse("search"), data={"q": "facture", "limit": 2}, headers=headers)
+        assert len(response.data["results"]) == 2
+        assert response.data["previous"] is None
+        response = client.get(response.data["next"], headers=headers)
+        assert len(response.data["results"]) == 2
+        assert response.data["previous"] is not None
+        response = client.get(response.data["next"], headers=headers)
+        assert len(response.data["results"]) == 1
+        assert response.data["next"] is None
+
+    def test_index_follows_writes_and_can_be_rebuilt(self):
+        """
+        Ensure the index is kept in sync by the triggers, and that a rebuild restores a damaged index.
+        """
+        donald = self.create_user("donald.duck")
+        project = self.create_project(donald)
+        issue = self.create_issue(project, donald, "probleme d'affichage")
+        comment = self.create_comment(issue, donald, "capture", "écran noir au démarrage")
+        assert [result["id"] for result in search("problème")] == [issue.id]
+        assert [result["id"] for result in search("ecran")] == [comment.id]
+
+        Issues.objects.filter(id=issue.id).update(title="plantage")
+        assert search("affichage") == []
+        assert [result["id"] for result in search("plant")] == [issue.id]
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        assert search("plantage") == []
+        assert rebuild_search_index() == {"issues": 1, "comments": 1}
+        call_command("rebuild_softdesk_search")
+        assert [result["id"] for result in search("plantage")] == [issue.id]
+
+        issue.delete()
+        assert search("plantage") == []
+        assert search("ecran") == []
+
+    def test_match_query_cannot_inject_fts5_syntax(self):
+        """
+        Ensure the user text is quoted word by word.
+        """
+        assert build_match_query('erreur" OR title:* NEAR(') == '"erreur" "OR" "title" "NEAR"*'
+        assert build_match_query("?!") is None
@@ -1,11 +1,17 @@
 from django.urls import reverse
 from django.test import Client
 from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
 from time import sleep
+import uuid
 import pytest
 
 from authentication.models import User
+from softdesk.models import Projects, Issues, Comments, Contributors, Jobs
+from softdesk.purge import PurgeEngine
 
 
 @pytest.mark.django_db
@@ -555,3 +561,222 @@ class TestSignupAndLogin:
             url, data=data, content_type="application/json", headers=headers
         )
         assert response.status_code == 401
+
+
+@pytest.mark.django_db
+class TestStatelessJWTAuthentication:
+    user_data1 = TestSignupAndLogin.user_data1
+
+    @pytest.fixture(autouse=True)
+    def stateless_jwt(self, settings):
+        settings.SOFTDESK_STATELESS_JWT = True
+
+    def login(self, client):
+        client.post(reverse("signup"), data=self.user_data1)
+        data = {
+            "username": self.user_data1["username"],
+            "password": self.user_data1["password"],
+        }
+        return client.post(reverse("login"), data=data).data
+
+    @pytest.mark.django_db
+    def test_access_token_carries_user_claims(self):
+        """
+        Ensure the access token is signed with the claims used by the permissions.
+        """
+        client = Client()
+        tokens = self.login(client)
+        access = AccessToken(tokens["access"])
+        assert access["is_superuser"] is False
+        assert access["can_contribute_to_a_project"] == User.objects.get(id=1).can_contribute_to_a_project
+        assert access["can_profile_viewable"] is True
+
+    @pytest.mark.django_db
+    def test_authenticated_request_does_not_load_the_user_row(self):
+        """
+        Ensure the stateless mode saves the user lookup made by the authentication on each request.
+        """
+        client = Client()
+        tokens = self.login(client)
+        headers = {"Authorization": f"Bearer {tokens['access']}"}
+        url = reverse("users_detail", kwargs={"pk": 1})
+        with CaptureQueriesContext(connection) as stateless_queries:
+            response = client.get(url, headers=headers)
+        assert response.status_code == 200
+
+        with override_settings(SOFTDESK_STATELESS_JWT=False):
+            with CaptureQueriesContext(connection) as stateful_queries:
+                response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        assert len(stateful_queries) == len(stateless_queries) + 1
+
+    @pytest.mark.django_db
+    def test_refresh_token_reloads_user_claims(self):
+        """
+        Ensure a refreshed access token carries the current user attributes.
+        """
+        client = Client()
+        tokens = self.login(client)
+        User.objects.filter(id=1).update(can_contribute_to_a_project=True)
+
+        url = reverse("token_refresh")
+        response = client.post(url, data={"refresh": tokens["refresh"]})
+        assert response.status_code == 200
+        access = AccessToken(response.data["access"])
+        assert access["can_contribute_to_a_project"] is True
+
+        User.objects.filter(id=1).update(is_active=False)
+        response = client.post(url, data={"refresh": tokens["refresh"]})
+        assert response.status_code == 401
+
+    @pytest.mark.django_db
+    def test_change_password_loads_the_user_when_needed(self):
+        """
+        Ensure a view that needs the full user model still works in stateless mode.
+        """
+        client = Client()
+        tokens = self.login(client)
+        headers = {"Authorization": f"Bearer {tokens['access']}"}
+        data = {
+            "old_password": "applepie94",
+            "password": "bananasplit94",
+            "password2": "bananasplit94",
+        }
+        url = reverse("change_password", kwargs={"pk": 1})
+        response = client.put(
+            url, data=data, content_type="application/json", headers=headers
+        )
+        assert response.status_code == 200
+        assert User.objects.get(id=1).check_password("bananasplit94")
+
+
+@pytest.mark.django_db
+class TestUsersPurge:
+    def setup_data(self):
+        admin = User.objects.create_superuser(
+            "admin", "admin@localhost", "applepie94",
+            birthdate="1990-01-01", general_cnil_approvement=True,
+        )
+        users = [
+            User.objects.create_user(
+                username=f"duck{index}",
+                email=f"duck{index}@bluelake.fr",
+                password="applepie94",
+                birthdate="2001-07-15",
+                general_cnil_approvement=True,
+            )
+            for index in range(5)
+        ]
+        for index, user in enumerate(users):
+            project = Projects.objects.create(
+                title=f"projet {index}", description="bla bla bla", type="back-end"
+            )
+            Contributors.objects.create(user_id=user, project_id=project, role=Contributors.AUTHOR)
+            Contributors.objects.create(user_id=admin, project_id=project, role=Contributors.CONTRIBUTOR)
+            for issue_index in range(3):
+                issue = Issues.objects.create(
+                    title=f"problème {issue_index}",
+                    description="bla bla bla",
+                    balise="BUG",
+                    priority="LOW",
+                    project_id=project,
+                    author_user_id=user,
+                    assignee_user_id=admin,
+                )
+                Comments.objects.create(
+                    uuid=uuid.uuid4(),
+                    title="commentaire",
+                    description="bla bla bla",
+                    author_user_id=user,
+                    issue_id=issue,
+                )
+        return admin, users
+
+    def login(self, client, username):
+        url = reverse("login")
+        response = client.post(url, data={"username": username, "password": "applepie94"})
+        return {"Authorization": f"Bearer {response.data['access']}"}
+
+    def assert_purged(self):
+        assert list(User.objects.values_list("username", flat=True)) == ["admin"]
+        assert not Projects.objects.exists()
+        assert not Contributors.objects.exists()
+        assert not Issues.objects.exists()
+        assert not Comments.objects.exists()
+
+    @pytest.mark.django_db
+    def test_superuser_purge_deletes_by_batches(self, settings):
+        """
+        Ensure the purge keeps the superusers only, deleting by batches instead of collecting each user cascade.
+        """
+        settings.SOFTDESK_PURGE_BATCH_SIZE = 4
+        self.setup_data()
+        client = Client()
+        headers = self.login(client, "admin")
+
+        url = reverse("users")
+        with CaptureQueriesContext(connection) as context:
+            response = client.delete(url, headers=headers)
+        assert response.status_code == 204
+        self.assert_purged()
+        # un DELETE par lot de 4 lignes au plus: 15 commentaires, 15 problèmes, 10 contributeurs, 5 projets, 5 users,
+        # et un seul DELETE du journal des changements
+        deletes = [query for query in context.captured_queries if query["sql"].startswith("DELETE")]
+        assert len(deletes) == 4 + 4 + 3 + 2 + 1 + 2
+
+    @pytest.mark.django_db
+    def test_purge_reports_progress_by_step(self):
+        """
+        Ensure the purge engine reports its progress after each batch.
+        """
+        self.setup_data()
+        reports = []
+        deleted = PurgeEngine(
+            batch_size=10, progress=lambda step, **progress: reports.append((step, progress))
+        ).run()
+        assert deleted["comments"] == 15
+        assert deleted["users"] == 5
+        assert ("issues", {"deleted": 10, "total": 15}) in reports
+        assert reports[-1] == ("users", {"deleted": 5, "total": 5})
+        self.assert_purged()
+
+    @pytest.mark.django_db
+    def test_superuser_purge_as_a_background_job(self):
+        """
+        Ensure the purge can run as a job, whose status and progress can be read by its creator only.
+        """
+        admin, users = self.setup_data()
+        client = Client()
+        headers = self.login(client, "admin")
+
+        url = reverse("users")
+        response = client.delete(f"{url}?mode=async", headers=headers)
+        assert response.status_code == 202
+        assert response.data["url"] == reverse("jobs_detail", kwargs={"pk": response.data["job_id"]})
+        self.assert_purged()
+
+        response = client.get(response.data["url"], headers=headers)
+        assert response.status_code == 200
+        assert response.data["kind"] == "purge"
+        assert response.data["status"] == "done"
+        assert response.data["progress"]["comments"] == {"deleted": 15, "total": 15}
+
+        url = reverse("jobs_detail", kwargs={"pk": response.data["id"] + 1})
+        response = client.get(url, headers=headers)
+        assert response.status_code == 404
+
+    @pytest.mark.django_db
+    def test_user_can_not_purge_nor_read_other_jobs(self):
+        """
+        Ensure a user who is not a superuser can neither purge nor read a job he has not created.
+        """
+        admin, users = self.setup_data()
+        job = Jobs.objects.create(kind="purge", created_by=admin)
+        client = Client()
+        headers = self.login(client, users[0].username)
+
+        response = client.delete(f"{reverse('users')}?mode=async", headers=headers)
+        assert response.status_code == 403
+        response = client.get(reverse("jobs_detail", kwargs={"pk": job.id}), headers=headers)
+        assert response.status_code == 403
+        assert User.objects.count() == 6